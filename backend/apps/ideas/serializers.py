@@ -1,11 +1,65 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from django.db import models
 from .models import Idea, IdeaNote, IdeaResource, IdeaMembership
 from apps.projects.models import Project
 
 User = get_user_model()
 
+NO_PERMISSIONS = {
+    'can_view': False,
+    'can_edit': False,
+    'can_contribute': False,
+    'can_manage_members': False,
+    'can_delete': False
+}
+
+ROLE_PERMISSIONS = {
+    'owner': {
+        'can_view': True,
+        'can_edit': True,
+        'can_contribute': True,
+        'can_manage_members': True,
+        'can_delete': True
+    },
+    'editor': {
+        'can_view': True,
+        'can_edit': True,
+        'can_contribute': True,
+        'can_manage_members': True,
+        'can_delete': False
+    },
+    'contributor': {
+        'can_view': True,
+        'can_edit': False,
+        'can_contribute': True,
+        'can_manage_members': False,
+        'can_delete': False
+    },
+    'viewer': {
+        'can_view': True,
+        'can_edit': False,
+        'can_contribute': False,
+        'can_manage_members': False,
+        'can_delete': False
+    },
+}
+
+
+def resolve_user_role(idea, user):
+    """
+    Return the user's role on an idea. Uses the user_role annotation added by
+    IdeaViewSet when present and only falls back to a query otherwise.
+    """
+    if hasattr(idea, 'user_role'):
+        return idea.user_role
+    
+    if idea.owner_id == user.id:
+        return 'owner'
+    
+    membership = IdeaMembership.objects.filter(idea=idea, user=user).first()
+    return membership.role if membership else None
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -91,7 +145,35 @@ class IdeaNoteSerializer(serializers.ModelSerializer):
         ]
 
 
-class IdeaSerializer(serializers.ModelSerializer):
+class IdeaCountsMixin:
+    """
+    Child counts shared by the idea serializers. IdeaViewSet annotates them
+    with annotate_counts(); ideas loaded any other way fall back to COUNT
+    queries, or to the prefetched rows when those are loaded.
+    """
+    
+    def get_notes_count(self, obj):
+        if hasattr(obj, 'notes_count'):
+            return obj.notes_count
+        return obj.notes.count()
+    
+    def get_resources_count(self, obj):
+        if hasattr(obj, 'resources_count'):
+            return obj.resources_count
+        return obj.resources.count()
+    
+    def get_projects_count(self, obj):
+        if hasattr(obj, 'projects_count'):
+            return obj.projects_count
+        return obj.projects.count()
+    
+    def get_members_count(self, obj):
+        if hasattr(obj, 'members_count'):
+            return obj.members_count
+        return obj.memberships.count()
+
+
+class IdeaSerializer(IdeaCountsMixin, serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
     projects = ProjectSerializer(many=True, read_only=True)
     project_ids = serializers.ListField(
@@ -129,87 +211,19 @@ class IdeaSerializer(serializers.ModelSerializer):
             'user_role', 'user_permissions', 'created_at', 'updated_at'
         ]
     
-    def get_notes_count(self, obj):
-        return obj.notes.count()
-    
-    def get_resources_count(self, obj):
-        return obj.resources.count()
-    
-    def get_projects_count(self, obj):
-        return obj.projects.count()
-    
-    def get_members_count(self, obj):
-        return obj.memberships.count()
-    
     def get_user_role(self, obj):
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return None
-        
-        user = request.user
-        if obj.owner == user:
-            return 'owner'
-        
-        try:
-            membership = obj.memberships.get(user=user)
-            return membership.role
-        except IdeaMembership.DoesNotExist:
-            return None
+        return resolve_user_role(obj, request.user)
     
     def get_user_permissions(self, obj):
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
-            return {
-                'can_view': False,
-                'can_edit': False,
-                'can_contribute': False,
-                'can_manage_members': False,
-                'can_delete': False
-            }
+            return dict(NO_PERMISSIONS)
         
-        user = request.user
-        role = self.get_user_role(obj)
-        
-        if role == 'owner':
-            return {
-                'can_view': True,
-                'can_edit': True,
-                'can_contribute': True,
-                'can_manage_members': True,
-                'can_delete': True
-            }
-        elif role == 'editor':
-            return {
-                'can_view': True,
-                'can_edit': True,
-                'can_contribute': True,
-                'can_manage_members': True,
-                'can_delete': False
-            }
-        elif role == 'contributor':
-            return {
-                'can_view': True,
-                'can_edit': False,
-                'can_contribute': True,
-                'can_manage_members': False,
-                'can_delete': False
-            }
-        elif role == 'viewer':
-            return {
-                'can_view': True,
-                'can_edit': False,
-                'can_contribute': False,
-                'can_manage_members': False,
-                'can_delete': False
-            }
-        else:
-            return {
-                'can_view': False,
-                'can_edit': False,
-                'can_contribute': False,
-                'can_manage_members': False,
-                'can_delete': False
-            }
+        role = resolve_user_role(obj, request.user)
+        return dict(ROLE_PERMISSIONS.get(role, NO_PERMISSIONS))
     
     def create(self, validated_data):
         project_ids = validated_data.pop('project_ids', [])
@@ -219,11 +233,9 @@ class IdeaSerializer(serializers.ModelSerializer):
             # Only allow user to associate projects they have access to
             user = self.context['request'].user
             accessible_projects = Project.objects.filter(
-                id__in=project_ids
-            ).filter(
-                models.Q(owner=user) |
-                models.Q(memberships__user=user)
-            ).distinct()
+                id__in=project_ids,
+                access_entries__user=user
+            )
             
             idea.projects.set(accessible_projects)
         
@@ -241,18 +253,16 @@ class IdeaSerializer(serializers.ModelSerializer):
         if project_ids is not None:
             user = self.context['request'].user
             accessible_projects = Project.objects.filter(
-                id__in=project_ids
-            ).filter(
-                models.Q(owner=user) |
-                models.Q(memberships__user=user)
-            ).distinct()
+                id__in=project_ids,
+                access_entries__user=user
+            )
             
             instance.projects.set(accessible_projects)
         
         return instance
 
 
-class IdeaListSerializer(serializers.ModelSerializer):
+class IdeaListSerializer(IdeaCountsMixin, serializers.ModelSerializer):
     """Simplified serializer for list views"""
     owner = UserSerializer(read_only=True)
     tag_list = serializers.ReadOnlyField()
@@ -271,29 +281,8 @@ class IdeaListSerializer(serializers.ModelSerializer):
             'user_role', 'created_at', 'updated_at'
         ]
     
-    def get_notes_count(self, obj):
-        return obj.notes.count()
-    
-    def get_resources_count(self, obj):
-        return obj.resources.count()
-    
-    def get_projects_count(self, obj):
-        return obj.projects.count()
-    
-    def get_members_count(self, obj):
-        return obj.memberships.count()
-    
     def get_user_role(self, obj):
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return None
-        
-        user = request.user
-        if obj.owner == user:
-            return 'owner'
-        
-        try:
-            membership = obj.memberships.get(user=user)
-            return membership.role
-        except IdeaMembership.DoesNotExist:
-            return None
+        return resolve_user_role(obj, request.user)
@@ -1,3 +1,155 @@
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from apps.projects.models import Project
+from .models import Idea, IdeaMembership, IdeaNote, IdeaResource
+
+
+class IdeaVisibilityTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.stranger = User.objects.create_user('stranger', 'stranger@example.com', 'password')
+        self.client = APIClient()
+        self.idea = Idea.objects.create(title='Idea', description='', owner=self.owner)
+        self.members = {}
+        for role in ('viewer', 'contributor', 'editor'):
+            self.members[role] = User.objects.create_user(role, f'{role}@example.com', 'password')
+            IdeaMembership.objects.create(idea=self.idea, user=self.members[role], role=role, added_by=self.owner)
+
+    def get(self, user, url):
+        self.client.force_authenticate(user)
+        return self.client.get(url)
+
+    def test_non_members_cannot_list_or_fetch(self):
+        Idea.objects.create(title='Their own', description='', owner=self.stranger)
+        response = self.get(self.stranger, '/api/ideas/')
+        self.assertEqual([idea['title'] for idea in response.data], ['Their own'])
+        self.assertEqual(self.get(self.stranger, f'/api/ideas/{self.idea.pk}/').status_code, 404)
+
+    def test_reports_each_role(self):
+        for user, role in [(self.owner, 'owner'), *((user, role) for role, user in self.members.items())]:
+            listed = self.get(user, '/api/ideas/').data
+            self.assertEqual([(idea['id'], idea['user_role']) for idea in listed], [(self.idea.pk, role)])
+            self.assertEqual(self.get(user, f'/api/ideas/{self.idea.pk}/').data['user_role'], role)
+
+    def test_members_are_listed_once(self):
+        # Several memberships on one idea must not repeat it
+        self.assertEqual(len(self.get(self.members['viewer'], '/api/ideas/').data), 1)
+        self.assertEqual(len(self.get(self.owner, '/api/ideas/').data), 1)
+
+
+class IdeaListQueryCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.member = User.objects.create_user('member', 'member@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_ideas(self, count):
+        for index in range(count):
+            owned = Idea.objects.create(title=f'Owned {index}', description='', owner=self.user)
+            IdeaMembership.objects.create(idea=owned, user=self.member, role='editor', added_by=self.user)
+
+            shared = Idea.objects.create(title=f'Shared {index}', description='', owner=self.member)
+            IdeaMembership.objects.create(idea=shared, user=self.user, role='viewer', added_by=self.member)
+
+    def test_query_count_does_not_grow_with_idea_count(self):
+        self.create_ideas(1)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/ideas/')
+        self.assertEqual(len(response.data), 2)
+
+        self.create_ideas(10)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/ideas/')
+        self.assertEqual(len(response.data), 22)
+
+
+class IdeaCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.member = User.objects.create_user('member', 'member@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_idea(self, title, notes=0, resources=0, projects=0, member=False):
+        idea = Idea.objects.create(title=title, description='', owner=self.user)
+        for index in range(notes):
+            IdeaNote.objects.create(idea=idea, title=f'Note {index}', content='', author=self.user)
+        for index in range(resources):
+            IdeaResource.objects.create(idea=idea, title=f'Link {index}', url='https://example.com', added_by=self.user)
+        for index in range(projects):
+            idea.projects.add(Project.objects.create(title=f'{title} project {index}', owner=self.user))
+        if member:
+            IdeaMembership.objects.create(idea=idea, user=self.member, role='viewer', added_by=self.user)
+        return idea
+
+    def counts(self, row):
+        return tuple(row[field] for field in ('notes_count', 'resources_count', 'projects_count', 'members_count'))
+
+    def test_counts_each_ideas_own_children(self):
+        first = self.create_idea('First', notes=2, resources=1, projects=3, member=True)
+        second = self.create_idea('Second', notes=1, projects=1)
+        self.create_idea('Empty')
+
+        listed = {row['title']: self.counts(row) for row in self.client.get('/api/ideas/').data}
+        self.assertEqual(listed, {'First': (2, 1, 3, 1), 'Second': (1, 0, 1, 0), 'Empty': (0, 0, 0, 0)})
+        self.assertEqual(self.counts(self.client.get(f'/api/ideas/{first.pk}/').data), (2, 1, 3, 1))
+
+        IdeaNote.objects.filter(idea=second).delete()
+        self.assertEqual(self.counts(self.client.get(f'/api/ideas/{second.pk}/').data), (0, 0, 1, 0))
+
+    def test_detail_query_count_does_not_grow_with_children(self):
+        def statements(count):
+            idea = self.create_idea(f'Idea {count}', notes=count, resources=count, projects=count, member=True)
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.client.get(f'/api/ideas/{idea.pk}/').status_code, 200)
+            return len(context.captured_queries)
+
+        self.assertEqual(statements(1), statements(10))
+
+
+class IdeaStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.other = User.objects.create_user('other', 'other@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_idea(self, title, owner=None, **fields):
+        return Idea.objects.create(title=title, description='', owner=owner or self.user, **fields)
+
+    def test_counts_statuses_and_priorities_of_visible_ideas(self):
+        project = Project.objects.create(title='Project', owner=self.user)
+        self.create_idea('Draft')
+        self.create_idea('Concept', status='concept', priority='high').projects.add(project)
+        self.create_idea('Built', status='implemented', priority='high')
+        shared = self.create_idea('Shared', owner=self.other, status='concept', priority='critical')
+        IdeaMembership.objects.create(idea=shared, user=self.user, role='viewer', added_by=self.other)
+        self.create_idea('Hidden', owner=self.other, status='on_hold')
+
+        stats = self.client.get('/api/ideas/stats/').data
+        self.assertEqual(stats['total_ideas'], 4)
+        self.assertEqual(stats['by_status'], {
+            'draft': 1, 'concept': 2, 'in_development': 0, 'implemented': 1, 'on_hold': 0, 'cancelled': 0,
+        })
+        self.assertEqual(stats['by_priority'], {'low': 0, 'medium': 1, 'high': 2, 'critical': 1})
+        self.assertEqual(len(stats['recent_ideas']), 4)
+
+        # The list filters narrow the stats too
+        filtered = self.client.get('/api/ideas/stats/', {'project': project.pk}).data
+        self.assertEqual((filtered['total_ideas'], filtered['by_status']['concept']), (1, 1))
+
+    def test_query_count_does_not_grow_with_idea_count(self):
+        def statements(count):
+            for index in range(count):
+                status, _ = Idea.STATUS_CHOICES[index % len(Idea.STATUS_CHOICES)]
+                self.create_idea(f'Idea {index}', status=status)
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.client.get('/api/ideas/stats/').status_code, 200)
+            return len(context.captured_queries)
+
+        self.assertEqual(statements(1), statements(12))
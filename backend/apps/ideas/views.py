@@ -1,4 +1,4 @@
-from django.db.models import Q
+from django.db.models import Q, Count, Case, When, Value, CharField, OuterRef, Subquery, Prefetch
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -6,9 +6,53 @@ from .models import Idea, IdeaNote, IdeaResource, IdeaMembership
 from .serializers import (
     IdeaSerializer, IdeaListSerializer, 
     IdeaNoteSerializer, IdeaResourceSerializer,
-    IdeaMembershipSerializer
+    IdeaMembershipSerializer, resolve_user_role
 )
 from apps.projects.models import Project
+from apps.projects.queries import subquery_count
+from apps.search.query import search_filter
+from apps.tags.models import IdeaTag
+from apps.tags.tagging import tag_filter_params, filter_by_tags, tag_counts
+
+
+# Role hierarchy: editor > contributor > viewer
+ROLE_HIERARCHY = {'viewer': 1, 'contributor': 2, 'editor': 3}
+
+
+def annotate_user_role(queryset, user):
+    """Annotate each idea with the user's role ('owner', a membership role or None)"""
+    return queryset.annotate(
+        user_role=Case(
+            When(owner=user, then=Value('owner')),
+            default=Subquery(
+                IdeaMembership.objects.filter(
+                    idea=OuterRef('pk'), user=user
+                ).values('role')[:1]
+            ),
+            output_field=CharField(),
+        )
+    )
+
+
+def visible_ideas(user):
+    """
+    Ideas the user owns or is a member of. Membership is a subquery rather
+    than a join, so rows never repeat and no DISTINCT is needed.
+    """
+    return Idea.objects.filter(
+        Q(owner=user) |
+        Q(pk__in=IdeaMembership.objects.filter(user=user).values('idea_id'))
+    )
+
+
+def annotate_counts(queryset):
+    """Annotate the child counts the idea serializers render"""
+    return queryset.annotate(
+        notes_count=subquery_count(IdeaNote.objects.filter(idea=OuterRef('pk'))),
+        resources_count=subquery_count(IdeaResource.objects.filter(idea=OuterRef('pk'))),
+        projects_count=subquery_count(Idea.projects.through.objects.filter(idea=OuterRef('pk'))),
+        members_count=subquery_count(IdeaMembership.objects.filter(idea=OuterRef('pk'))),
+    )
 
 
 class IdeaViewSet(viewsets.ModelViewSet):
@@ -17,9 +61,7 @@ class IdeaViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Return ideas owned by or shared with the current user"""
         user = self.request.user
-        queryset = Idea.objects.filter(
-            Q(owner=user) | Q(memberships__user=user)
-        ).distinct()
+        queryset = visible_ideas(user)
         
         # Filter by status
         status_filter = self.request.query_params.get('status')
@@ -31,22 +73,40 @@ class IdeaViewSet(viewsets.ModelViewSet):
         if priority_filter:
             queryset = queryset.filter(priority=priority_filter)
         
-        # Search in title and description
+        # Search through the index (apps/search) rather than LIKE scans
         search = self.request.query_params.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(problem_statement__icontains=search) |
-                Q(tags__icontains=search)
-            )
+            queryset = queryset.filter(search_filter(
+                'idea', search, ['title', 'description', 'problem_statement', 'tags']
+            ))
+        
+        # Tag filter: ?tag=a&tag=b, all of them unless ?tag_match=any
+        tag_keys, tag_match = tag_filter_params(self.request.query_params)
+        queryset = filter_by_tags(queryset, IdeaTag, tag_keys, tag_match)
         
         # Filter by project
         project_id = self.request.query_params.get('project')
         if project_id:
             queryset = queryset.filter(projects__id=project_id)
         
-        return queryset.prefetch_related('projects', 'notes', 'resources', 'memberships')
+        if self.action in ('stats', 'tags'):
+            # Aggregates only; no roles, joins or prefetches
+            return queryset
+        
+        queryset = annotate_user_role(queryset, user).select_related('owner')
+        
+        # The list renders counts only. The detail serializer also nests the
+        # child collections, which are not worth loading for anything else.
+        if self.action in ('list', 'retrieve'):
+            queryset = annotate_counts(queryset)
+        if self.action in ('retrieve', 'update', 'partial_update'):
+            queryset = queryset.prefetch_related(
+                'projects',
+                Prefetch('notes', queryset=IdeaNote.objects.select_related('author')),
+                Prefetch('resources', queryset=IdeaResource.objects.select_related('added_by')),
+                Prefetch('memberships', queryset=IdeaMembership.objects.select_related('user', 'added_by')),
+            )
+        return queryset
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -58,26 +118,19 @@ class IdeaViewSet(viewsets.ModelViewSet):
     
     def has_permission_for_idea(self, idea, required_role=None):
         """Check if user has permission for this idea"""
-        user = self.request.user
+        role = resolve_user_role(idea, self.request.user)
         
         # Owner has all permissions
-        if idea.owner == user:
+        if role == 'owner':
             return True
         
-        # Check membership permissions
-        try:
-            membership = IdeaMembership.objects.get(idea=idea, user=user)
-            if not required_role:
-                return True
-            
-            # Role hierarchy: editor > contributor > viewer
-            role_hierarchy = {'viewer': 1, 'contributor': 2, 'editor': 3}
-            user_level = role_hierarchy.get(membership.role, 0)
-            required_level = role_hierarchy.get(required_role, 0)
-            
-            return user_level >= required_level
-        except IdeaMembership.DoesNotExist:
+        if role is None:
             return False
+        
+        if not required_role:
+            return True
+        
+        return ROLE_HIERARCHY.get(role, 0) >= ROLE_HIERARCHY.get(required_role, 0)
     
     def update(self, request, *args, **kwargs):
         idea = self.get_object()
@@ -102,27 +155,31 @@ class IdeaViewSet(viewsets.ModelViewSet):
         """Get idea statistics for the current user"""
         queryset = self.get_queryset()
         
+        # One GROUP BY pass for both histograms, pivoted here
+        by_status = {key: 0 for key, _ in Idea.STATUS_CHOICES}
+        by_priority = {key: 0 for key, _ in Idea.PRIORITY_CHOICES}
+        total = 0
+        for row in queryset.order_by().values('status', 'priority').annotate(count=Count('pk')):
+            total += row['count']
+            if row['status'] in by_status:
+                by_status[row['status']] += row['count']
+            if row['priority'] in by_priority:
+                by_priority[row['priority']] += row['count']
+        
         stats = {
-            'total_ideas': queryset.count(),
-            'by_status': {},
-            'by_priority': {},
+            'total_ideas': total,
+            'by_status': by_status,
+            'by_priority': by_priority,
             'recent_ideas': list(queryset[:5].values('id', 'title', 'created_at'))
         }
         
-        # Count by status
-        for status_choice in Idea.STATUS_CHOICES:
-            status_key = status_choice[0]
-            count = queryset.filter(status=status_key).count()
-            stats['by_status'][status_key] = count
-        
-        # Count by priority
-        for priority_choice in Idea.PRIORITY_CHOICES:
-            priority_key = priority_choice[0]
-            count = queryset.filter(priority=priority_key).count()
-            stats['by_priority'][priority_key] = count
-        
         return Response(stats)
     
+    @action(detail=False, methods=['get'])
+    def tags(self, request):
+        """Tag counts over the ideas the current filters select"""
+        return Response(tag_counts(self.get_queryset(), IdeaTag))
+    
     @action(detail=True, methods=['get', 'post'])
     def members(self, request, pk=None):
         """Manage idea members"""
@@ -174,8 +231,8 @@ class IdeaViewSet(viewsets.ModelViewSet):
         """Get projects accessible to the current user for idea association"""
         user = request.user
         projects = Project.objects.filter(
-            Q(owner=user) | Q(memberships__user=user)
-        ).distinct().values('id', 'title', 'description', 'status')
+            access_entries__user=user
+        ).values('id', 'title', 'description', 'status')
         
         return Response(list(projects))
 
@@ -195,7 +252,9 @@ class IdeaNoteViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         idea_id = self.kwargs.get('idea_id')
-        idea = Idea.objects.get(id=idea_id)
+        idea = annotate_user_role(
+            Idea.objects.filter(id=idea_id), self.request.user
+        ).get()
         
         # Check permissions - contributors and above can add notes
         idea_viewset = IdeaViewSet()
@@ -224,7 +283,9 @@ class IdeaResourceViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         idea_id = self.kwargs.get('idea_id')
-        idea = Idea.objects.get(id=idea_id)
+        idea = annotate_user_role(
+            Idea.objects.filter(id=idea_id), self.request.user
+        ).get()
         
         # Check permissions - contributors and above can add resources
         idea_viewset = IdeaViewSet()
@@ -1,12 +1,14 @@
+from .activity_log import record
 from .models import ProjectActivity
 
 def log_project_activity(project, user, action, description):
     """
-    Helper function to automatically log project activities
+    Helper function to automatically log project activities. The row is
+    written after commit, through apps/projects/activity_log.py
     """
-    ProjectActivity.objects.create(
+    record(ProjectActivity(
         project=project,
         user=user,
         action=action,
         description=description
-    )
+    ))
@@ -0,0 +1,158 @@
+"""
+The write path shared by ProjectActivity and TaskActivity rows.
+
+record() takes an unsaved activity and queues it with transaction.on_commit,
+so no INSERT runs inside the write it describes and rows of rolled-back
+work are never written. settings.ACTIVITY_LOG_MODE decides what happens to
+a row once its transaction commits:
+
+- 'sync': it is inserted right away, one INSERT per row.
+- 'buffered' (the default): inside collecting(), which ActivityLogMiddleware
+  opens around every request, rows are held and written together at the end
+  with one bulk_create per model. Outside it they are inserted as in 'sync'.
+- 'background': the rows collected are handed to an in-process writer
+  thread instead, and the request does not wait for the INSERT.
+
+Guarantees. 'sync' and 'buffered' write every committed row before the
+response goes out, and an insert that fails raises as it did before.
+'background' is at most once. Rows still queued when the process dies are
+lost, and so are those of a failing insert, which is logged. When the queue
+(ACTIVITY_LOG_QUEUE_SIZE batches) is full, ACTIVITY_LOG_ON_FULL='block'
+makes the request wait for room, while 'drop' logs the batch and discards it.
+
+Rows of one request keep their commit order. With a single writer
+(ACTIVITY_LOG_WRITERS=1) batches are also written in the order requests
+finish. More writers add throughput, but batches of concurrent requests may
+then land in either order. created_at is stamped when a row is written,
+which under 'background' may trail the event slightly.
+"""
+import atexit
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def record(activity):
+    """Write the unsaved activity once the current transaction commits"""
+    transaction.on_commit(lambda: _committed(activity))
+
+
+def _committed(activity):
+    batch = getattr(_state, 'batch', None)
+    if batch is not None and settings.ACTIVITY_LOG_MODE != 'sync':
+        batch.append(activity)
+    else:
+        write([activity])
+
+
+def write(activities):
+    """Insert activities, in order, with one bulk_create per model"""
+    by_model = {}
+    for activity in activities:
+        by_model.setdefault(type(activity), []).append(activity)
+    for model, rows in by_model.items():
+        model.objects.bulk_create(rows)
+
+
+@contextmanager
+def collecting():
+    """
+    Hold the activity rows committed inside the block and deliver them
+    together at its end. A nested block leaves them to the outer one.
+    """
+    if getattr(_state, 'batch', None) is not None:
+        yield
+        return
+
+    _state.batch = []
+    try:
+        yield
+    finally:
+        batch, _state.batch = _state.batch, None
+        if batch:
+            deliver(batch)
+
+
+def deliver(batch):
+    if settings.ACTIVITY_LOG_MODE == 'background':
+        background_writer().put(batch)
+    else:
+        write(batch)
+
+
+class ActivityLogMiddleware:
+    """Collect the activity rows of each request and write them once it is handled"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collecting():
+            return self.get_response(request)
+
+
+class BackgroundWriter:
+    """Threads inserting activity batches from a bounded in-memory queue"""
+
+    def __init__(self, size, writers):
+        self.queue = queue.Queue(maxsize=size)
+        self.threads = [
+            threading.Thread(target=self._run, name=f'activity-writer-{index}', daemon=True)
+            for index in range(writers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def put(self, batch):
+        if settings.ACTIVITY_LOG_ON_FULL == 'drop':
+            try:
+                self.queue.put_nowait(batch)
+            except queue.Full:
+                logger.error('Activity queue is full; dropped %d rows', len(batch))
+        else:
+            self.queue.put(batch)
+
+    def join(self):
+        """Wait until every batch queued so far is written"""
+        self.queue.join()
+
+    def stop(self, timeout=5):
+        """Write what is queued, then end the threads"""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch = self.queue.get()
+            try:
+                if batch is None:
+                    return
+                close_old_connections()
+                write(batch)
+            except Exception:
+                logger.exception('Could not write %d activity rows', len(batch))
+            finally:
+                self.queue.task_done()
+
+
+def background_writer():
+    """The process's writer, started on first use and drained at exit"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BackgroundWriter(settings.ACTIVITY_LOG_QUEUE_SIZE, settings.ACTIVITY_LOG_WRITERS)
+            atexit.register(_writer.stop)
+        return _writer
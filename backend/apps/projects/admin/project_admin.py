@@ -1,5 +1,5 @@
 from django.contrib import admin
-from ..models import Project, ProjectMembership
+from ..models import Project, ProjectMembership, ProjectAccess
 
 
 @admin.register(Project)
@@ -16,7 +16,7 @@ class ProjectAdmin(admin.ModelAdmin):
             'fields': ('title', 'description', 'owner')
         }),
         ('Project Details', {
-            'fields': ('status', 'priority', 'progress', 'due_date')
+            'fields': ('status', 'priority', 'progress_mode', 'progress', 'due_date')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
@@ -35,3 +35,19 @@ class ProjectMembershipAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('project', 'user')
+
+
+@admin.register(ProjectAccess)
+class ProjectAccessAdmin(admin.ModelAdmin):
+    list_display = ['project', 'user', 'role']
+    list_filter = ['role']
+    search_fields = ['project__title', 'user__email']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('project', 'user')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -7,7 +7,7 @@ class ProjectTopicAdmin(admin.ModelAdmin):
     list_display = ['title', 'project', 'color_display', 'created_by', 'notes_count', 'created_at']
     list_filter = ['created_at', 'updated_at', 'project__status']
     search_fields = ['title', 'description', 'project__title', 'created_by__email']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'notes_count', 'links_count', 'media_count', 'comments_count']
     ordering = ['-updated_at']
     list_per_page = 30
     
@@ -16,12 +16,8 @@ class ProjectTopicAdmin(admin.ModelAdmin):
     color_display.allow_tags = True
     color_display.short_description = "Color"
     
-    def notes_count(self, obj):
-        return obj.notes.count()
-    notes_count.short_description = "Notes"
-    
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('project', 'created_by').prefetch_related('notes')
+        return super().get_queryset(request).select_related('project', 'created_by')
     
     fieldsets = (
         ('Basic Information', {
@@ -30,6 +26,10 @@ class ProjectTopicAdmin(admin.ModelAdmin):
         ('Appearance', {
             'fields': ('color',)
         }),
+        ('Counters', {
+            'fields': ('notes_count', 'links_count', 'media_count', 'comments_count'),
+            'classes': ('collapse',)
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef
+from apps.projects.models import ProjectTopic, TopicNote, TopicLink, TopicMedia, TopicComment
+from apps.projects.queries import subquery_count
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized child counters on ProjectTopic to fix drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='Only recount topics of this project')
+
+    def handle(self, *args, **options):
+        topics = ProjectTopic.objects.all()
+        if options['project']:
+            topics = topics.filter(project_id=options['project'])
+
+        updated = topics.update(
+            notes_count=subquery_count(TopicNote.objects.filter(topic=OuterRef('pk'))),
+            links_count=subquery_count(TopicLink.objects.filter(topic=OuterRef('pk'))),
+            media_count=subquery_count(TopicMedia.objects.filter(topic=OuterRef('pk'))),
+            comments_count=subquery_count(TopicComment.objects.filter(topic=OuterRef('pk'))),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Recounted {updated} topics'))
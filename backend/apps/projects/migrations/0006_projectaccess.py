@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_project_access(apps, schema_editor):
+    Project = apps.get_model('projects', 'Project')
+    ProjectMembership = apps.get_model('projects', 'ProjectMembership')
+    ProjectAccess = apps.get_model('projects', 'ProjectAccess')
+    
+    owners = dict(Project.objects.values_list('id', 'owner_id'))
+    rows = [
+        ProjectAccess(project_id=project_id, user_id=owner_id, role='owner')
+        for project_id, owner_id in owners.items()
+    ]
+    rows += [
+        ProjectAccess(project_id=project_id, user_id=user_id, role=role)
+        for project_id, user_id, role in ProjectMembership.objects.values_list(
+            'project_id', 'user_id', 'role'
+        ).iterator()
+        if owners.get(project_id) != user_id
+    ]
+    ProjectAccess.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('projects', '0005_projecttopic_topicnote_topicmedia_topiclink_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectAccess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(max_length=20)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='access_entries', to='projects.project')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='project_access', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Project Access',
+                'unique_together': {('user', 'project')},
+            },
+        ),
+        migrations.RunPython(backfill_project_access, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_topic_counters(apps, schema_editor):
+    ProjectTopic = apps.get_model('projects', 'ProjectTopic')
+    
+    def count_of(model_name):
+        model = apps.get_model('projects', model_name)
+        counted = model.objects.filter(topic=OuterRef('pk')).order_by().values(
+            'topic'
+        ).annotate(total=Count('pk')).values('total')
+        return Coalesce(Subquery(counted, output_field=models.IntegerField()), 0)
+    
+    ProjectTopic.objects.update(
+        notes_count=count_of('TopicNote'),
+        links_count=count_of('TopicLink'),
+        media_count=count_of('TopicMedia'),
+        comments_count=count_of('TopicComment'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_projectaccess'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projecttopic',
+            name='comments_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='projecttopic',
+            name='links_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='projecttopic',
+            name='media_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='projecttopic',
+            name='notes_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_topic_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0008_topiccomment_root'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='projectactivity',
+            index=models.Index(fields=['project', 'created_at', 'id'], name='projects_activity_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0009_activity_feed_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='progress_mode',
+            field=models.CharField(choices=[('manual', 'Manual'), ('tasks', 'Share of tasks done'), ('weighted', 'Share of estimated hours done')], default='manual', max_length=20),
+        ),
+    ]
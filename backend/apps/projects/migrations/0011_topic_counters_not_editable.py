@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0010_project_progress_mode'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='projecttopic',
+            name='comments_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='projecttopic',
+            name='links_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='projecttopic',
+            name='media_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='projecttopic',
+            name='notes_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
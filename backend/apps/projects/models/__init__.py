@@ -1,6 +1,7 @@
 # Import all models to make them available when importing from models package
 from .project import Project
 from .membership import ProjectMembership
+from .access import ProjectAccess
 from .file import ProjectFile
 from .link import ProjectLink
 from .activity import ProjectActivity
@@ -10,6 +11,7 @@ from .topic import ProjectTopic, TopicNote, TopicLink, TopicMedia, TopicTag, Top
 __all__ = [
     'Project',
     'ProjectMembership', 
+    'ProjectAccess',
     'ProjectFile',
     'ProjectLink',
     'ProjectActivity',
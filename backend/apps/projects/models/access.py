@@ -0,0 +1,20 @@
+from django.db import models
+from django.contrib.auth.models import User
+from .project import Project
+
+
+class ProjectAccess(models.Model):
+    """
+    Denormalized (user, project, role) rows covering both owners and members,
+    maintained by the signals in apps/projects/signals.py
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='project_access')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='access_entries')
+    role = models.CharField(max_length=20)
+    
+    class Meta:
+        unique_together = ['user', 'project']
+        verbose_name_plural = 'Project Access'
+    
+    def __str__(self):
+        return f'{self.user.email} - {self.project.title} ({self.role})'
@@ -13,6 +13,9 @@ class ProjectActivity(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Project Activities'
+        indexes = [
+            models.Index(fields=['project', 'created_at', 'id'], name='projects_activity_feed_idx'),
+        ]
     
     def __str__(self):
         return f'{self.project.title} - {self.action}'
@@ -3,6 +3,14 @@ from django.contrib.auth.models import User
 
 
 class Project(models.Model):
+    # In the automatic modes progress follows the project's tasks (see
+    # apps.tasks.rollups.refresh_progress) and manual edits are ignored
+    PROGRESS_MODE_CHOICES = [
+        ('manual', 'Manual'),
+        ('tasks', 'Share of tasks done'),
+        ('weighted', 'Share of estimated hours done'),
+    ]
+    
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     status = models.CharField(max_length=20, default='planning')
@@ -12,6 +20,21 @@ class Project(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     due_date = models.DateTimeField(null=True, blank=True)
     progress = models.IntegerField(default=0)
+    progress_mode = models.CharField(max_length=20, choices=PROGRESS_MODE_CHOICES, default='manual')
+    
+    # Fields whose change moves the project between users' cached stats
+    # (apps/projects/stats.py); their loaded values are kept to compare on save
+    STATS_FIELDS = ('status', 'owner_id')
     
     def __str__(self):
         return self.title
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(name in field_names for name in cls.STATS_FIELDS):
+            instance._stored_stats_state = instance.stats_state()
+        return instance
+    
+    def stats_state(self):
+        return tuple(getattr(self, name) for name in self.STATS_FIELDS)
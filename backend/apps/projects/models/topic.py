@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from .project import Project
+from ..threads import save_comment
 
 
 class ProjectTopic(models.Model):
@@ -12,6 +13,13 @@ class ProjectTopic(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_topics')
     
+    # Child counters, kept current by apps/projects/signals.py with F()
+    # updates; not editable, and never written back by a topic save
+    notes_count = models.IntegerField(default=0, editable=False)
+    links_count = models.IntegerField(default=0, editable=False)
+    media_count = models.IntegerField(default=0, editable=False)
+    comments_count = models.IntegerField(default=0, editable=False)
+    
     class Meta:
         ordering = ['-updated_at']
         unique_together = ['project', 'title']
@@ -103,9 +111,15 @@ class TopicComment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='topic_comments')
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    # Top-level comment of the thread (null for top-level comments), so a
+    # whole thread loads in one query
+    root = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='thread_replies')
     
     class Meta:
         ordering = ['created_at']
     
     def __str__(self):
         return f'{self.topic.title} - Comment by {self.author.email}'
+    
+    def save(self, *args, **kwargs):
+        save_comment(self, lambda: super(TopicComment, self).save(*args, **kwargs))
@@ -0,0 +1,95 @@
+from django.db.models import OuterRef, Subquery
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import BasePermission, SAFE_METHODS
+from .models import Project, ProjectAccess
+
+
+OWNER = 'owner'
+EDITOR = 'editor'
+VIEWER = 'viewer'
+EDIT_ROLES = (OWNER, EDITOR)
+
+
+class ProjectRole:
+    """
+    The current user's access to a project, resolved once per request
+    """
+
+    def __init__(self, project, role):
+        self.project = project
+        self.role = role
+
+    @property
+    def is_member(self):
+        return self.role is not None
+
+    @property
+    def is_owner(self):
+        return self.role == OWNER
+
+    @property
+    def can_edit(self):
+        return self.role in EDIT_ROLES
+
+
+def get_project_role(request, project_id):
+    """
+    Load the project together with the user's ProjectAccess role in a single
+    query and memoize the result on the request, so permission classes and
+    handlers share one lookup.
+    """
+    cache = getattr(request, '_project_roles', None)
+    if cache is None:
+        cache = request._project_roles = {}
+
+    project_id = int(project_id)
+    if project_id not in cache:
+        user = request.user
+        project = Project.objects.select_related('owner').annotate(
+            user_role=Subquery(
+                ProjectAccess.objects.filter(
+                    project=OuterRef('pk'), user_id=user.pk
+                ).values('role')[:1]
+            )
+        ).filter(pk=project_id).first()
+
+        role = project.user_role if project is not None else None
+        cache[project_id] = ProjectRole(project, role)
+
+    return cache[project_id]
+
+
+def _project_id_from_view(view):
+    kwargs = getattr(view, 'kwargs', {})
+    return kwargs.get('project_id', kwargs.get('pk'))
+
+
+class IsProjectMember(BasePermission):
+    """
+    Allows access to the project's owner and members. Anyone else gets a 404
+    so project ids are not leaked.
+    """
+
+    def has_permission(self, request, view):
+        project_id = _project_id_from_view(view)
+        if project_id is None:
+            return True
+
+        if not get_project_role(request, project_id).is_member:
+            raise NotFound()
+        return True
+
+
+class IsProjectEditorOrReadOnly(IsProjectMember):
+    """
+    Members may read; only the owner and editors may write.
+    """
+    message = 'Permission denied.'
+
+    def has_permission(self, request, view):
+        super().has_permission(request, view)
+        if request.method in SAFE_METHODS:
+            return True
+
+        project_id = _project_id_from_view(view)
+        return project_id is None or get_project_role(request, project_id).can_edit
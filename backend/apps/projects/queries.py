@@ -0,0 +1,27 @@
+from django.db.models import F, Func, Subquery, Value, IntegerField
+from django.db.models.functions import Coalesce
+
+
+def subquery_count(queryset):
+    """
+    Turn a queryset filtered on an OuterRef into a scalar COUNT(*) subquery.
+    Annotating with it avoids joining child tables into the outer query, so
+    several counts can sit side by side without multiplying rows or needing
+    GROUP BY.
+    """
+    counted = queryset.order_by().annotate(
+        _count=Func(F('pk'), function='COUNT')
+    ).values('_count')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def subquery_sum(queryset, field, output_field):
+    """
+    Same as subquery_count, but for SUM(field). Empty sets come back as 0.
+    """
+    summed = queryset.order_by().annotate(
+        _sum=Func(F(field), function='SUM')
+    ).values('_sum')
+    return Coalesce(
+        Subquery(summed, output_field=output_field), Value(0), output_field=output_field
+    )
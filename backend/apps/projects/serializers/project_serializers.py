@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from apps.tasks.rollups import refresh_progress
 from ..models import Project, ProjectMembership
 from .base_serializers import UserSerializer
 
@@ -16,26 +17,62 @@ class ProjectSerializer(serializers.ModelSerializer):
     memberships = ProjectMembershipSerializer(many=True, read_only=True)
     user_role = serializers.SerializerMethodField()
     topics_count = serializers.SerializerMethodField()
+    tasks_count = serializers.SerializerMethodField()
+    completed_tasks_count = serializers.SerializerMethodField()
         
     class Meta:
         model = Project
         fields = ['id', 'title', 'description', 'status', 'priority', 'owner',
-                  'created_at', 'updated_at', 'due_date', 'progress', 'memberships', 'user_role', 'topics_count']
+                  'created_at', 'updated_at', 'due_date', 'progress', 'progress_mode', 'memberships', 'user_role', 'topics_count',
+                  'tasks_count', 'completed_tasks_count']
         
     def get_user_role(self, obj):
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return None
+        
+        # Annotated by ProjectListCreateView and get_project_role
+        if hasattr(obj, 'user_role'):
+            return obj.user_role
                 
-        if obj.owner == request.user:
+        if obj.owner_id == request.user.id:
             return 'owner'
                 
         membership = obj.memberships.filter(user=request.user).first()
         return membership.role if membership else None
     
     def get_topics_count(self, obj):
+        if hasattr(obj, 'topics_count'):
+            return obj.topics_count
         return obj.topics.count()
+    
+    # Task totals come from the project's ProjectTaskRollup (apps.tasks);
+    # projects that never had a task have no rollup row
+    
+    def get_tasks_count(self, obj):
+        rollup = getattr(obj, 'task_rollup', None)
+        return rollup.total if rollup else 0
+    
+    def get_completed_tasks_count(self, obj):
+        rollup = getattr(obj, 'task_rollup', None)
+        return rollup.done if rollup else 0
+        
+    def validate(self, attrs):
+        # Progress is derived from the tasks outside manual mode
+        mode = attrs.get('progress_mode', self.instance.progress_mode if self.instance else 'manual')
+        if mode != 'manual':
+            attrs.pop('progress', None)
+        return attrs
         
     def create(self, validated_data):
         validated_data['owner'] = self.context['request'].user
-        return super().create(validated_data)
+        return self._sync_progress(super().create(validated_data))
+    
+    def update(self, instance, validated_data):
+        return self._sync_progress(super().update(instance, validated_data))
+    
+    def _sync_progress(self, project):
+        if project.progress_mode != 'manual':
+            refresh_progress([project.pk])
+            project.refresh_from_db(fields=['progress'])
+        return project
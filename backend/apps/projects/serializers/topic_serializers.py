@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from ..models import ProjectTopic, TopicNote, TopicLink, TopicMedia, TopicTag, TopicComment
 from .base_serializers import UserSerializer
+from ..threads import group_by_parent, get_replies_data
 
 
 class TopicTagSerializer(serializers.ModelSerializer):
@@ -19,9 +20,7 @@ class TopicCommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at', 'author']
     
     def get_replies(self, obj):
-        if obj.replies.exists():
-            return TopicCommentSerializer(obj.replies.all(), many=True).data
-        return []
+        return get_replies_data(self, obj)
     
     def create(self, validated_data):
         validated_data['author'] = self.context['request'].user
@@ -89,40 +88,39 @@ class TopicMediaSerializer(serializers.ModelSerializer):
 
 class ProjectTopicSerializer(serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
-    notes_count = serializers.SerializerMethodField()
-    links_count = serializers.SerializerMethodField()
-    media_count = serializers.SerializerMethodField()
-    comments_count = serializers.SerializerMethodField()
     tags = TopicTagSerializer(many=True, read_only=True)
     
     class Meta:
         model = ProjectTopic
         fields = ['id', 'title', 'description', 'color', 'created_at', 'updated_at', 'created_by', 
                  'notes_count', 'links_count', 'media_count', 'comments_count', 'tags']
-        read_only_fields = ['created_at', 'updated_at', 'created_by']
-    
-    def get_notes_count(self, obj):
-        return obj.notes.count()
-    
-    def get_links_count(self, obj):
-        return obj.topic_links.count()
-    
-    def get_media_count(self, obj):
-        return obj.media.count()
-    
-    def get_comments_count(self, obj):
-        return obj.comments.count()
+        read_only_fields = ['created_at', 'updated_at', 'created_by',
+                            'notes_count', 'links_count', 'media_count', 'comments_count']
     
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
         return super().create(validated_data)
+    
+    def update(self, instance, validated_data):
+        # Write the edited columns only: a full save would put back the child
+        # counters as read at the start of the request, over concurrent updates
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
 
 
 class ProjectTopicDetailSerializer(ProjectTopicSerializer):
     notes = TopicNoteSerializer(many=True, read_only=True)
     topic_links = TopicLinkSerializer(many=True, read_only=True)
     media = TopicMediaSerializer(many=True, read_only=True)
-    comments = TopicCommentSerializer(many=True, read_only=True)
+    comments = serializers.SerializerMethodField()
     
     class Meta(ProjectTopicSerializer.Meta):
         fields = ProjectTopicSerializer.Meta.fields + ['notes', 'topic_links', 'media', 'comments']
+    
+    def get_comments(self, obj):
+        # Whole discussion in one query; replies nest under their parents only
+        roots, children = group_by_parent(obj.comments.select_related('author'))
+        context = dict(self.context, comment_children=children)
+        return TopicCommentSerializer(roots, many=True, context=context).data
@@ -0,0 +1,119 @@
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import (
+    Project, ProjectMembership, ProjectAccess,
+    ProjectTopic, TopicNote, TopicLink, TopicMedia, TopicComment
+)
+from .permissions import OWNER
+from .stats import invalidate_project_stats
+
+
+def rebuild_project_access(project):
+    """Recreate the access rows of a project from its owner and memberships"""
+    ProjectAccess.objects.filter(project=project).delete()
+    
+    rows = [ProjectAccess(project=project, user_id=project.owner_id, role=OWNER)]
+    rows += [
+        ProjectAccess(project=project, user_id=user_id, role=role)
+        for user_id, role in project.memberships.exclude(
+            user_id=project.owner_id
+        ).values_list('user_id', 'role')
+    ]
+    ProjectAccess.objects.bulk_create(rows)
+    # bulk_create skips post_save, so drop the stats of the new rows' users here
+    invalidate_project_stats([row.user_id for row in rows])
+
+
+@receiver(post_save, sender=Project)
+def sync_owner_access(sender, instance, created, **kwargs):
+    """Keep the owner's access row in step with Project.owner"""
+    if created:
+        ProjectAccess.objects.create(project=instance, user_id=instance.owner_id, role=OWNER)
+        return
+    
+    if not ProjectAccess.objects.filter(
+        project=instance, user_id=instance.owner_id, role=OWNER
+    ).exists():
+        # Ownership changed hands
+        rebuild_project_access(instance)
+
+
+@receiver(post_save, sender=ProjectMembership)
+def sync_member_access(sender, instance, **kwargs):
+    """Mirror a membership's role into the access table"""
+    access, created = ProjectAccess.objects.get_or_create(
+        project_id=instance.project_id,
+        user_id=instance.user_id,
+        defaults={'role': instance.role}
+    )
+    
+    # The owner's row always wins over a membership
+    if not created and access.role not in (OWNER, instance.role):
+        access.role = instance.role
+        access.save(update_fields=['role'])
+
+
+@receiver(post_delete, sender=ProjectMembership)
+def remove_member_access(sender, instance, **kwargs):
+    """Drop the access row of a removed member"""
+    ProjectAccess.objects.filter(
+        project_id=instance.project_id,
+        user_id=instance.user_id
+    ).exclude(role=OWNER).delete()
+
+
+@receiver(post_save, sender=Project)
+def invalidate_stats_on_project_save(sender, instance, created, update_fields=None, **kwargs):
+    """A status change moves the project between buckets for everyone with access"""
+    if created or (update_fields is not None and not {'status', 'owner', 'owner_id'} & set(update_fields)):
+        # New projects are counted through their owner's access row
+        return
+    # Projects not loaded from the database have no stored state; assume a change
+    stored = getattr(instance, '_stored_stats_state', None)
+    instance._stored_stats_state = instance.stats_state()
+    if stored == instance._stored_stats_state:
+        return
+    invalidate_project_stats(
+        ProjectAccess.objects.filter(project=instance).values_list('user_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=ProjectAccess)
+@receiver(post_delete, sender=ProjectAccess)
+def invalidate_stats_on_access_change(sender, instance, **kwargs):
+    """Gaining or losing a project changes the user's totals"""
+    invalidate_project_stats([instance.user_id])
+
+
+# ProjectTopic counter column maintained for each child model
+TOPIC_COUNTERS = {
+    TopicNote: 'notes_count',
+    TopicLink: 'links_count',
+    TopicMedia: 'media_count',
+    TopicComment: 'comments_count',
+}
+
+
+def _bump_topic_counter(sender, topic_id, delta):
+    field = TOPIC_COUNTERS[sender]
+    ProjectTopic.objects.filter(pk=topic_id).update(**{field: F(field) + delta})
+
+
+@receiver(post_save, sender=TopicNote)
+@receiver(post_save, sender=TopicLink)
+@receiver(post_save, sender=TopicMedia)
+@receiver(post_save, sender=TopicComment)
+def increment_topic_counter(sender, instance, created, **kwargs):
+    """Count a new note, link, media item or comment on its topic"""
+    if created:
+        _bump_topic_counter(sender, instance.topic_id, 1)
+
+
+@receiver(post_delete, sender=TopicNote)
+@receiver(post_delete, sender=TopicLink)
+@receiver(post_delete, sender=TopicMedia)
+@receiver(post_delete, sender=TopicComment)
+def decrement_topic_counter(sender, instance, **kwargs):
+    """Uncount a deleted note, link, media item or comment"""
+    _bump_topic_counter(sender, instance.topic_id, -1)
@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.db.models import Count
+from .models import Project
+
+
+# Stats are rebuilt on demand; signals drop the cached copy when a project's
+# status or anyone's access changes, so the timeout is only a safety net.
+# That needs a cache every worker process shares (CACHES in settings.py):
+# with a per-process cache the other workers would keep stale copies.
+PROJECT_STATS_TIMEOUT = 60 * 60
+
+
+def project_stats_cache_key(user_id):
+    return f'project_stats:{user_id}'
+
+
+def get_project_stats(user):
+    """Dashboard project counts for a user, cached until invalidated"""
+    key = project_stats_cache_key(user.pk)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_project_stats(user)
+        cache.set(key, stats, PROJECT_STATS_TIMEOUT)
+    return stats
+
+
+def compute_project_stats(user):
+    """
+    Count the user's projects per status with a single GROUP BY, so every
+    status shows up in byStatus, not only the ones the dashboard names.
+    """
+    by_status = dict(
+        Project.objects.filter(access_entries__user=user).order_by().values(
+            'status'
+        ).annotate(count=Count('pk')).values_list('status', 'count')
+    )
+    
+    return {
+        'totalProjects': sum(by_status.values()),
+        'activeProjects': by_status.get('in_progress', 0),
+        'completedProjects': by_status.get('completed', 0),
+        'onHoldProjects': by_status.get('on_hold', 0),
+        'planningProjects': by_status.get('planning', 0),
+        'byStatus': by_status,
+    }
+
+
+def invalidate_project_stats(user_ids):
+    cache.delete_many([project_stats_cache_key(user_id) for user_id in user_ids])
@@ -1,3 +1,437 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .activity_log import BackgroundWriter, collecting
+from .models import (
+    Project, ProjectAccess, ProjectActivity, ProjectMembership, ProjectTopic,
+    TopicComment, TopicLink, TopicMedia, TopicNote
+)
+from .serializers import ProjectTopicSerializer
+from .ProjectHelper import log_project_activity
+from .stats import compute_project_stats, get_project_stats
+from .threads import load_reply_tree
+
+
+class ProjectListQueryCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.member = User.objects.create_user('member', 'member@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_projects(self, count):
+        for index in range(count):
+            owned = Project.objects.create(title=f'Owned {index}', owner=self.user)
+            ProjectMembership.objects.create(project=owned, user=self.member, role='editor')
+            ProjectTopic.objects.create(project=owned, title='Topic', created_by=self.user)
+
+            shared = Project.objects.create(title=f'Shared {index}', owner=self.member)
+            ProjectMembership.objects.create(project=shared, user=self.user, role='viewer')
+
+    def test_query_count_does_not_grow_with_project_count(self):
+        self.create_projects(1)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/projects/')
+        self.assertEqual(len(response.data), 2)
+
+        self.create_projects(10)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/projects/')
+        self.assertEqual(len(response.data), 22)
+
+    def test_list_fields_come_from_annotations(self):
+        self.create_projects(1)
+        response = self.client.get('/api/projects/')
+        by_title = {project['title']: project for project in response.data}
+
+        self.assertEqual(by_title['Owned 0']['user_role'], 'owner')
+        self.assertEqual(by_title['Owned 0']['topics_count'], 1)
+        self.assertEqual(by_title['Owned 0']['memberships'][0]['user']['email'], 'member@example.com')
+        self.assertEqual(by_title['Shared 0']['user_role'], 'viewer')
+        self.assertEqual(by_title['Shared 0']['topics_count'], 0)
+
+
+class ProjectPermissionTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.editor = User.objects.create_user('editor', 'editor@example.com', 'password')
+        self.viewer = User.objects.create_user('viewer', 'viewer@example.com', 'password')
+        self.stranger = User.objects.create_user('stranger', 'stranger@example.com', 'password')
+        self.project = Project.objects.create(title='Project', owner=self.owner)
+        ProjectMembership.objects.create(project=self.project, user=self.editor, role='editor')
+        ProjectMembership.objects.create(project=self.project, user=self.viewer, role='viewer')
+        self.url = f'/api/projects/{self.project.pk}/'
+
+    def client_for(self, user):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+
+    def statuses(self, user):
+        client = self.client_for(user)
+        return (
+            client.get(self.url).status_code,
+            client.get(f'{self.url}topics/').status_code,
+            client.post(f'{self.url}topics/', {'title': f'Topic by {user}'}, format='json').status_code,
+            client.patch(self.url, {'description': 'Changed'}, format='json').status_code,
+        )
+
+    def test_members_read_and_editing_roles_write(self):
+        self.assertEqual(self.statuses(self.owner), (200, 200, 201, 200))
+        self.assertEqual(self.statuses(self.editor), (200, 200, 201, 200))
+        self.assertEqual(self.statuses(self.viewer), (200, 200, 403, 403))
+
+    def test_reports_each_role(self):
+        for user, role in [(self.owner, 'owner'), (self.editor, 'editor'), (self.viewer, 'viewer')]:
+            self.assertEqual(self.client_for(user).get(self.url).data['user_role'], role)
+
+    def test_only_the_owner_deletes(self):
+        for user in (self.editor, self.viewer):
+            self.assertEqual(self.client_for(user).delete(self.url).status_code, 403)
+        self.assertEqual(self.client_for(self.owner).delete(self.url).status_code, 204)
+        self.assertFalse(Project.objects.exists())
+
+    def test_non_members_get_the_same_404_as_for_a_missing_project(self):
+        self.assertEqual(self.statuses(self.stranger), (404, 404, 404, 404))
+        missing = self.client_for(self.stranger).get('/api/projects/999999/')
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(self.client_for(self.stranger).get(self.url).data, missing.data)
+        self.assertFalse(ProjectTopic.objects.exists())
+
+    def test_anonymous_requests_are_refused(self):
+        self.assertEqual(self.statuses(None), (403, 403, 403, 403))
+
+    def test_looks_the_role_up_once_per_request(self):
+        client = self.client_for(self.editor)
+        for method, url, data in [('get', f'{self.url}topics/', None),
+                                  ('post', f'{self.url}topics/', {'title': 'Topic'}),
+                                  ('patch', self.url, {'description': 'Changed'})]:
+            with CaptureQueriesContext(connection) as context:
+                response = getattr(client, method)(url, data, format='json')
+            self.assertLess(response.status_code, 300)
+            lookups = [query for query in context.captured_queries if '"user_role"' in query['sql']]
+            self.assertEqual(len(lookups), 1, method)
+
+
+class ActivityLogTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.project = Project.objects.create(title='Project', owner=self.user)
+
+    def log(self, count):
+        for index in range(count):
+            log_project_activity(self.project, self.user, f'action-{index}', 'Description')
+
+    def test_writes_a_request_with_one_insert_after_commit(self):
+        with CaptureQueriesContext(connection) as context:
+            with collecting():
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.log(3)
+                self.assertFalse(ProjectActivity.objects.exists())
+        inserts = [query for query in context.captured_queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            list(ProjectActivity.objects.order_by('id').values_list('action', flat=True)),
+            ['action-0', 'action-1', 'action-2'],
+        )
+
+    @override_settings(ACTIVITY_LOG_MODE='sync')
+    def test_sync_mode_writes_each_row_on_commit(self):
+        with collecting():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.log(2)
+            self.assertEqual(ProjectActivity.objects.count(), 2)
+
+    def test_rolled_back_work_logs_nothing(self):
+        with collecting():
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        self.log(1)
+                        raise ValueError
+                except ValueError:
+                    pass
+        self.assertFalse(ProjectActivity.objects.exists())
+
+    @override_settings(ACTIVITY_LOG_ON_FULL='drop')
+    def test_full_background_queue_drops_batches(self):
+        writer = BackgroundWriter(size=1, writers=0)
+        with self.assertLogs('apps.projects.activity_log', 'ERROR'):
+            writer.put(['first'])
+            writer.put(['second'])
+        self.assertEqual(writer.queue.get_nowait(), ['first'])
+
+
+class ProjectStatsCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.member = User.objects.create_user('member', 'member@example.com', 'password')
+        self.project = Project.objects.create(title='Project', owner=self.user, status='in_progress')
+        Project.objects.create(title='Done', owner=self.user, status='completed')
+
+    def assertFresh(self, user):
+        """The cached stats equal a fresh count, and the next read is served from the cache"""
+        self.assertEqual(get_project_stats(user), compute_project_stats(user))
+        with self.assertNumQueries(1):
+            get_project_stats(user)
+
+    def test_caches_the_counts(self):
+        stats = get_project_stats(self.user)
+        self.assertEqual(stats['totalProjects'], 2)
+        self.assertEqual(stats['activeProjects'], 1)
+        self.assertEqual(stats['completedProjects'], 1)
+        self.assertEqual(stats['byStatus'], {'in_progress': 1, 'completed': 1})
+        self.assertFresh(self.user)
+
+    def test_status_change_invalidates_everyone_with_access(self):
+        ProjectMembership.objects.create(project=self.project, user=self.member, role='viewer')
+        get_project_stats(self.user)
+        get_project_stats(self.member)
+
+        self.project.status = 'completed'
+        self.project.save()
+        self.assertEqual(get_project_stats(self.user)['completedProjects'], 2)
+        self.assertEqual(get_project_stats(self.member)['completedProjects'], 1)
+
+    def test_saves_that_keep_status_and_owner_keep_the_cache(self):
+        get_project_stats(self.user)
+        project = Project.objects.get(pk=self.project.pk)
+        project.title = 'Renamed'
+        with CaptureQueriesContext(connection) as context:
+            project.save()
+        self.assertFalse([query for query in context.captured_queries if 'cache' in query['sql']])
+        self.assertFresh(self.user)
+
+    def test_member_add_and_remove_invalidate_the_member(self):
+        self.assertEqual(get_project_stats(self.member)['totalProjects'], 0)
+        membership = ProjectMembership.objects.create(project=self.project, user=self.member, role='editor')
+        self.assertEqual(get_project_stats(self.member)['totalProjects'], 1)
+        membership.delete()
+        self.assertEqual(get_project_stats(self.member)['totalProjects'], 0)
+
+    def test_ownership_transfer_and_delete_invalidate(self):
+        get_project_stats(self.user)
+        get_project_stats(self.member)
+        self.project.owner = self.member
+        self.project.save()
+        self.assertEqual(get_project_stats(self.user)['totalProjects'], 1)
+        self.assertEqual(get_project_stats(self.member)['totalProjects'], 1)
+
+        self.project.delete()
+        self.assertEqual(get_project_stats(self.member)['totalProjects'], 0)
+        self.assertFresh(self.user)
+
+
+class TopicCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(title='Project', owner=self.user)
+        self.topic = ProjectTopic.objects.create(project=self.project, title='Topic', created_by=self.user)
+
+    def counters(self):
+        return ProjectTopic.objects.filter(pk=self.topic.pk).values(
+            'notes_count', 'links_count', 'media_count', 'comments_count'
+        ).get()
+
+    def add_children(self):
+        return [
+            TopicNote.objects.create(topic=self.topic, title='Note', content='Text', created_by=self.user),
+            TopicLink.objects.create(topic=self.topic, title='Link', url='https://example.com', created_by=self.user),
+            TopicMedia.objects.create(topic=self.topic, title='Media', file='topic_media/a.png',
+                                      media_type='image', uploaded_by=self.user),
+            TopicComment.objects.create(topic=self.topic, content='Comment', author=self.user),
+        ]
+
+    def test_counters_follow_creates_and_deletes(self):
+        children = self.add_children()
+        self.add_children()
+        self.assertEqual(self.counters(), {'notes_count': 2, 'links_count': 2, 'media_count': 2, 'comments_count': 2})
+
+        for child in children:
+            child.delete()
+        self.assertEqual(self.counters(), {'notes_count': 1, 'links_count': 1, 'media_count': 1, 'comments_count': 1})
+
+    def test_topic_update_keeps_concurrent_counts(self):
+        stale = ProjectTopic.objects.get(pk=self.topic.pk)
+        self.add_children()
+
+        serializer = ProjectTopicSerializer(stale, data={'title': 'Renamed'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+        self.assertEqual(ProjectTopic.objects.get(pk=self.topic.pk).title, 'Renamed')
+        self.assertEqual(self.counters(), {'notes_count': 1, 'links_count': 1, 'media_count': 1, 'comments_count': 1})
+
+    def test_patch_cannot_write_counters(self):
+        self.add_children()
+        response = self.client.patch(
+            f'/api/projects/{self.project.pk}/topics/{self.topic.pk}/',
+            {'description': 'Edited', 'notes_count': 99}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counters()['notes_count'], 1)
+
+    def test_recount_command_fixes_drift(self):
+        self.add_children()
+        other = ProjectTopic.objects.create(project=self.project, title='Other', created_by=self.user)
+        ProjectTopic.objects.update(notes_count=7, links_count=0, media_count=5, comments_count=-1)
+
+        call_command('recount_topic_counters', project=self.project.pk, stdout=StringIO())
+        self.assertEqual(self.counters(), {'notes_count': 1, 'links_count': 1, 'media_count': 1, 'comments_count': 1})
+        self.assertEqual(ProjectTopic.objects.get(pk=other.pk).notes_count, 0)
+
+
+class ProjectAccessSyncTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.member = User.objects.create_user('member', 'member@example.com', 'password')
+        self.project = Project.objects.create(title='Project', owner=self.owner)
+
+    def access(self):
+        return dict(ProjectAccess.objects.filter(project=self.project).values_list('user__username', 'role'))
+
+    def test_owner_gets_an_owner_row(self):
+        self.assertEqual(self.access(), {'owner': 'owner'})
+
+    def test_member_rows_follow_add_role_change_and_removal(self):
+        membership = ProjectMembership.objects.create(project=self.project, user=self.member, role='viewer')
+        self.assertEqual(self.access(), {'owner': 'owner', 'member': 'viewer'})
+
+        membership.role = 'editor'
+        membership.save()
+        self.assertEqual(self.access(), {'owner': 'owner', 'member': 'editor'})
+
+        membership.delete()
+        self.assertEqual(self.access(), {'owner': 'owner'})
+
+    def test_owner_row_wins_over_a_membership(self):
+        ProjectMembership.objects.create(project=self.project, user=self.owner, role='viewer')
+        self.assertEqual(self.access(), {'owner': 'owner'})
+
+    def test_ownership_transfer_moves_the_owner_row(self):
+        ProjectMembership.objects.create(project=self.project, user=self.member, role='editor')
+        self.project.owner = self.member
+        self.project.save()
+        self.assertEqual(self.access(), {'member': 'owner'})
+
+        # A former owner who is also a member keeps their membership role
+        ProjectMembership.objects.create(project=self.project, user=self.owner, role='viewer')
+        self.project.owner = self.owner
+        self.project.save()
+        self.assertEqual(self.access(), {'owner': 'owner', 'member': 'editor'})
+
+    def test_project_delete_drops_its_rows(self):
+        ProjectMembership.objects.create(project=self.project, user=self.member, role='editor')
+        self.project.delete()
+        self.assertFalse(ProjectAccess.objects.exists())
+
+
+class CommentThreadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(title='Project', owner=self.user)
+        self.topic = ProjectTopic.objects.create(project=self.project, title='Topic', created_by=self.user)
+
+    def comment(self, content, parent=None):
+        return TopicComment.objects.create(topic=self.topic, content=content, author=self.user, parent=parent)
+
+    def thread(self, name):
+        """A top-level comment with a reply, a reply to that and a second reply"""
+        root = self.comment(name)
+        reply = self.comment(f'{name}.1', root)
+        self.comment(f'{name}.1.1', reply)
+        self.comment(f'{name}.2', root)
+        return root
+
+    def contents(self, comments):
+        return [(comment['content'], self.contents(comment['replies'])) for comment in comments]
+
+    def test_replies_point_at_their_thread_root(self):
+        root = self.thread('A')
+        self.assertIsNone(root.root_id)
+        self.assertEqual(set(TopicComment.objects.exclude(pk=root.pk).values_list('root_id', flat=True)), {root.pk})
+
+    def test_loads_nested_threads_in_one_query(self):
+        first = self.thread('A')
+        second = self.thread('B')
+
+        with self.assertNumQueries(1):
+            children = load_reply_tree([first, second])
+        replies = {comment.content: [reply.content for reply in children[comment.pk]]
+                   for comment in TopicComment.objects.all() if comment.pk in children}
+        self.assertEqual(replies, {'A': ['A.1', 'A.2'], 'A.1': ['A.1.1'], 'B': ['B.1', 'B.2'], 'B.1': ['B.1.1']})
+
+    def test_pages_by_top_level_comment(self):
+        for name in 'ABC':
+            self.thread(name)
+        url = f'/api/projects/{self.project.pk}/topics/{self.topic.pk}/comments/'
+
+        with self.assertNumQueries(4):
+            first = self.client.get(url, {'page_size': 2})
+        self.assertEqual(self.contents(first.data['results']), [
+            ('A', [('A.1', [('A.1.1', [])]), ('A.2', [])]),
+            ('B', [('B.1', [('B.1.1', [])]), ('B.2', [])]),
+        ])
+
+        second = self.client.get(first.data['next'])
+        self.assertEqual(self.contents(second.data['results']), [('C', [('C.1', [('C.1.1', [])]), ('C.2', [])])])
+        self.assertIsNone(second.data['next'])
+
+    def test_replies_follow_their_comment_to_another_thread(self):
+        first = self.thread('A')
+        second = self.thread('B')
+        moved = TopicComment.objects.get(content='A.1')
+        url = f'/api/projects/{self.project.pk}/topics/{self.topic.pk}/comments/{moved.pk}/'
+
+        response = self.client.patch(url, {'parent': second.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        roots = dict(TopicComment.objects.values_list('content', 'root_id'))
+        self.assertEqual((roots['A.1'], roots['A.1.1'], roots['A.2']), (second.pk, second.pk, first.pk))
+        children = load_reply_tree([first, second])
+        self.assertEqual([reply.content for reply in children[moved.pk]], ['A.1.1'])
+
+        # Made top-level, it heads its own thread
+        self.client.patch(url, {'parent': None}, format='json')
+        roots = dict(TopicComment.objects.values_list('content', 'root_id'))
+        self.assertEqual((roots['A.1'], roots['A.1.1']), (None, moved.pk))
+        moved.refresh_from_db()
+        self.assertEqual([reply.content for reply in load_reply_tree([moved])[moved.pk]], ['A.1.1'])
+
+    def test_topic_detail_nests_the_whole_discussion(self):
+        self.thread('A')
+        response = self.client.get(f'/api/projects/{self.project.pk}/topics/{self.topic.pk}/')
+        self.assertEqual(self.contents(response.data['comments']), [('A', [('A.1', [('A.1.1', [])]), ('A.2', [])])])
+
+
+class ActivityFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(title='Project', owner=self.user)
+        ProjectActivity.objects.bulk_create([
+            ProjectActivity(project=self.project, user=self.user, action=f'action-{index}', description='Description')
+            for index in range(7)
+        ])
+        ProjectActivity.objects.update(created_at=timezone.now())
+
+    def test_pages_through_entries_with_identical_timestamps(self):
+        url = f'/api/projects/{self.project.pk}/activities/'
+        pages = [self.client.get(url, {'page_size': 3})]
+        while pages[-1].data['next']:
+            pages.append(self.client.get(pages[-1].data['next']))
+
+        actions = [entry['action'] for page in pages for entry in page.data['results']]
+        self.assertEqual(actions, [f'action-{index}' for index in reversed(range(7))])
+        self.assertEqual(len(pages), 3)
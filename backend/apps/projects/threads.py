@@ -0,0 +1,77 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+
+def group_by_parent(comments):
+    """
+    Split a flat list of comments into (top-level comments, replies keyed by
+    parent id). The comment serializers read the replies map from their
+    'comment_children' context entry instead of querying per comment.
+    """
+    roots = []
+    children = defaultdict(list)
+    for comment in comments:
+        if comment.parent_id is None:
+            roots.append(comment)
+        else:
+            children[comment.parent_id].append(comment)
+    return roots, children
+
+
+def load_reply_tree(comments):
+    """
+    Fetch every reply in the threads of the given comments with one query
+    and group them by parent id.
+    """
+    comments = list(comments)
+    if not comments:
+        return {}
+
+    model = type(comments[0])
+    root_ids = {comment.root_id or comment.pk for comment in comments}
+    replies = model.objects.filter(root_id__in=root_ids).select_related('author').order_by('created_at', 'pk')
+    return group_by_parent(replies)[1]
+
+
+def save_comment(comment, save):
+    """
+    Save a comment (a TopicComment or TaskComment) through save(), keeping
+    root pointing at the top of its thread. When a new parent moves it to
+    another thread, the replies under it move along in the same transaction:
+    its old thread is read with one query and the subtree updated with one
+    more.
+    """
+    old_root_id = None if comment._state.adding else comment.root_id or comment.pk
+    comment.root_id = (comment.parent.root_id or comment.parent_id) if comment.parent_id else None
+    if old_root_id is None or old_root_id == (comment.root_id or comment.pk):
+        save()
+        return
+
+    model = type(comment)
+    with transaction.atomic():
+        save()
+        children = defaultdict(list)
+        for pk, parent_id in model.objects.filter(root_id=old_root_id).values_list('pk', 'parent_id'):
+            children[parent_id].append(pk)
+        subtree = []
+        stack = [comment.pk]
+        while stack:
+            replies = children.pop(stack.pop(), [])
+            subtree += replies
+            stack += replies
+        if subtree:
+            model.objects.filter(pk__in=subtree).update(root_id=comment.root_id or comment.pk)
+
+
+def get_replies_data(serializer, comment):
+    """
+    Serialize a comment's replies with the serializer's own class, from the
+    prefetched 'comment_children' map when the view supplied one.
+    """
+    children = serializer.context.get('comment_children')
+    if children is not None:
+        replies = children.get(comment.pk, [])
+    else:
+        replies = comment.replies.select_related('author')
+    return type(serializer)(replies, many=True, context=serializer.context).data
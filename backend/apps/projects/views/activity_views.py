@@ -2,36 +2,36 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
-from ..models import Project
+from django.utils.dateparse import parse_datetime
 from ..serializers import ProjectActivitySerializer
+from ..permissions import get_project_role, IsProjectEditorOrReadOnly
+from ..pagination import ActivityCursorPagination
     
 
 @api_view(['GET', 'POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectEditorOrReadOnly])
 def project_activities(request, project_id):
-    project = get_object_or_404(Project, pk=project_id)
-    
-    # Check permissions
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+    project = get_project_role(request, project_id).project
     
     if request.method == 'GET':
-        activities = project.activities.all()
-        serializer = ProjectActivitySerializer(activities, many=True)
-        return Response(serializer.data)
-    
-    elif request.method == 'POST':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
+        activities = project.activities.select_related('user')
         
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
+        # Optional lower bound, e.g. to poll for entries newer than the last seen one
+        since = request.query_params.get('since')
+        if since:
+            since_value = parse_datetime(since)
+            if since_value is None:
+                return Response({'since': 'Expected an ISO 8601 datetime.'}, status=status.HTTP_400_BAD_REQUEST)
+            activities = activities.filter(created_at__gt=since_value)
         
+        paginator = ActivityCursorPagination()
+        page = paginator.paginate_queryset(activities, request)
+        serializer = ProjectActivitySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
+    elif request.method == 'POST':
         serializer = ProjectActivitySerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            serializer.save(project)
+            serializer.save(project=project)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
@@ -3,20 +3,16 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from ..models import Project, ProjectFile
+from ..models import ProjectFile
 from ..serializers import ProjectFileSerializer
     
 from ..ProjectHelper import log_project_activity
+from ..permissions import get_project_role, IsProjectEditorOrReadOnly
 
 @api_view(['GET', 'POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectEditorOrReadOnly])
 def project_files(request, project_id):
-    project = get_object_or_404(Project, pk=project_id)
-    
-    # Check permissions
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+    project = get_project_role(request, project_id).project
     
     if request.method == 'GET':
         files = project.files.all()
@@ -24,13 +20,6 @@ def project_files(request, project_id):
         return Response(serializer.data)
     
     elif request.method == 'POST':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         serializer = ProjectFileSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             file_instance = serializer.save(project=project)
@@ -47,23 +36,11 @@ def project_files(request, project_id):
 
 
 @api_view(['DELETE'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectEditorOrReadOnly])
 def project_file_detail(request, project_id, file_id):
-    project = get_object_or_404(Project, pk=project_id)
+    project = get_project_role(request, project_id).project
     file_obj = get_object_or_404(ProjectFile, pk=file_id, project=project)
     
-    # Check permissions
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
-    
-    # Check write permissions
-    membership = project.memberships.filter(user=request.user).first()
-    user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-    
-    if user_role not in ['owner', 'editor']:
-        return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-    
     file_title = file_obj.title
     file_obj.delete()
     
@@ -3,20 +3,16 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from ..models import Project, ProjectLink
+from ..models import ProjectLink
 from ..serializers import ProjectLinkSerializer
     
 from ..ProjectHelper import log_project_activity
+from ..permissions import get_project_role, IsProjectEditorOrReadOnly
 
 @api_view(['GET', 'POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectEditorOrReadOnly])
 def project_links(request, project_id):
-    project = get_object_or_404(Project, pk=project_id)
-    
-    # Check permissions
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+    project = get_project_role(request, project_id).project
     
     if request.method == 'GET':
         links = project.links.all()
@@ -24,13 +20,6 @@ def project_links(request, project_id):
         return Response(serializer.data)
     
     elif request.method == 'POST':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         serializer = ProjectLinkSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             link_instance = serializer.save(project=project)
@@ -47,28 +36,16 @@ def project_links(request, project_id):
 
 
 @api_view(['GET', 'PATCH', 'DELETE'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectEditorOrReadOnly])
 def project_link_detail(request, project_id, link_id):
-    project = get_object_or_404(Project, pk=project_id)
+    project = get_project_role(request, project_id).project
     link = get_object_or_404(ProjectLink, pk=link_id, project=project)
     
-    # Check permissions
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
-    
     if request.method == 'GET':
         serializer = ProjectLinkSerializer(link)
         return Response(serializer.data)
     
     elif request.method == 'PATCH':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         old_data = {
             'title': project.title,
             'status': project.status,
@@ -98,12 +75,5 @@ def project_link_detail(request, project_id, link_id):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     elif request.method == 'DELETE':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         link.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -3,10 +3,12 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
 from django.contrib.auth.models import User
-from ..models import Project, ProjectMembership
+from ..models import ProjectMembership
 from ..serializers import ProjectMembershipSerializer, UserSerializer
+from ..ProjectHelper import log_project_activity
+from ..permissions import get_project_role, IsProjectMember
+from apps.search.people import search_people
     
 
 
@@ -17,28 +19,21 @@ def search_users(request):
     if len(query) < 2:
         return Response([])
     
-    users = User.objects.filter(
-        Q(first_name__icontains=query) | 
-        Q(last_name__icontains=query) | 
-        Q(email__icontains=query)
-    ).exclude(id=request.user.id)[:10]
+    # Key lookups with the caller's project colleagues first (apps/search/people.py)
+    users = search_people(request.user, query, limit=10)
     
     serializer = UserSerializer(users, many=True)
     return Response(serializer.data)
 
 @api_view(['GET', 'POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectMember])
 def project_members(request, project_id):
-    project = get_object_or_404(Project, pk=project_id)
-    
-    # Check if user has access to the project
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+    project_role = get_project_role(request, project_id)
+    project = project_role.project
     
     if request.method == 'GET':
         # Return all project members
-        memberships = project.memberships.all()
+        memberships = project.memberships.select_related('user')
         serializer = ProjectMembershipSerializer(memberships, many=True)
         return Response(serializer.data)
     
@@ -50,7 +45,7 @@ def project_members(request, project_id):
         print(f'DEBUG: Current user: {request.user.email}')
         
         # Add new member (only owner can do this)
-        if project.owner != request.user:
+        if not project_role.is_owner:
             print(f'DEBUG: Permission denied - not owner')
             return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
         
@@ -106,17 +101,22 @@ def project_members(request, project_id):
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['PATCH', 'DELETE'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectMember])
 def project_member_detail(request, project_id, member_id):
-    project = get_object_or_404(Project, pk=project_id)
-    membership = get_object_or_404(ProjectMembership, pk=member_id, project=project)
+    project_role = get_project_role(request, project_id)
+    project = project_role.project
     
-    if project.owner != request.user:
+    if not project_role.is_owner:
         return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
     
+    membership = get_object_or_404(
+        ProjectMembership.objects.select_related('user'), pk=member_id, project=project
+    )
+    
     if request.method == 'PATCH':
         role = request.data.get('role')
         if role in ['viewer', 'editor']:
+            old_role = membership.role
             membership.role = role
             membership.save()
             # Log the activity
@@ -2,41 +2,40 @@ from rest_framework import status, generics
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
-from django.db.models import Q
-from ..models import Project
+from django.db.models import F, OuterRef, Prefetch
+from ..models import Project, ProjectMembership, ProjectTopic
 from ..serializers import ProjectSerializer
+from ..permissions import get_project_role, IsProjectEditorOrReadOnly
+from ..queries import subquery_count
+from ..stats import get_project_stats
 
 class ProjectListCreateView(generics.ListCreateAPIView):
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        user = self.request.user
+        # Everything ProjectSerializer reads comes from this query plus one
+        # memberships prefetch, however many projects the user has
         return Project.objects.filter(
-            Q(owner=user) | Q(memberships__user=user)
-        ).distinct()
+            access_entries__user=self.request.user
+        ).select_related('owner', 'task_rollup').annotate(
+            user_role=F('access_entries__role'),
+            topics_count=subquery_count(ProjectTopic.objects.filter(project=OuterRef('pk'))),
+        ).prefetch_related(
+            Prefetch('memberships', queryset=ProjectMembership.objects.select_related('user'))
+        )
 
 @api_view(['GET', 'PATCH', 'DELETE'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectEditorOrReadOnly])
 def project_detail(request, pk):
-    project = get_object_or_404(Project, pk=pk)
-    
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+    project_role = get_project_role(request, pk)
+    project = project_role.project
     
     if request.method == 'GET':
         serializer = ProjectSerializer(project, context={'request': request})
         return Response(serializer.data)
     
     elif request.method == 'PATCH':
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         serializer = ProjectSerializer(project, data=request.data, partial=True, context={'request': request})
         if serializer.is_valid():
             serializer.save()
@@ -44,7 +43,7 @@ def project_detail(request, pk):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     elif request.method == 'DELETE':
-        if project.owner != request.user:
+        if not project_role.is_owner:
             return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
         
         project.delete()
@@ -53,13 +52,4 @@ def project_detail(request, pk):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def project_stats(request):
-    user = request.user
-    projects = Project.objects.filter(Q(owner=user) | Q(memberships__user=user)).distinct()
-    
-    return Response({
-        'totalProjects': projects.count(),
-        'activeProjects': projects.filter(status='in_progress').count(),
-        'completedProjects': projects.filter(status='completed').count(),
-        'onHoldProjects': projects.filter(status='on_hold').count(),
-        'planningProjects': projects.filter(status='planning').count(),
-    })
+    return Response(get_project_stats(request.user))
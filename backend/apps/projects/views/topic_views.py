@@ -3,7 +3,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from ..models import Project, ProjectTopic, TopicNote, TopicLink, TopicMedia, TopicTag, TopicComment
+from ..models import ProjectTopic, TopicNote, TopicLink, TopicMedia, TopicTag, TopicComment
 from ..serializers import (
     ProjectTopicSerializer, 
     ProjectTopicDetailSerializer,
@@ -14,31 +14,22 @@ from ..serializers import (
     TopicCommentSerializer
 )
 from ..ProjectHelper import log_project_activity
+from ..permissions import get_project_role, IsProjectMember, IsProjectEditorOrReadOnly
+from ..pagination import CommentThreadPagination
+from ..threads import load_reply_tree
 
 
 @api_view(['GET', 'POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectEditorOrReadOnly])
 def project_topics(request, project_id):
-    project = get_object_or_404(Project, pk=project_id)
-    
-    # Check permissions
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+    project = get_project_role(request, project_id).project
     
     if request.method == 'GET':
-        topics = project.topics.all()
+        topics = project.topics.select_related('created_by').prefetch_related('tags')
         serializer = ProjectTopicSerializer(topics, many=True)
         return Response(serializer.data)
     
     elif request.method == 'POST':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         serializer = ProjectTopicSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             topic = serializer.save(project=project)
@@ -56,28 +47,16 @@ def project_topics(request, project_id):
 
 
 @api_view(['GET', 'PATCH', 'DELETE'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectEditorOrReadOnly])
 def topic_detail(request, project_id, topic_id):
-    project = get_object_or_404(Project, pk=project_id)
+    project = get_project_role(request, project_id).project
     topic = get_object_or_404(ProjectTopic, pk=topic_id, project=project)
     
-    # Check permissions
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
-    
     if request.method == 'GET':
         serializer = ProjectTopicDetailSerializer(topic)
         return Response(serializer.data)
     
     elif request.method == 'PATCH':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         serializer = ProjectTopicSerializer(topic, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -93,13 +72,6 @@ def topic_detail(request, project_id, topic_id):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     elif request.method == 'DELETE':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         topic_title = topic.title
         topic.delete()
         
@@ -115,29 +87,17 @@ def topic_detail(request, project_id, topic_id):
 
 # Notes endpoints
 @api_view(['GET', 'POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectEditorOrReadOnly])
 def topic_notes(request, project_id, topic_id):
-    project = get_object_or_404(Project, pk=project_id)
+    project = get_project_role(request, project_id).project
     topic = get_object_or_404(ProjectTopic, pk=topic_id, project=project)
     
-    # Check permissions
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
-    
     if request.method == 'GET':
         notes = topic.notes.all()
         serializer = TopicNoteSerializer(notes, many=True)
         return Response(serializer.data)
     
     elif request.method == 'POST':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         serializer = TopicNoteSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             note = serializer.save(topic=topic)
@@ -155,29 +115,17 @@ def topic_notes(request, project_id, topic_id):
 
 # Media endpoints
 @api_view(['GET', 'POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectEditorOrReadOnly])
 def topic_media(request, project_id, topic_id):
-    project = get_object_or_404(Project, pk=project_id)
+    project = get_project_role(request, project_id).project
     topic = get_object_or_404(ProjectTopic, pk=topic_id, project=project)
     
-    # Check permissions
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
-    
     if request.method == 'GET':
         media = topic.media.all()
         serializer = TopicMediaSerializer(media, many=True)
         return Response(serializer.data)
     
     elif request.method == 'POST':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         serializer = TopicMediaSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             media_item = serializer.save(topic=topic)
@@ -193,29 +141,17 @@ def topic_media(request, project_id, topic_id):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET', 'PATCH', 'DELETE'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectEditorOrReadOnly])
 def topic_note_detail(request, project_id, topic_id, note_id):
-    project = get_object_or_404(Project, pk=project_id)
+    project = get_project_role(request, project_id).project
     topic = get_object_or_404(ProjectTopic, pk=topic_id, project=project)
     note = get_object_or_404(TopicNote, pk=note_id, topic=topic)
     
-    # Check permissions
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
-    
     if request.method == 'GET':
         serializer = TopicNoteSerializer(note)
         return Response(serializer.data)
     
     elif request.method == 'PATCH':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         serializer = TopicNoteSerializer(note, data=request.data, partial=True, context={'request': request})
         if serializer.is_valid():
             serializer.save()
@@ -231,13 +167,6 @@ def topic_note_detail(request, project_id, topic_id, note_id):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     elif request.method == 'DELETE':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         note_title = note.title
         note.delete()
         
@@ -252,29 +181,17 @@ def topic_note_detail(request, project_id, topic_id, note_id):
 
 
 @api_view(['GET', 'POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectEditorOrReadOnly])
 def topic_links(request, project_id, topic_id):
-    project = get_object_or_404(Project, pk=project_id)
+    project = get_project_role(request, project_id).project
     topic = get_object_or_404(ProjectTopic, pk=topic_id, project=project)
     
-    # Check permissions
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
-    
     if request.method == 'GET':
         links = topic.topic_links.all()
         serializer = TopicLinkSerializer(links, many=True)
         return Response(serializer.data)
     
     elif request.method == 'POST':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         serializer = TopicLinkSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             link = serializer.save(topic=topic)
@@ -291,21 +208,21 @@ def topic_links(request, project_id, topic_id):
 
 
 @api_view(['GET', 'POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectMember])
 def topic_comments(request, project_id, topic_id):
-    project = get_object_or_404(Project, pk=project_id)
+    project = get_project_role(request, project_id).project
     topic = get_object_or_404(ProjectTopic, pk=topic_id, project=project)
     
-    # Check permissions
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
-    
     if request.method == 'GET':
-        # Only get top-level comments (replies are nested in serializer)
-        comments = topic.comments.filter(parent=None)
-        serializer = TopicCommentSerializer(comments, many=True)
-        return Response(serializer.data)
+        # Page through top-level comments; their replies load in one query
+        paginator = CommentThreadPagination()
+        comments = paginator.paginate_queryset(
+            topic.comments.filter(parent=None).select_related('author'), request
+        )
+        serializer = TopicCommentSerializer(comments, many=True, context={
+            'request': request, 'comment_children': load_reply_tree(comments)
+        })
+        return paginator.get_paginated_response(serializer.data)
     
     elif request.method == 'POST':
         serializer = TopicCommentSerializer(data=request.data, context={'request': request})
@@ -324,29 +241,17 @@ def topic_comments(request, project_id, topic_id):
 
 
 @api_view(['GET', 'POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectEditorOrReadOnly])
 def topic_tags(request, project_id, topic_id):
-    project = get_object_or_404(Project, pk=project_id)
+    project = get_project_role(request, project_id).project
     topic = get_object_or_404(ProjectTopic, pk=topic_id, project=project)
     
-    # Check permissions
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
-    
     if request.method == 'GET':
         tags = topic.tags.all()
         serializer = TopicTagSerializer(tags, many=True)
         return Response(serializer.data)
     
     elif request.method == 'POST':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         serializer = TopicTagSerializer(data=request.data)
         if serializer.is_valid():
             tag = serializer.save(topic=topic)
@@ -354,29 +259,17 @@ def topic_tags(request, project_id, topic_id):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET', 'PATCH', 'DELETE'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectEditorOrReadOnly])
 def topic_link_detail(request, project_id, topic_id, link_id):
-    project = get_object_or_404(Project, pk=project_id)
+    project = get_project_role(request, project_id).project
     topic = get_object_or_404(ProjectTopic, pk=topic_id, project=project)
     link = get_object_or_404(TopicLink, pk=link_id, topic=topic)
     
-    # Check permissions
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
-    
     if request.method == 'GET':
         serializer = TopicLinkSerializer(link)
         return Response(serializer.data)
     
     elif request.method == 'PATCH':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         serializer = TopicLinkSerializer(link, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -392,13 +285,6 @@ def topic_link_detail(request, project_id, topic_id, link_id):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     elif request.method == 'DELETE':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         link_title = link.title
         link.delete()
         
@@ -413,29 +299,17 @@ def topic_link_detail(request, project_id, topic_id, link_id):
 
 
 @api_view(['GET', 'PATCH', 'DELETE'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectEditorOrReadOnly])
 def topic_media_detail(request, project_id, topic_id, media_id):
-    project = get_object_or_404(Project, pk=project_id)
+    project = get_project_role(request, project_id).project
     topic = get_object_or_404(ProjectTopic, pk=topic_id, project=project)
     media = get_object_or_404(TopicMedia, pk=media_id, topic=topic)
     
-    # Check permissions
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
-    
     if request.method == 'GET':
         serializer = TopicMediaSerializer(media)
         return Response(serializer.data)
     
     elif request.method == 'PATCH':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         serializer = TopicMediaSerializer(media, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -451,13 +325,6 @@ def topic_media_detail(request, project_id, topic_id, media_id):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     elif request.method == 'DELETE':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         media_title = media.title
         media_type = media.media_type
         media.delete()
@@ -473,19 +340,16 @@ def topic_media_detail(request, project_id, topic_id, media_id):
 
 
 @api_view(['GET', 'PATCH', 'DELETE'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectMember])
 def topic_comment_detail(request, project_id, topic_id, comment_id):
-    project = get_object_or_404(Project, pk=project_id)
+    project = get_project_role(request, project_id).project
     topic = get_object_or_404(ProjectTopic, pk=topic_id, project=project)
     comment = get_object_or_404(TopicComment, pk=comment_id, topic=topic)
     
-    # Check permissions
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
-    
     if request.method == 'GET':
-        serializer = TopicCommentSerializer(comment)
+        serializer = TopicCommentSerializer(comment, context={
+            'request': request, 'comment_children': load_reply_tree([comment])
+        })
         return Response(serializer.data)
     
     elif request.method == 'PATCH':
@@ -501,10 +365,7 @@ def topic_comment_detail(request, project_id, topic_id, comment_id):
     
     elif request.method == 'DELETE':
         # Comment author or project owner/editors can delete
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if not (comment.author == request.user or user_role in ['owner', 'editor']):
+        if not (comment.author == request.user or get_project_role(request, project_id).can_edit):
             return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
         
         comment.delete()
@@ -520,29 +381,17 @@ def topic_comment_detail(request, project_id, topic_id, comment_id):
 
 
 @api_view(['GET', 'PATCH', 'DELETE'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsProjectEditorOrReadOnly])
 def topic_tag_detail(request, project_id, topic_id, tag_id):
-    project = get_object_or_404(Project, pk=project_id)
+    project = get_project_role(request, project_id).project
     topic = get_object_or_404(ProjectTopic, pk=topic_id, project=project)
     tag = get_object_or_404(TopicTag, pk=tag_id, topic=topic)
     
-    # Check permissions
-    if not (project.owner == request.user or 
-            project.memberships.filter(user=request.user).exists()):
-        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
-    
     if request.method == 'GET':
         serializer = TopicTagSerializer(tag)
         return Response(serializer.data)
     
     elif request.method == 'PATCH':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         serializer = TopicTagSerializer(tag, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -550,13 +399,6 @@ def topic_tag_detail(request, project_id, topic_id, tag_id):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     elif request.method == 'DELETE':
-        # Check write permissions
-        membership = project.memberships.filter(user=request.user).first()
-        user_role = 'owner' if project.owner == request.user else membership.role if membership else None
-        
-        if user_role not in ['owner', 'editor']:
-            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
-        
         tag_name = tag.name
         tag.delete()
         
@@ -0,0 +1,328 @@
+import hashlib
+import json
+import re
+from collections import Counter
+
+from django.apps import apps as django_apps
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+
+TOKEN_RE = re.compile(r'\w+')
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 64
+
+# Title tokens outrank body tokens; weights are capped so one long note
+# repeating a word does not bury everything else
+TITLE_WEIGHT = 3
+MAX_WEIGHT = 100
+MAX_TERMS = 500
+SNIPPET_LENGTH = 200
+
+SCOPE_FIELDS = ('project_id', 'idea_id', 'topic_id', 'task_id', 'user_id', 'assignee_id')
+
+
+def tokenize(text):
+    """Lowercased word tokens of text, in order"""
+    return [
+        token for token in TOKEN_RE.findall((text or '').lower())
+        if MIN_TOKEN_LENGTH <= len(token) <= MAX_TOKEN_LENGTH
+    ]
+
+
+class Source:
+    """
+    How one model is indexed. title and body map an instance to its text,
+    scope to the SearchDocument visibility fields. fields lists the model
+    fields those read, so saves with other update_fields are skipped.
+    Documents whose task is a task being reindexed inherit its scope when
+    scope_children is set.
+    """
+
+    def __init__(self, entity_type, model, fields, title, body, scope,
+                 label=None, select_related=(), scope_children=False):
+        self.entity_type = entity_type
+        self.model = model
+        self.fields = set(fields)
+        self.title = title
+        self.body = body
+        self.scope = scope
+        self.label = label or title
+        self.select_related = select_related
+        self.scope_children = scope_children
+
+    def get_model(self):
+        return django_apps.get_model(self.model)
+
+
+def _task_scope(task):
+    return {
+        'project_id': task.project_id,
+        'idea_id': task.idea_id,
+        'user_id': task.created_by_id,
+        'assignee_id': task.assignee_id,
+    }
+
+
+SOURCES = [
+    Source(
+        'project', 'projects.Project', ['title', 'description'],
+        title=lambda project: project.title,
+        body=lambda project: [project.description],
+        scope=lambda project: {'project_id': project.pk},
+    ),
+    Source(
+        'topic', 'projects.ProjectTopic', ['title', 'description', 'project'],
+        title=lambda topic: topic.title,
+        body=lambda topic: [topic.description],
+        scope=lambda topic: {'project_id': topic.project_id, 'topic_id': topic.pk},
+    ),
+    Source(
+        'topic_note', 'projects.TopicNote', ['title', 'content', 'topic'],
+        title=lambda note: note.title,
+        body=lambda note: [note.content],
+        scope=lambda note: {'project_id': note.topic.project_id, 'topic_id': note.topic_id},
+        select_related=['topic'],
+    ),
+    Source(
+        'topic_comment', 'projects.TopicComment', ['content', 'topic'],
+        title=lambda comment: '',
+        label=lambda comment: comment.topic.title,
+        body=lambda comment: [comment.content],
+        scope=lambda comment: {'project_id': comment.topic.project_id, 'topic_id': comment.topic_id},
+        select_related=['topic'],
+    ),
+    Source(
+        'task', 'tasks.Task',
+        ['title', 'description', 'tags', 'project', 'idea', 'created_by', 'assignee'],
+        title=lambda task: task.title,
+        body=lambda task: [task.description, (task.tags or '').replace(',', ' ')],
+        scope=_task_scope,
+        scope_children=True,
+    ),
+    Source(
+        'task_comment', 'tasks.TaskComment', ['content', 'task'],
+        title=lambda comment: '',
+        label=lambda comment: comment.task.title,
+        body=lambda comment: [comment.content],
+        scope=lambda comment: {**_task_scope(comment.task), 'task_id': comment.task_id},
+        select_related=['task'],
+    ),
+    Source(
+        'idea', 'ideas.Idea',
+        ['title', 'description', 'problem_statement', 'solution_overview', 'target_audience', 'tags', 'owner'],
+        title=lambda idea: idea.title,
+        body=lambda idea: [
+            idea.description, idea.problem_statement, idea.solution_overview,
+            idea.target_audience, (idea.tags or '').replace(',', ' '),
+        ],
+        scope=lambda idea: {'idea_id': idea.pk},
+    ),
+    Source(
+        'idea_note', 'ideas.IdeaNote', ['title', 'content', 'idea'],
+        title=lambda note: note.title,
+        body=lambda note: [note.content],
+        scope=lambda note: {'idea_id': note.idea_id},
+    ),
+]
+
+SOURCES_BY_TYPE = {source.entity_type: source for source in SOURCES}
+
+
+def _term_weights(title, body):
+    weights = Counter()
+    for token in tokenize(title):
+        weights[token] += TITLE_WEIGHT
+    for text in body:
+        weights.update(tokenize(text))
+    return [(term, min(weight, MAX_WEIGHT)) for term, weight in weights.most_common(MAX_TERMS)]
+
+
+def _snippet(body):
+    """The start of the main text, whitespace collapsed"""
+    return ' '.join(body[0].split())[:SNIPPET_LENGTH] if body else ''
+
+
+def _document(source, obj):
+    """(title, body, SearchDocument fields) of obj"""
+    title = source.title(obj) or ''
+    body = [text or '' for text in source.body(obj)]
+    scope = dict.fromkeys(SCOPE_FIELDS)
+    scope.update(source.scope(obj))
+    digest = hashlib.sha1(
+        json.dumps([title, body, scope], sort_keys=True).encode('utf-8')
+    ).hexdigest()
+    return title, body, {
+        'title': (title or source.label(obj))[:255],
+        'snippet': _snippet(body),
+        'digest': digest,
+        **scope,
+    }
+
+
+def _source_for(model):
+    return next(source for source in SOURCES if source.get_model() is model)
+
+
+def index_object(source, obj):
+    """
+    Write the document and postings of obj. The stored digest makes saves
+    that change nothing indexed cost a single lookup.
+    """
+    SearchDocument = django_apps.get_model('search', 'SearchDocument')
+    SearchTerm = django_apps.get_model('search', 'SearchTerm')
+
+    title, body, fields = _document(source, obj)
+    scope = {field: fields[field] for field in SCOPE_FIELDS}
+    lookup = {'entity_type': source.entity_type, 'object_id': obj.pk}
+    current = SearchDocument.objects.filter(**lookup).values('id', 'digest', *SCOPE_FIELDS).first()
+    if current is not None and current['digest'] == fields['digest']:
+        return
+
+    with transaction.atomic():
+        if current is None:
+            document_id = SearchDocument.objects.create(**lookup, **fields).pk
+        else:
+            document_id = current['id']
+            SearchDocument.objects.filter(pk=document_id).update(updated_at=timezone.now(), **fields)
+            SearchTerm.objects.filter(document_id=document_id).delete()
+        SearchTerm.objects.bulk_create([
+            SearchTerm(document_id=document_id, term=term, weight=weight)
+            for term, weight in _term_weights(title, body)
+        ])
+
+    if source.scope_children and current is not None:
+        inherited = {field: scope[field] for field in ('project_id', 'idea_id', 'user_id', 'assignee_id')}
+        if any(current[field] != value for field, value in inherited.items()):
+            SearchDocument.objects.filter(task_id=obj.pk).exclude(
+                entity_type=source.entity_type
+            ).update(**inherited)
+
+
+def reindex(model, pks):
+    """
+    Reindex objects of model after writes that bypass the signals, in a
+    number of statements that does not grow with len(pks): the stored
+    digests are read in one query, changed documents rewritten with one
+    bulk_update, and their postings replaced with one DELETE and one
+    bulk_create.
+    """
+    SearchDocument = django_apps.get_model('search', 'SearchDocument')
+    source = _source_for(model)
+    objs = list(model.objects.filter(pk__in=pks).select_related(*source.select_related))
+    current = {
+        row['object_id']: row for row in SearchDocument.objects.filter(
+            entity_type=source.entity_type, object_id__in=[obj.pk for obj in objs]
+        ).values('id', 'object_id', 'digest', *SCOPE_FIELDS)
+    }
+    _index_objects(source, objs, current)
+
+
+def remove_object(source, obj):
+    SearchDocument = django_apps.get_model('search', 'SearchDocument')
+    SearchDocument.objects.filter(entity_type=source.entity_type, object_id=obj.pk).delete()
+
+
+def index_new_objects(model, objs):
+    """
+    Index objects of model inserted with bulk_create, which sends no
+    signals: the documents go in with one bulk_create, their ids are read
+    back by the unique (entity_type, object_id), and one more bulk_create
+    writes the postings. The objects must not be indexed yet.
+    """
+    _index_objects(_source_for(model), objs, {})
+
+
+def _index_objects(source, objs, current):
+    """
+    Write the documents and postings of objs in bulk. current maps the
+    object ids already indexed to their stored document (id, digest, scope);
+    those whose digest still matches are left alone.
+    """
+    SearchDocument = django_apps.get_model('search', 'SearchDocument')
+    SearchTerm = django_apps.get_model('search', 'SearchTerm')
+
+    new = []
+    stale = []
+    weights = {}
+    rescoped = {}
+    now = timezone.now()
+    for obj in objs:
+        title, body, fields = _document(source, obj)
+        stored = current.get(obj.pk)
+        if stored is not None and stored['digest'] == fields['digest']:
+            continue
+        weights[obj.pk] = _term_weights(title, body)
+        if stored is None:
+            new.append(SearchDocument(entity_type=source.entity_type, object_id=obj.pk, **fields))
+            continue
+        stale.append(SearchDocument(pk=stored['id'], updated_at=now, **fields))
+        if source.scope_children:
+            inherited = tuple((field, fields[field]) for field in ('project_id', 'idea_id', 'user_id', 'assignee_id'))
+            if any(stored[field] != value for field, value in inherited):
+                rescoped.setdefault(inherited, []).append(obj.pk)
+    if not weights:
+        return
+
+    with transaction.atomic():
+        if stale:
+            SearchDocument.objects.bulk_update(
+                stale, ['title', 'snippet', 'digest', 'updated_at', *SCOPE_FIELDS], batch_size=500
+            )
+            SearchTerm.objects.filter(document_id__in=[document.pk for document in stale]).delete()
+        SearchDocument.objects.bulk_create(new, batch_size=1000)
+
+        document_ids = SearchDocument.objects.filter(
+            entity_type=source.entity_type, object_id__in=list(weights)
+        ).values_list('object_id', 'pk')
+        SearchTerm.objects.bulk_create([
+            SearchTerm(document_id=document_id, term=term, weight=weight)
+            for object_id, document_id in document_ids
+            for term, weight in weights[object_id]
+        ], batch_size=1000)
+
+        # Documents of children follow their task's scope, one UPDATE per
+        # distinct scope rather than per task
+        for inherited, object_ids in rescoped.items():
+            SearchDocument.objects.filter(task_id__in=object_ids).exclude(
+                entity_type=source.entity_type
+            ).update(**dict(inherited))
+
+
+def remove_objects(model, pks):
+    """Drop the documents of objects of model deleted while the signals were deferred"""
+    source = _source_for(model)
+    SearchDocument = django_apps.get_model('search', 'SearchDocument')
+    SearchDocument.objects.filter(entity_type=source.entity_type, object_id__in=pks).delete()
+
+
+def rescope_tasks(task_ids, **scope):
+    """
+    Copy a set-based update of task scope columns (assignee_id, ...) onto the
+    documents of the tasks and of their comments in one UPDATE
+    """
+    SearchDocument = django_apps.get_model('search', 'SearchDocument')
+    SearchDocument.objects.filter(
+        Q(entity_type='task', object_id__in=task_ids) | Q(task_id__in=task_ids)
+    ).update(**scope)
+
+
+def rebuild_index(entity_types=None):
+    """
+    Reindex every object of the given sources (all when None) and drop
+    documents whose object is gone. Returns the number of objects visited.
+    """
+    SearchDocument = django_apps.get_model('search', 'SearchDocument')
+    visited = 0
+    for source in SOURCES:
+        if entity_types and source.entity_type not in entity_types:
+            continue
+        objects = source.get_model().objects.select_related(*source.select_related)
+        for obj in objects.order_by('pk').iterator(chunk_size=500):
+            index_object(source, obj)
+            visited += 1
+        SearchDocument.objects.filter(entity_type=source.entity_type).exclude(
+            object_id__in=source.get_model().objects.values('pk')
+        ).delete()
+    return visited
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.search.indexing import SOURCES_BY_TYPE, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Reindex searchable objects and drop documents of deleted ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type', action='append', dest='types',
+            help=f"Only reindex this entity type (repeatable): {', '.join(SOURCES_BY_TYPE)}"
+        )
+
+    def handle(self, *args, **options):
+        types = options['types']
+        unknown = set(types or []) - set(SOURCES_BY_TYPE)
+        if unknown:
+            raise CommandError(f"Unknown types: {', '.join(sorted(unknown))}")
+
+        visited = rebuild_index(types)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {visited} objects'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from apps.search.people import rebuild_user_keys
+
+
+class Command(BaseCommand):
+    help = 'Rewrite the user typeahead keys from names and emails'
+
+    def handle(self, *args, **options):
+        count = rebuild_user_keys()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} users'))
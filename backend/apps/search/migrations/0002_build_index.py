@@ -0,0 +1,13 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # The index used to be built here. That ran a full reindex inside
+    # migrate, with code that follows the live models; it is now built
+    # with `manage.py rebuild_search_index` after migrating.
+
+    dependencies = [
+        ('search', '0001_initial'),
+    ]
+
+    operations = []
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('search', '0002_build_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('prefix', 'Prefix'), ('trigram', 'Trigram')], max_length=10)),
+                ('key', models.CharField(max_length=12)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_keys', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='usersearchkey',
+            constraint=models.UniqueConstraint(fields=('kind', 'key', 'user'), name='search_user_key_unique'),
+        ),
+    ]
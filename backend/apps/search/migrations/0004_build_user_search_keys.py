@@ -0,0 +1,55 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+
+# A frozen copy of apps.search.people as of this migration, so later
+# changes to the typeahead keys do not change what this migration does
+WORD_RE = re.compile(r'[^\W_]+')
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_LENGTH = 12
+TRIGRAM_LENGTH = 3
+USER_FIELDS = ('first_name', 'last_name', 'email')
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return WORD_RE.findall(text.lower())
+
+
+def user_keys(user):
+    keys = set()
+    for field in USER_FIELDS:
+        for word in normalize(getattr(user, field)):
+            for length in range(MIN_PREFIX_LENGTH, min(len(word), MAX_PREFIX_LENGTH) + 1):
+                keys.add(('prefix', word[:length]))
+            for start in range(len(word) - TRIGRAM_LENGTH + 1):
+                keys.add(('trigram', word[start:start + TRIGRAM_LENGTH]))
+    return keys
+
+
+def build_user_keys(apps, schema_editor):
+    Key = apps.get_model('search', 'UserSearchKey')
+    User = apps.get_model('auth', 'User')
+
+    Key.objects.all().delete()
+    batch = []
+    for user in User.objects.only(*USER_FIELDS).order_by('pk').iterator(chunk_size=1000):
+        batch += [Key(user_id=user.pk, kind=kind, key=key) for kind, key in user_keys(user)]
+        if len(batch) >= 10000:
+            Key.objects.bulk_create(batch)
+            batch = []
+    Key.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0003_user_search_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_user_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+from django.db import models
+from django.contrib.auth.models import User
+from apps.projects.models import Project, ProjectTopic
+from apps.ideas.models import Idea
+from apps.tasks.models import Task
+
+
+class SearchDocument(models.Model):
+    """
+    One indexed object (see apps/search/indexing.py for the sources). Besides
+    what is shown in results, a document carries the scope that decides who
+    may see it: members of its project or idea, plus the creator and
+    assignee of tasks and of the tasks that comments belong to.
+    """
+    entity_type = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    title = models.CharField(max_length=255)
+    snippet = models.TextField(blank=True)
+    # Hash of the indexed text and scope, so unchanged saves skip reindexing
+    digest = models.CharField(max_length=40)
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, related_name='+')
+    idea = models.ForeignKey(Idea, on_delete=models.CASCADE, null=True, related_name='+')
+    topic = models.ForeignKey(ProjectTopic, on_delete=models.CASCADE, null=True, related_name='+')
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, null=True, related_name='+')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, related_name='+')
+    assignee = models.ForeignKey(User, on_delete=models.CASCADE, null=True, related_name='+')
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['entity_type', 'object_id'], name='search_document_object_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.entity_type} #{self.object_id}: {self.title}"
+
+
+class SearchTerm(models.Model):
+    """Inverted index posting: a token of a document and its weight there"""
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='terms')
+    term = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['document', 'term'], name='search_term_document_unique'),
+        ]
+        indexes = [
+            # Lookups go from term to documents
+            models.Index(fields=['term', 'document'], name='search_term_lookup_idx'),
+        ]
+
+
+class UserSearchKey(models.Model):
+    """
+    Typeahead lookup row for a user (see apps/search/people.py): a prefix of
+    one of their normalized name or email tokens, or a trigram of one for
+    matches inside a token.
+    """
+    PREFIX = 'prefix'
+    TRIGRAM = 'trigram'
+    KIND_CHOICES = [
+        (PREFIX, 'Prefix'),
+        (TRIGRAM, 'Trigram'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_keys')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    key = models.CharField(max_length=12)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key', 'user'], name='search_user_key_unique'),
+        ]
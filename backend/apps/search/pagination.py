@@ -0,0 +1,9 @@
+from apps.projects.pagination import KeysetCursorPagination
+
+
+class SearchCursorPagination(KeysetCursorPagination):
+    """Best matches first; the cursor holds the boundary row's (score, id)"""
+    ordering = ('-score', 'id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,194 @@
+import hashlib
+import re
+import unicodedata
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count
+
+from apps.projects.models import ProjectAccess
+from .models import UserSearchKey
+
+
+WORD_RE = re.compile(r'[^\W_]+')
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_LENGTH = 12
+TRIGRAM_LENGTH = 3
+MAX_QUERY_WORDS = 4
+
+# Matches for a query are the same for every caller, so popular prefixes
+# ("jo", "an") are cached briefly in the process's 'typeahead' cache; only
+# the shared-project ranking is per caller
+CANDIDATES_TIMEOUT = 30
+CANDIDATES_LIMIT = 50
+
+USER_FIELDS = ('first_name', 'last_name', 'email')
+
+
+def normalize(text):
+    """Lowercased words of text with accents stripped"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return WORD_RE.findall(text.lower())
+
+
+def user_words(user):
+    words = []
+    for field in USER_FIELDS:
+        words += normalize(getattr(user, field))
+    return words
+
+
+def user_keys(user):
+    """The (kind, key) pairs a user is found under"""
+    keys = set()
+    for word in user_words(user):
+        for length in range(MIN_PREFIX_LENGTH, min(len(word), MAX_PREFIX_LENGTH) + 1):
+            keys.add((UserSearchKey.PREFIX, word[:length]))
+        for start in range(len(word) - TRIGRAM_LENGTH + 1):
+            keys.add((UserSearchKey.TRIGRAM, word[start:start + TRIGRAM_LENGTH]))
+    return keys
+
+
+def index_user(user):
+    """Bring a user's keys in line with their name and email"""
+    wanted = user_keys(user)
+    stored = set(UserSearchKey.objects.filter(user_id=user.pk).values_list('kind', 'key'))
+    if stored == wanted:
+        return
+
+    # Names and emails rarely change, so the keys are simply rewritten
+    with transaction.atomic():
+        UserSearchKey.objects.filter(user_id=user.pk).delete()
+        UserSearchKey.objects.bulk_create([
+            UserSearchKey(user_id=user.pk, kind=kind, key=key) for kind, key in wanted
+        ])
+
+
+def rebuild_user_keys(chunk_size=1000):
+    """Rewrite every user's keys in bulk; returns the number of users indexed"""
+    users = User.objects.only(*USER_FIELDS).order_by('pk')
+
+    UserSearchKey.objects.all().delete()
+    count = 0
+    batch = []
+    for user in users.iterator(chunk_size=chunk_size):
+        batch += [UserSearchKey(user_id=user.pk, kind=kind, key=key) for kind, key in user_keys(user)]
+        count += 1
+        if count % chunk_size == 0:
+            UserSearchKey.objects.bulk_create(batch)
+            batch = []
+    UserSearchKey.objects.bulk_create(batch)
+    return count
+
+
+def _query_words(query):
+    """Distinct words of the query; single letters have no keys and are dropped"""
+    words = [word for word in normalize(query) if len(word) >= MIN_PREFIX_LENGTH]
+    return list(dict.fromkeys(words))[:MAX_QUERY_WORDS]
+
+
+def _matches(user_words, words):
+    """Whether every query word starts or, with 3+ letters, occurs in one of the user's words"""
+    return all(
+        any(word in candidate if len(word) >= TRIGRAM_LENGTH else candidate.startswith(word)
+            for candidate in user_words)
+        for word in words
+    )
+
+
+def _prefix_matches(words):
+    """
+    User ids having a token starting with each word, one index lookup per
+    word. Words longer than the stored prefixes are looked up by their first
+    MAX_PREFIX_LENGTH letters and checked in full by the caller.
+    """
+    keys = {word[:MAX_PREFIX_LENGTH] for word in words}
+    return UserSearchKey.objects.filter(kind=UserSearchKey.PREFIX, key__in=keys).values('user_id').annotate(
+        hits=Count('key')
+    ).filter(hits=len(keys)).values('user_id')
+
+
+def _trigram_matches(words):
+    """User ids having every trigram of every word: candidates for matches inside tokens"""
+    grams = {
+        word[start:start + TRIGRAM_LENGTH]
+        for word in words
+        for start in range(len(word) - TRIGRAM_LENGTH + 1)
+    }
+    return UserSearchKey.objects.filter(kind=UserSearchKey.TRIGRAM, key__in=grams).values('user_id').annotate(
+        hits=Count('key')
+    ).filter(hits=len(grams)).values('user_id')
+
+
+def _verified(user_ids, words):
+    """The ids among user_ids whose names or email really match, in order"""
+    users = {
+        user.pk: user for user in User.objects.filter(pk__in=user_ids).only(*USER_FIELDS)
+    }
+    return [
+        user_id for user_id in user_ids
+        if user_id in users and _matches(user_words(users[user_id]), words)
+    ]
+
+
+def _candidates(words, limit):
+    """
+    Ids of users matching the words: prefix matches, then matches inside
+    tokens when those fall short. Trigram hits and long words are checked
+    against the actual names.
+    """
+    ids = list(_prefix_matches(words).order_by('user_id').values_list('user_id', flat=True)[:limit])
+    if any(len(word) > MAX_PREFIX_LENGTH for word in words):
+        ids = _verified(ids, words)
+
+    if len(ids) < limit and all(len(word) >= TRIGRAM_LENGTH for word in words):
+        inside = _trigram_matches(words).exclude(user_id__in=ids).order_by('user_id').values_list(
+            'user_id', flat=True
+        )[:limit]
+        ids += _verified(list(inside), words)[:limit - len(ids)]
+    return ids
+
+
+def cached_candidates(words):
+    # Query words may be long or non-ASCII; a digest keeps the key valid on
+    # every cache backend (memcached takes 250 ASCII characters at most)
+    digest = hashlib.md5(' '.join(words).encode()).hexdigest()
+    key = f'user_typeahead:{digest}'
+    cache = caches['typeahead']
+    ids = cache.get(key)
+    if ids is None:
+        ids = _candidates(words, CANDIDATES_LIMIT)
+        cache.set(key, ids, CANDIDATES_TIMEOUT)
+    return ids
+
+
+def search_people(caller, query, limit=10):
+    """
+    Users matching query, best first: people sharing a project with the
+    caller, then everyone else. The caller is left out.
+    """
+    words = _query_words(query)
+    if not words:
+        return []
+
+    colleagues = ProjectAccess.objects.filter(
+        project_id__in=ProjectAccess.objects.filter(user=caller).values('project_id')
+    ).exclude(user=caller).values('user_id')
+    shared = list(
+        _prefix_matches(words).filter(user_id__in=colleagues).order_by('user_id').values_list('user_id', flat=True)[:limit]
+    )
+    if any(len(word) > MAX_PREFIX_LENGTH for word in words):
+        shared = _verified(shared, words)
+
+    ids = shared
+    if len(ids) < limit:
+        ids = shared + [
+            user_id for user_id in cached_candidates(words)
+            if user_id != caller.pk and user_id not in shared
+        ]
+    ids = ids[:limit]
+
+    users = User.objects.in_bulk(ids)
+    return [users[user_id] for user_id in ids if user_id in users]
@@ -0,0 +1,97 @@
+from django.db.models import Count, Q, Sum
+
+from apps.ideas.models import Idea, IdeaMembership
+from apps.projects.models import ProjectAccess
+from .indexing import tokenize
+from .models import SearchDocument
+
+
+MAX_QUERY_TERMS = 8
+# A trailing word this long also matches longer terms it starts, so results
+# show up while the user is still typing it
+MIN_PREFIX_LENGTH = 3
+
+
+def parse_query(text):
+    """Split text into (exact terms, prefix term or None)"""
+    terms = list(dict.fromkeys(tokenize(text)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return [], None
+    if text[-1:].isspace() or len(terms[-1]) < MIN_PREFIX_LENGTH:
+        return terms, None
+    return terms[:-1], terms[-1]
+
+
+def match_documents(documents, text):
+    """
+    The documents containing every term of text, annotated with their score:
+    the summed weights of the matched postings. Lookups go through the
+    (term, document) index; the prefix term uses istartswith because its
+    LIKE 'x%' can range-scan that index, and terms are stored lowercased.
+    """
+    exact, prefix = parse_query(text)
+    if not exact and prefix is None:
+        return documents.none()
+
+    exact_match = Q(terms__term__in=exact)
+    prefix_match = Q(terms__term__istartswith=prefix)
+    if not exact:
+        matches = prefix_match
+    elif prefix is None:
+        matches = exact_match
+    else:
+        matches = exact_match | prefix_match
+
+    documents = documents.filter(matches).annotate(score=Sum('terms__weight'))
+    if exact:
+        documents = documents.annotate(exact_hits=Count('terms', filter=exact_match)).filter(exact_hits=len(exact))
+    if prefix is not None:
+        documents = documents.annotate(prefix_hits=Count('terms', filter=prefix_match)).filter(prefix_hits__gt=0)
+    return documents
+
+
+def visible_documents(user):
+    """Documents of the user's projects and ideas, and of tasks they created or are assigned"""
+    return SearchDocument.objects.filter(
+        Q(project_id__in=ProjectAccess.objects.filter(user=user).values('project_id')) |
+        Q(idea_id__in=Idea.objects.filter(owner=user).values('pk')) |
+        Q(idea_id__in=IdeaMembership.objects.filter(user=user).values('idea_id')) |
+        Q(user=user) |
+        Q(assignee=user)
+    )
+
+
+def search_documents(user, text, entity_types=None):
+    documents = visible_documents(user)
+    if entity_types:
+        documents = documents.filter(entity_type__in=entity_types)
+    return match_documents(documents, text)
+
+
+def count_by_type(documents):
+    """{entity_type: count} over matched documents"""
+    return dict(
+        SearchDocument.objects.filter(pk__in=documents.values('pk')).order_by().values(
+            'entity_type'
+        ).annotate(count=Count('pk')).values_list('entity_type', 'count')
+    )
+
+
+def matching_ids(entity_type, text):
+    """Subquery of the ids of entity_type objects matching text, for pk__in filters"""
+    return match_documents(SearchDocument.objects.filter(entity_type=entity_type), text).values('object_id')
+
+
+def search_filter(entity_type, text, fields):
+    """
+    Q for a ?search= filter on entity_type objects: through the index, or
+    icontains over fields while no document of that type is indexed yet
+    (before rebuild_search_index has run) and for text too short to hold a
+    term, so neither comes back empty.
+    """
+    if parse_query(text) != ([], None) and SearchDocument.objects.filter(entity_type=entity_type).exists():
+        return Q(pk__in=matching_ids(entity_type, text))
+    matches = Q()
+    for field in fields:
+        matches |= Q(**{f'{field}__icontains': text})
+    return matches
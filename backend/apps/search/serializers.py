@@ -0,0 +1,16 @@
+from rest_framework import serializers
+from .models import SearchDocument
+
+
+class SearchResultSerializer(serializers.ModelSerializer):
+    type = serializers.CharField(source='entity_type')
+    id = serializers.IntegerField(source='object_id')
+    score = serializers.IntegerField()
+    project = serializers.IntegerField(source='project_id')
+    idea = serializers.IntegerField(source='idea_id')
+    topic = serializers.IntegerField(source='topic_id')
+    task = serializers.IntegerField(source='task_id')
+
+    class Meta:
+        model = SearchDocument
+        fields = ['type', 'id', 'title', 'snippet', 'score', 'project', 'idea', 'topic', 'task', 'updated_at']
@@ -0,0 +1,41 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.tasks.bulk import signals_deferred
+from .indexing import SOURCES, index_object, remove_object
+from .people import USER_FIELDS, index_user
+
+
+def _connect(source):
+    model = source.get_model()
+
+    def reindex(sender, instance, raw=False, update_fields=None, **kwargs):
+        if raw or signals_deferred():
+            return
+        if update_fields is not None and not source.fields & set(update_fields):
+            return
+        index_object(source, instance)
+
+    def unindex(sender, instance, **kwargs):
+        if signals_deferred():
+            return
+        remove_object(source, instance)
+
+    # Connected per source, so the receivers need strong references
+    post_save.connect(reindex, sender=model, weak=False, dispatch_uid=f'search_index_{source.entity_type}')
+    post_delete.connect(unindex, sender=model, weak=False, dispatch_uid=f'search_unindex_{source.entity_type}')
+
+
+for source in SOURCES:
+    _connect(source)
+
+
+@receiver(post_save, sender=User)
+def update_user_search_keys(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the typeahead keys in step with names and email; logins only touch last_login"""
+    if raw:
+        return
+    if update_fields is not None and not set(USER_FIELDS) & set(update_fields):
+        return
+    index_user(instance)
@@ -0,0 +1,212 @@
+import importlib
+from unittest import mock
+
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.ideas.models import Idea, IdeaMembership, IdeaNote
+from apps.projects.models import Project, ProjectMembership, ProjectTopic, TopicNote
+from apps.tasks.models import Task, TaskComment
+from .models import SearchDocument, UserSearchKey
+from .people import cached_candidates
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.other = User.objects.create_user('other', 'other@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.project = Project.objects.create(title='Rocket launch', owner=self.user)
+        self.topic = ProjectTopic.objects.create(project=self.project, title='Propulsion', created_by=self.user)
+
+    def search(self, query, **params):
+        response = self.client.get('/api/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def matches(self, query, **params):
+        return [(result['type'], result['id']) for result in self.search(query, **params)['results']]
+
+    def test_ranks_title_matches_first_and_groups_by_type(self):
+        note = TopicNote.objects.create(
+            topic=self.topic, title='Fuel mix', content='Hydrogen and oxygen', created_by=self.user
+        )
+        task = Task.objects.create(
+            title='Order parts', description='Hydrogen fuel tanks', project=self.project, created_by=self.user
+        )
+
+        self.assertEqual(self.matches('fuel'), [('topic_note', note.pk), ('task', task.pk)])
+        self.assertEqual(self.search('fuel')['groups'], {'topic_note': 1, 'task': 1})
+        self.assertEqual(self.matches('fuel', type='task'), [('task', task.pk)])
+        # Every term must match; the last one also as a prefix
+        self.assertEqual(self.matches('hydrogen tan'), [('task', task.pk)])
+        self.assertEqual(self.matches('hydrogen propulsion'), [])
+
+    def test_only_returns_what_the_user_can_see(self):
+        hidden = Project.objects.create(title='Secret rocket', owner=self.other)
+        shared = Project.objects.create(title='Shared rocket', owner=self.other)
+        ProjectMembership.objects.create(project=shared, user=self.user, role='viewer')
+        idea = Idea.objects.create(title='Rocket idea', description='Reusable', owner=self.other)
+        IdeaNote.objects.create(idea=idea, title='Rocket sketch', content='', author=self.other)
+        assigned = Task.objects.create(title='Rocket review', created_by=self.other, assignee=self.user)
+        Task.objects.create(title='Rocket audit', created_by=self.other)
+
+        visible = {(result['type'], result['id']) for result in self.search('rocket')['results']}
+        self.assertEqual(visible, {('project', self.project.pk), ('project', shared.pk), ('task', assigned.pk)})
+        self.assertNotIn(('project', hidden.pk), visible)
+
+        IdeaMembership.objects.create(idea=idea, user=self.user, role='viewer', added_by=self.other)
+        self.assertEqual(self.search('rocket')['groups']['idea_note'], 1)
+
+    def test_index_follows_edits_moves_and_deletes(self):
+        task = Task.objects.create(title='Draft plan', created_by=self.other, project=self.project)
+        comment = TaskComment.objects.create(task=task, author=self.other, content='Looks solid')
+        self.assertEqual(self.matches('solid'), [('task_comment', comment.pk)])
+
+        task.title = 'Final plan'
+        task.save()
+        self.assertEqual(self.matches('draft'), [])
+        self.assertEqual(self.matches('final'), [('task', task.pk)])
+
+        # Comments follow their task out of the project
+        task.project = None
+        task.save()
+        self.assertEqual(self.matches('solid'), [])
+
+        task.delete()
+        self.assertFalse(SearchDocument.objects.filter(entity_type__in=['task', 'task_comment']).exists())
+
+    def search_queries(self, save):
+        with CaptureQueriesContext(connection) as context:
+            save()
+        return [query['sql'] for query in context.captured_queries if 'search_' in query['sql']]
+
+    def test_unchanged_saves_do_not_rewrite_the_index(self):
+        task = Task.objects.create(title='Plan', created_by=self.user, project=self.project)
+        task.status = 'in_progress'
+        self.assertEqual(self.search_queries(lambda: task.save(update_fields=['status'])), [])
+        # A full save only compares the stored digest
+        self.assertEqual(len(self.search_queries(task.save)), 1)
+
+    def test_paginates_with_a_cursor(self):
+        for index in range(5):
+            Task.objects.create(title=f'Rocket part {index}', project=self.project, created_by=self.user)
+
+        data = self.search('part', page_size=2)
+        seen = [result['id'] for result in data['results']]
+        while data['next']:
+            data = self.client.get(data['next']).data
+            seen += [result['id'] for result in data['results']]
+        self.assertEqual(sorted(seen), sorted(Task.objects.values_list('pk', flat=True)))
+        self.assertEqual(len(seen), 5)
+
+    def test_rejects_missing_query_and_unknown_types(self):
+        self.assertEqual(self.client.get('/api/search/').status_code, 400)
+        self.assertEqual(self.client.get('/api/search/', {'q': 'x', 'type': 'widget'}).status_code, 400)
+
+    def test_list_search_filters_fall_back_to_substring_matches(self):
+        task = Task.objects.create(title='Order X parts', project=self.project, created_by=self.user)
+        idea = Idea.objects.create(title='Reusable stage', description='', owner=self.user)
+
+        def found(search):
+            tasks = self.client.get(f'/api/tasks/projects/{self.project.pk}/tasks/', {'search': search}).data['results']
+            ideas = self.client.get('/api/ideas/', {'search': search}).data
+            return [row['id'] for row in tasks], [row['id'] for row in ideas]
+
+        self.assertEqual(found('parts'), ([task.pk], []))
+        # One-letter queries hold no index term
+        self.assertEqual(found('x'), ([task.pk], []))
+        # Nor does the index have anything before rebuild_search_index has run
+        SearchDocument.objects.all().delete()
+        self.assertEqual(found('stage'), ([], [idea.pk]))
+        self.assertEqual(found('rder'), ([task.pk], []))
+
+
+class UserTypeaheadTests(TestCase):
+    def setUp(self):
+        caches['typeahead'].clear()
+        self.user = User.objects.create_user('caller', 'caller@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_user(self, first_name, last_name, email):
+        return User.objects.create_user(email, email, 'password', first_name=first_name, last_name=last_name)
+
+    def typeahead(self, query):
+        response = self.client.get('/api/projects/users/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [user['id'] for user in response.data]
+
+    def test_matches_name_and_email_prefixes(self):
+        zoe = self.create_user('Zoë', 'Martínez', 'zm@acme.io')
+        other = self.create_user('Mark', 'Zorn', 'mark@example.com')
+
+        self.assertEqual(self.typeahead('zoe'), [zoe.pk])
+        self.assertEqual(self.typeahead('marti'), [zoe.pk])
+        self.assertEqual(self.typeahead('zo'), [zoe.pk, other.pk])
+        self.assertEqual(self.typeahead('zo mar'), [zoe.pk, other.pk])
+        self.assertEqual(self.typeahead('acme'), [zoe.pk])
+        self.assertEqual(self.typeahead('cal'), [])
+
+    def test_falls_back_to_matches_inside_words(self):
+        johnson = self.create_user('Ann', 'Johnson', 'ann@example.com')
+        self.create_user('Sonny', 'Nash', 'sonny@example.com')
+
+        self.assertEqual(self.typeahead('johnson'), [johnson.pk])
+        self.assertEqual(set(self.typeahead('son')), {johnson.pk, User.objects.get(first_name='Sonny').pk})
+
+    def test_ranks_project_colleagues_first(self):
+        stranger = self.create_user('Sam', 'Stranger', 'sam.s@example.com')
+        colleague = self.create_user('Sam', 'Colleague', 'sam.c@example.com')
+        project = Project.objects.create(title='Shared', owner=colleague)
+        ProjectMembership.objects.create(project=project, user=self.user, role='viewer')
+
+        self.assertEqual(self.typeahead('sam'), [colleague.pk, stranger.pk])
+
+    def test_follows_renames(self):
+        user = self.create_user('Pat', 'Lee', 'pat@example.com')
+        user.last_name = 'Quinn'
+        user.save()
+
+        caches['typeahead'].clear()
+        self.assertEqual(self.typeahead('quinn'), [user.pk])
+        self.assertEqual(self.typeahead('lee'), [])
+
+    def test_caches_long_and_accented_queries_under_short_keys(self):
+        user = self.create_user('Zoë', 'Martínez', 'zm@acme.io')
+        self.assertEqual(self.typeahead('zoë ' + 'martínez' * 40), [])
+        self.assertEqual(self.typeahead('Zoë Martí'), [user.pk])
+
+        keys = []
+        cache = caches['typeahead']
+        original = cache.set
+        with mock.patch.object(cache, 'set', side_effect=lambda key, *args: keys.append(key) or original(key, *args)):
+            cached_candidates(['zoe', 'marti' * 60])
+        self.assertEqual(len(keys), 1)
+        self.assertTrue(keys[0].isascii())
+        self.assertLessEqual(len(keys[0]), 64)
+
+    def test_cached_keystrokes_do_not_touch_the_database_cache(self):
+        user = self.create_user('Sam', 'Stranger', 'sam@example.com')
+        self.assertEqual(self.typeahead('sam'), [user.pk])
+        with CaptureQueriesContext(connection) as context, \
+                mock.patch('apps.search.people._candidates') as candidates:
+            self.assertEqual(self.typeahead('sam'), [user.pk])
+        candidates.assert_not_called()
+        self.assertFalse([query for query in context.captured_queries if 'django_cache' in query['sql']])
+
+    def test_key_migration_matches_a_rebuild(self):
+        self.create_user('Zoë', 'Martínez', 'zm@acme.io')
+        self.create_user('Ann', 'Johnson', 'ann@example.com')
+        expected = set(UserSearchKey.objects.values_list('user_id', 'kind', 'key'))
+
+        migration = importlib.import_module('apps.search.migrations.0004_build_user_search_keys')
+        migration.build_user_keys(django_apps, None)
+        self.assertEqual(set(UserSearchKey.objects.values_list('user_id', 'kind', 'key')), expected)
@@ -0,0 +1,36 @@
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .indexing import SOURCES_BY_TYPE
+from .pagination import SearchCursorPagination
+from .query import search_documents, count_by_type
+from .serializers import SearchResultSerializer
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search(request):
+    """
+    Ranked search over everything the user can see. ?q= is the query and
+    ?type= an optional comma-separated list of entity types. Besides the
+    page of results, 'groups' counts the matches of every type.
+    """
+    text = request.query_params.get('q', '')
+    if not text.strip():
+        return Response({'q': 'This parameter is required.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    entity_types = [value for value in request.query_params.get('type', '').split(',') if value]
+    unknown = set(entity_types) - set(SOURCES_BY_TYPE)
+    if unknown:
+        return Response(
+            {'type': f"Unknown types: {', '.join(sorted(unknown))}. Expected any of: {', '.join(SOURCES_BY_TYPE)}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    paginator = SearchCursorPagination()
+    page = paginator.paginate_queryset(search_documents(request.user, text, entity_types), request)
+    response = paginator.get_paginated_response(SearchResultSerializer(page, many=True).data)
+    response.data['groups'] = count_by_type(search_documents(request.user, text))
+    return response
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class TagsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.tags'
+    verbose_name = 'Tags'
+
+    def ready(self):
+        import apps.tags.signals
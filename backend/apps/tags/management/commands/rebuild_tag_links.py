@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from apps.tags.models import IdeaTag, TaskTag
+from apps.tags.tagging import rebuild_links
+
+
+class Command(BaseCommand):
+    help = 'Rewrite the task and idea tag links from their tags strings'
+
+    def handle(self, *args, **options):
+        tasks = rebuild_links(TaskTag)
+        ideas = rebuild_links(IdeaTag)
+        self.stdout.write(self.style.SUCCESS(f'Relinked {tasks} tasks and {ideas} ideas'))
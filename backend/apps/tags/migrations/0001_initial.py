@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('ideas', '0002_ideamembership'),
+        ('tasks', '0004_project_task_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, unique=True)),
+                ('name', models.CharField(max_length=50)),
+            ],
+            options={
+                'ordering': ['key'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TaskTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_links', to='tags.tag')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='tasks.task')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IdeaTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idea', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='ideas.idea')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='idea_links', to='tags.tag')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='tasktag',
+            constraint=models.UniqueConstraint(fields=('tag', 'task'), name='tags_tasktag_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='ideatag',
+            constraint=models.UniqueConstraint(fields=('tag', 'idea'), name='tags_ideatag_unique'),
+        ),
+    ]
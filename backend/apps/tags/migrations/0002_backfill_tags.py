@@ -0,0 +1,58 @@
+from django.db import migrations
+
+
+# Frozen copies of apps.tags.tagging.parse_tags and tag_key as of this
+# migration, so later changes there do not change what it writes
+MAX_TAG_LENGTH = 50
+
+
+def parse_tags(value):
+    names = {}
+    for part in (value or '').split(','):
+        name = ' '.join(part.split())[:MAX_TAG_LENGTH]
+        if name and name.lower() not in names:
+            names[name.lower()] = name
+    return list(names.values())
+
+
+def tag_key(name):
+    return name.lower()
+
+
+def backfill_tags(apps, schema_editor):
+    Tag = apps.get_model('tags', 'Tag')
+    sources = [
+        (apps.get_model('tasks', 'Task'), apps.get_model('tags', 'TaskTag'), 'task_id'),
+        (apps.get_model('ideas', 'Idea'), apps.get_model('tags', 'IdeaTag'), 'idea_id'),
+    ]
+
+    owners = []
+    names = {}
+    for model, link_model, owner_field in sources:
+        for pk, value in model.objects.exclude(tags='').values_list('pk', 'tags').iterator():
+            owner_names = parse_tags(value)
+            owners.append((link_model, owner_field, pk, owner_names))
+            for name in owner_names:
+                names.setdefault(tag_key(name), name)
+
+    Tag.objects.bulk_create([Tag(key=key, name=name) for key, name in names.items()], batch_size=500)
+    tag_ids = dict(Tag.objects.values_list('key', 'pk'))
+
+    links = {}
+    for link_model, owner_field, pk, owner_names in owners:
+        links.setdefault(link_model, []).extend(
+            link_model(**{owner_field: pk, 'tag_id': tag_ids[tag_key(name)]}) for name in owner_names
+        )
+    for link_model, rows in links.items():
+        link_model.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_tags, migrations.RunPython.noop),
+    ]
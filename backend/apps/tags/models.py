@@ -0,0 +1,46 @@
+from django.db import models
+from apps.ideas.models import Idea
+from apps.tasks.models import Task
+
+
+class Tag(models.Model):
+    """
+    A tag shared by tasks and ideas. key is the lowercased name, so "API"
+    and "api" are one tag; name keeps the spelling it was first used with.
+    """
+    key = models.CharField(max_length=50, unique=True)
+    name = models.CharField(max_length=50)
+
+    class Meta:
+        ordering = ['key']
+
+    def __str__(self):
+        return self.name
+
+
+# The through tables mirror the comma-separated Task.tags and Idea.tags
+# strings (see apps/tags/tagging.py). Their (tag, owner) constraints double
+# as the indexes tag filters look up.
+
+class TaskTag(models.Model):
+    owner_field = 'task'
+
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='tag_links')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='task_links')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'task'], name='tags_tasktag_unique'),
+        ]
+
+
+class IdeaTag(models.Model):
+    owner_field = 'idea'
+
+    idea = models.ForeignKey(Idea, on_delete=models.CASCADE, related_name='tag_links')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='idea_links')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'idea'], name='tags_ideatag_unique'),
+        ]
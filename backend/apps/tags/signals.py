@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.ideas.models import Idea
+from apps.tasks.models import Task
+from .models import TaskTag, IdeaTag
+from .tagging import sync_tags
+
+
+def _tags_saved(raw, update_fields):
+    return not raw and (update_fields is None or 'tags' in update_fields)
+
+
+@receiver(post_save, sender=Task)
+def sync_task_tags(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Mirror Task.tags into TaskTag rows"""
+    if _tags_saved(raw, update_fields):
+        sync_tags(TaskTag, instance.pk, instance.tags)
+
+
+@receiver(post_save, sender=Idea)
+def sync_idea_tags(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Mirror Idea.tags into IdeaTag rows"""
+    if _tags_saved(raw, update_fields):
+        sync_tags(IdeaTag, instance.pk, instance.tags)
@@ -0,0 +1,194 @@
+from django.db.models import Count
+
+from .models import Tag
+
+
+MAX_TAG_LENGTH = 50
+TAG_MATCHES = ('all', 'any')
+
+
+def parse_tags(value):
+    """Tag names of a comma-separated string, in order, without case-insensitive repeats"""
+    names = {}
+    for part in (value or '').split(','):
+        name = ' '.join(part.split())[:MAX_TAG_LENGTH]
+        if name and name.lower() not in names:
+            names[name.lower()] = name
+    return list(names.values())
+
+
+def tag_key(name):
+    return name.lower()
+
+
+def ensure_tags(names):
+    """{key: tag id} for names, creating the tags that do not exist yet"""
+    keys = {tag_key(name): name for name in names}
+    ids = dict(Tag.objects.filter(key__in=keys).values_list('key', 'pk'))
+    missing = [Tag(key=key, name=name) for key, name in keys.items() if key not in ids]
+    if missing:
+        # Concurrent requests may create the same tag; the unique key keeps one
+        Tag.objects.bulk_create(missing, ignore_conflicts=True)
+        ids.update(Tag.objects.filter(key__in=[tag.key for tag in missing]).values_list('key', 'pk'))
+    return ids
+
+
+def sync_tags(link_model, owner_id, value):
+    """Make the links of one task or idea match its comma-separated tags string"""
+    owner_field = link_model.owner_field
+    names = parse_tags(value)
+    wanted = {tag_key(name) for name in names}
+    stored = dict(link_model.objects.filter(**{owner_field: owner_id}).values_list('tag__key', 'tag_id'))
+    if set(stored) == wanted:
+        return
+
+    stale = [tag_id for key, tag_id in stored.items() if key not in wanted]
+    if stale:
+        link_model.objects.filter(**{owner_field: owner_id, 'tag_id__in': stale}).delete()
+
+    missing = [name for name in names if tag_key(name) not in stored]
+    if missing:
+        link_model.objects.bulk_create([
+            link_model(**{f'{owner_field}_id': owner_id, 'tag_id': tag_id})
+            for tag_id in ensure_tags(missing).values()
+        ], ignore_conflicts=True)
+
+
+def link_new_owners(link_model, owners):
+    """
+    Create the links of owners inserted with bulk_create, which sends no
+    signals, from their tags strings: one tag lookup and one insert.
+    """
+    names = {owner.pk: parse_tags(owner.tags) for owner in owners}
+    tag_ids = ensure_tags([name for owner_names in names.values() for name in owner_names])
+    owner_field = link_model.owner_field
+    link_model.objects.bulk_create([
+        link_model(**{f'{owner_field}_id': owner_id, 'tag_id': tag_ids[tag_key(name)]})
+        for owner_id, owner_names in names.items() for name in owner_names
+    ], batch_size=1000, ignore_conflicts=True)
+
+
+def rebuild_links(link_model, chunk_size=1000):
+    """
+    Make every link of link_model match its owner's tags string, to fix
+    drift after writes that bypassed the signals. Owners are read in chunks;
+    each costs one link lookup, one DELETE of stale links and one insert.
+    Returns the number of owners visited.
+    """
+    owner_field = link_model.owner_field
+    owners = link_model._meta.get_field(owner_field).related_model.objects.order_by('pk')
+    visited = 0
+    last_pk = 0
+    while True:
+        chunk = list(owners.filter(pk__gt=last_pk).values_list('pk', 'tags')[:chunk_size])
+        if not chunk:
+            return visited
+        visited += len(chunk)
+        last_pk = chunk[-1][0]
+
+        names = {pk: parse_tags(value) for pk, value in chunk}
+        tag_ids = ensure_tags([name for owner_names in names.values() for name in owner_names])
+        wanted = {(pk, tag_ids[tag_key(name)]) for pk, owner_names in names.items() for name in owner_names}
+        stored = {
+            (owner_id, tag_id): pk for pk, owner_id, tag_id in link_model.objects.filter(
+                **{f'{owner_field}_id__in': list(names)}
+            ).values_list('pk', f'{owner_field}_id', 'tag_id')
+        }
+        stale = [pk for key, pk in stored.items() if key not in wanted]
+        if stale:
+            link_model.objects.filter(pk__in=stale).delete()
+        link_model.objects.bulk_create([
+            link_model(**{f'{owner_field}_id': owner_id, 'tag_id': tag_id})
+            for owner_id, tag_id in wanted - set(stored)
+        ], batch_size=1000, ignore_conflicts=True)
+
+
+def add_tags(link_model, owners, names):
+    """
+    Add names to each of owners (tasks or ideas with tags loaded) in a fixed
+    number of queries: the links are inserted in bulk and the tags strings
+    rewritten with one bulk_update. Returns the owners whose string changed;
+    bulk_update sends no signals, so callers refresh whatever reads them.
+    """
+    names = parse_tags(','.join(names))
+    if not names or not owners:
+        return []
+
+    tag_ids = ensure_tags(names).values()
+    owner_field = link_model.owner_field
+    link_model.objects.bulk_create([
+        link_model(**{f'{owner_field}_id': owner.pk, 'tag_id': tag_id})
+        for owner in owners for tag_id in tag_ids
+    ], ignore_conflicts=True)
+
+    changed = []
+    for owner in owners:
+        current = parse_tags(owner.tags)
+        known = {tag_key(name) for name in current}
+        added = [name for name in names if tag_key(name) not in known]
+        if added:
+            owner.tags = ','.join(sorted(current + added))
+            changed.append(owner)
+    if changed:
+        type(changed[0]).objects.bulk_update(changed, ['tags'])
+    return changed
+
+
+def remove_tags(link_model, owners, names):
+    """
+    Remove names from each of owners (tasks or ideas with tags loaded): one
+    DELETE of their links and one bulk_update of the tags strings. Returns
+    the owners whose string changed, as add_tags does.
+    """
+    keys = {tag_key(name) for name in parse_tags(','.join(names))}
+    if not keys or not owners:
+        return []
+
+    owner_field = link_model.owner_field
+    link_model.objects.filter(**{
+        f'{owner_field}_id__in': [owner.pk for owner in owners],
+        'tag_id__in': Tag.objects.filter(key__in=keys).values('pk'),
+    }).delete()
+
+    changed = []
+    for owner in owners:
+        current = parse_tags(owner.tags)
+        kept = [name for name in current if tag_key(name) not in keys]
+        if len(kept) != len(current):
+            owner.tags = ','.join(kept)
+            changed.append(owner)
+    if changed:
+        type(changed[0]).objects.bulk_update(changed, ['tags'])
+    return changed
+
+
+def tag_filter_params(query_params):
+    """
+    (tag keys, match) from ?tag=a&tag=b (or ?tag=a,b) and ?tag_match=all|any.
+    all, the default, keeps objects carrying every tag.
+    """
+    keys = []
+    for value in query_params.getlist('tag'):
+        keys += [tag_key(name) for name in parse_tags(value)]
+    match = query_params.get('tag_match', 'all')
+    return list(dict.fromkeys(keys)), match if match in TAG_MATCHES else 'all'
+
+
+def filter_by_tags(queryset, link_model, keys, match='all'):
+    """Objects of queryset tagged with all (or any) of keys, through the (tag, owner) index"""
+    if not keys:
+        return queryset
+    owner_field = f'{link_model.owner_field}_id'
+    links = link_model.objects.filter(tag__key__in=keys)
+    if match == 'all' and len(keys) > 1:
+        links = links.values(owner_field).annotate(hits=Count('tag_id')).filter(hits=len(keys))
+    return queryset.filter(pk__in=links.values(owner_field))
+
+
+def tag_counts(queryset, link_model):
+    """[{'name', 'count'}] of the tags on queryset's objects, most used first"""
+    owner_field = link_model.owner_field
+    rows = link_model.objects.filter(**{f'{owner_field}__in': queryset.order_by().values('pk')}).values(
+        'tag_id', 'tag__name'
+    ).annotate(count=Count('pk')).order_by('-count', 'tag__name')
+    return [{'name': row['tag__name'], 'count': row['count']} for row in rows]
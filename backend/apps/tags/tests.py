@@ -0,0 +1,101 @@
+import importlib
+from io import StringIO
+
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.ideas.models import Idea
+from apps.projects.models import Project
+from apps.tasks.models import Task
+from .models import Tag, TaskTag, IdeaTag
+from .tagging import parse_tags
+
+
+class TaggingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(title='Project', owner=self.user)
+
+    def create_task(self, title, tags):
+        return Task.objects.create(title=title, tags=tags, project=self.project, created_by=self.user)
+
+    def task_titles(self, **params):
+        response = self.client.get(f'/api/tasks/projects/{self.project.pk}/tasks/', params)
+        return sorted(task['title'] for task in response.data['results'])
+
+    def test_parse_tags_drops_blanks_and_case_repeats(self):
+        self.assertEqual(parse_tags(' API , ui,,api,  data   model '), ['API', 'ui', 'data model'])
+
+    def test_links_follow_the_tags_string(self):
+        task = self.create_task('Task', 'backend, API')
+        self.assertEqual(set(TaskTag.objects.filter(task=task).values_list('tag__key', flat=True)), {'backend', 'api'})
+
+        task.tags = 'api,frontend'
+        task.save(update_fields=['tags'])
+        self.assertEqual(set(TaskTag.objects.filter(task=task).values_list('tag__key', flat=True)), {'api', 'frontend'})
+        self.assertEqual(Tag.objects.count(), 3)
+
+        idea = Idea.objects.create(title='Idea', description='', owner=self.user, tags='Frontend')
+        self.assertEqual(list(IdeaTag.objects.filter(idea=idea).values_list('tag__key', flat=True)), ['frontend'])
+
+    def test_filters_by_all_or_any_tag_exactly(self):
+        self.create_task('Both', 'api,ui')
+        self.create_task('Api only', 'api')
+        self.create_task('Substring', 'rapid')
+
+        self.assertEqual(self.task_titles(tag='API'), ['Api only', 'Both'])
+        self.assertEqual(self.task_titles(tag=['api', 'ui']), ['Both'])
+        self.assertEqual(self.task_titles(tag='api,ui'), ['Both'])
+        self.assertEqual(self.task_titles(tag=['ui', 'rapid'], tag_match='any'), ['Both', 'Substring'])
+
+    def test_facets_count_tags_of_the_filtered_tasks(self):
+        self.create_task('One', 'api,ui')
+        self.create_task('Two', 'api')
+        done = self.create_task('Done', 'api,docs')
+        Task.objects.filter(pk=done.pk).update(status='done')
+
+        response = self.client.get(f'/api/tasks/projects/{self.project.pk}/tasks/tags/', {'status': 'todo'})
+        self.assertEqual(response.data, [{'name': 'api', 'count': 2}, {'name': 'ui', 'count': 1}])
+
+        Idea.objects.create(title='Idea', description='', owner=self.user, tags='api')
+        self.assertEqual(self.client.get('/api/ideas/tags/').data, [{'name': 'api', 'count': 1}])
+
+    def test_bulk_add_tags_updates_links_and_strings(self):
+        first = self.create_task('First', 'api')
+        second = self.create_task('Second', '')
+
+        self.client.post('/api/tasks/tasks/bulk_update/', {
+            'task_ids': [first.pk, second.pk], 'action': 'add_tags', 'value': 'API, docs'
+        }, format='json')
+        self.assertEqual(Task.objects.get(pk=first.pk).tags, 'api,docs')
+        self.assertEqual(Task.objects.get(pk=second.pk).tags, 'API,docs')
+        self.assertEqual(self.task_titles(tag=['api', 'docs']), ['First', 'Second'])
+
+    def test_rebuild_command_fixes_drifted_links(self):
+        task = self.create_task('Task', 'api, docs')
+        idea = Idea.objects.create(title='Idea', description='', owner=self.user, tags='ui')
+        # Writes that bypass the signals leave the links behind
+        Task.objects.filter(pk=task.pk).update(tags='docs, backend')
+        IdeaTag.objects.filter(idea=idea).delete()
+
+        call_command('rebuild_tag_links', stdout=StringIO())
+        self.assertEqual(set(TaskTag.objects.values_list('tag__key', flat=True)), {'docs', 'backend'})
+        self.assertEqual(list(IdeaTag.objects.values_list('tag__key', flat=True)), ['ui'])
+
+    def test_backfill_migration_links_existing_strings(self):
+        self.create_task('Task', 'API, docs,api')
+        Idea.objects.create(title='Idea', description='', owner=self.user, tags=' Data  model ')
+        Tag.objects.all().delete()
+
+        migration = importlib.import_module('apps.tags.migrations.0002_backfill_tags')
+        migration.backfill_tags(django_apps, None)
+        self.assertEqual(dict(Tag.objects.values_list('key', 'name')), {
+            'api': 'API', 'docs': 'docs', 'data model': 'Data model',
+        })
+        self.assertEqual(set(TaskTag.objects.values_list('tag__key', flat=True)), {'api', 'docs'})
+        self.assertEqual(list(IdeaTag.objects.values_list('tag__key', flat=True)), ['data model'])
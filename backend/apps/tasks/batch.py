@@ -0,0 +1,316 @@
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from apps.search.indexing import index_new_objects
+from apps.tags.models import TaskTag
+from apps.tags.tagging import link_new_owners
+from .bulk import editable_ideas, editable_projects, editable_task_lists, editable_tasks_q
+from .dashboard import discard_snapshots
+from .models import Task, TaskActivity
+from .ordering import MAX_POSITION, POSITION_STEP, next_position, renormalize, task_siblings
+from .rollups import rebuild_rollup
+
+
+MAX_BATCH_SIZE = 5000
+INSERT_BATCH_SIZE = 500
+
+# Row fields copied onto the task as they are
+TASK_FIELDS = (
+    'title', 'description', 'status', 'priority',
+    'due_date', 'start_date', 'estimated_hours', 'tags',
+)
+
+
+class BatchConflict(APIException):
+    """Another write got in the way of the batch; the same request may be sent again"""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Tasks were created concurrently with this batch; retry it'
+    default_code = 'conflict'
+
+
+class BatchTaskCreate:
+    """
+    Create many tasks at once from TaskBatchRowSerializer rows. Every table
+    the rows reference is read with one query for the whole batch, the tasks
+    go in with bulk_create (one per level of in-batch parents), and the
+    dependency through-rows and activity rows with one bulk_create each.
+
+    bulk_create sends no signals, so the dashboards, rollups, tag links and
+    search documents of the new tasks are written here, by set.
+    """
+
+    def __init__(self, user, rows, project=None):
+        self.user = user
+        self.rows = rows
+        self.project = project
+        self.errors = [{} for _ in rows]
+        self.refs = {}
+        self.positions = {}
+        self.activities = []
+
+    def run(self):
+        """Validate the batch, raising ValidationError with one entry per row, then create it"""
+        self._check_refs()
+        self._load_references()
+        for index, row in enumerate(self.rows):
+            self._check_row(index, row)
+        levels = self._levels()
+        if any(self.errors):
+            raise ValidationError({'tasks': self.errors})
+
+        with transaction.atomic():
+            tasks = [self._build(row) for row in self.rows]
+            for level in levels:
+                for index in level:
+                    parent_ref = self.rows[index].get('parent_ref')
+                    if parent_ref:
+                        tasks[index].parent_task = tasks[self.refs[parent_ref]]
+                self._insert([tasks[index] for index in level])
+
+            self._link_dependencies(tasks)
+            TaskActivity.objects.bulk_create(self.activities, batch_size=INSERT_BATCH_SIZE)
+
+            discard_snapshots({self.user.pk} | {task.assignee_id for task in tasks})
+            for project_id in {task.project_id for task in tasks} - {None}:
+                rebuild_rollup(project_id)
+            link_new_owners(TaskTag, [task for task in tasks if task.tags])
+            index_new_objects(Task, tasks)
+        return tasks
+
+    def _error(self, index, field, message):
+        self.errors[index].setdefault(field, []).append(message)
+
+    def _check_refs(self):
+        for index, row in enumerate(self.rows):
+            ref = row.get('ref')
+            if ref is None:
+                continue
+            if ref in self.refs:
+                self._error(index, 'ref', f'Duplicate ref "{ref}"')
+            else:
+                self.refs[ref] = index
+
+        for index, row in enumerate(self.rows):
+            for field, refs in (('parent_ref', [row.get('parent_ref')]), ('dependency_refs', row.get('dependency_refs', []))):
+                for ref in refs:
+                    if ref is None:
+                        continue
+                    if ref not in self.refs:
+                        self._error(index, field, f'Unknown ref "{ref}"')
+                    elif self.refs[ref] == index:
+                        self._error(index, field, 'A task cannot reference itself')
+
+    def _ids(self, field):
+        ids = set()
+        for row in self.rows:
+            value = row.get(field)
+            if isinstance(value, list):
+                ids.update(value)
+            elif value:
+                ids.add(value)
+        return ids
+
+    def _load_references(self):
+        """One query per referenced table, each skipped when no row names it"""
+        project_ids = self._ids('project_id') | ({self.project.pk} if self.project else set())
+        self.projects = editable_projects(self.user).only('title').in_bulk(project_ids)
+        self.ideas = editable_ideas(self.user).only('title').in_bulk(self._ids('idea_id'))
+
+        assignee_ids = self._ids('assignee_id')
+        self.assignees = set(
+            User.objects.filter(pk__in=assignee_ids).values_list('pk', flat=True)
+        ) if assignee_ids else set()
+
+        self.task_lists = editable_task_lists(self.user).annotate(
+            last_position=Max('tasks__position')
+        ).in_bulk(self._ids('task_list_id'))
+        # Parents and dependencies gain subtasks and dependents, so they must
+        # be editable too; others look missing, as elsewhere
+        self.existing = Task.objects.filter(editable_tasks_q(self.user)).only('title').in_bulk(
+            self._ids('parent_task_id') | self._ids('dependency_ids')
+        )
+
+    def _project_id(self, row):
+        return row.get('project_id') or (self.project.pk if self.project else None)
+
+    def _check_row(self, index, row):
+        project_id = self._project_id(row)
+        if self.project and project_id != self.project.pk:
+            self._error(index, 'project_id', 'Tasks of this batch belong to the project it is sent to')
+        elif project_id and project_id not in self.projects:
+            self._error(index, 'project_id', 'Project not found')
+        if row.get('idea_id') and row['idea_id'] not in self.ideas:
+            self._error(index, 'idea_id', 'Idea not found')
+        if row.get('assignee_id') and row['assignee_id'] not in self.assignees:
+            self._error(index, 'assignee_id', 'User not found')
+
+        task_list_id = row.get('task_list_id')
+        if task_list_id:
+            task_list = self.task_lists.get(task_list_id)
+            if task_list is None:
+                self._error(index, 'task_list_id', 'Task list not found')
+            elif task_list.project_id != project_id:
+                self._error(index, 'task_list_id', 'Task list belongs to another project')
+
+        if row.get('parent_task_id') and row['parent_task_id'] not in self.existing:
+            self._error(index, 'parent_task_id', 'Task not found')
+        for task_id in row.get('dependency_ids', []):
+            if task_id not in self.existing:
+                self._error(index, 'dependency_ids', f'Task {task_id} not found')
+
+    def _levels(self):
+        """Row indexes grouped by their depth under in-batch parents, so parents are inserted first"""
+        depths = {}
+        for start in range(len(self.rows)):
+            path = []
+            on_path = set()
+            index = start
+            while index is not None and index not in depths:
+                if index in on_path:
+                    self._error(start, 'parent_ref', 'Parent refs form a cycle')
+                    return []
+                path.append(index)
+                on_path.add(index)
+                parent_ref = self.rows[index].get('parent_ref')
+                index = self.refs.get(parent_ref) if parent_ref else None
+            depth = depths[index] + 1 if index is not None else 0
+            for index in reversed(path):
+                depths[index] = depth
+                depth += 1
+
+        levels = [[] for _ in range(max(depths.values(), default=-1) + 1)]
+        for index in range(len(self.rows)):
+            levels[depths[index]].append(index)
+        return levels
+
+    def _build(self, row):
+        project_id = self._project_id(row)
+        task = Task(
+            created_by=self.user,
+            project=self.projects.get(project_id),
+            idea=self.ideas.get(row.get('idea_id')),
+            assignee_id=row.get('assignee_id'),
+            parent_task_id=row.get('parent_task_id'),
+            **{field: row[field] for field in TASK_FIELDS if field in row}
+        )
+        if task.status == 'done':
+            task.completed_at = timezone.now()
+
+        task_list_id = row.get('task_list_id')
+        if task_list_id:
+            task.task_list_id = task_list_id
+            task.position = self._next_position(task_list_id)
+        return task
+
+    def _next_position(self, task_list_id):
+        """Positions after the list's last task, in row order"""
+        position = self.positions.get(task_list_id)
+        if position is None:
+            last = self.task_lists[task_list_id].last_position
+            position = POSITION_STEP if last is None else last + POSITION_STEP
+            if position + len(self.rows) * POSITION_STEP > MAX_POSITION:
+                renormalize(task_siblings(task_list_id))
+                position = next_position(task_siblings(task_list_id))
+        self.positions[task_list_id] = position + POSITION_STEP
+        return position
+
+    def _insert(self, tasks):
+        if connection.features.can_return_rows_from_bulk_insert:
+            Task.objects.bulk_create(tasks, batch_size=INSERT_BATCH_SIZE)
+            return
+
+        # MySQL returns no ids from bulk inserts. With the creator's row
+        # locked their batches cannot interleave, and ids only grow, so this
+        # batch's tasks are the creator's tasks above the id read beforehand.
+        list(User.objects.select_for_update().filter(pk=self.user.pk).values_list('pk'))
+        floor = Task.objects.aggregate(last=Max('pk'))['last'] or 0
+        Task.objects.bulk_create(tasks, batch_size=INSERT_BATCH_SIZE)
+        ids = list(Task.objects.filter(created_by=self.user, pk__gt=floor).order_by('pk').values_list('pk', flat=True))
+        if len(ids) != len(tasks):
+            raise BatchConflict()
+        for task, pk in zip(tasks, ids):
+            task.pk = pk
+
+    def _link_dependencies(self, tasks):
+        """Write the dependency through-rows and every activity row of the batch"""
+        Through = Task.dependencies.through
+        links = []
+        for task, row in zip(tasks, self.rows):
+            self.activities.append(TaskActivity(
+                task=task, action='created', user=self.user,
+                description=f'Task "{task.title}" was created in {task.context_display}',
+            ))
+
+            dependencies = [tasks[self.refs[ref]] for ref in row.get('dependency_refs', [])]
+            dependencies += [self.existing[task_id] for task_id in row.get('dependency_ids', [])]
+            dependencies = list({dependency.pk: dependency for dependency in dependencies}.values())
+            if dependencies:
+                links += [Through(from_task_id=task.pk, to_task_id=dependency.pk) for dependency in dependencies]
+                self.activities.append(TaskActivity(
+                    task=task, action='dependency_added', user=self.user,
+                    description=f'Dependencies added: {", ".join(dependency.title for dependency in dependencies)}',
+                ))
+        Through.objects.bulk_create(links, batch_size=INSERT_BATCH_SIZE, ignore_conflicts=True)
+
+
+def template_rows(template, items, **context):
+    """
+    Batch rows for a template's tree: its own task first, then its items
+    depth-first in position order, which is how they line up in a task list
+    """
+    children = {}
+    for item in items:
+        children.setdefault(item.parent_id, []).append(item)
+
+    rows = [{
+        'ref': 'template',
+        'title': template.title_template,
+        'description': template.description_template,
+        'priority': template.priority,
+        'estimated_hours': template.estimated_hours,
+        'tags': template.tags,
+        **context,
+    }]
+    refs = {f'item-{item.pk}' for item in items}
+    stack = list(reversed(children.get(None, [])))
+    while stack:
+        item = stack.pop()
+        rows.append({
+            'ref': f'item-{item.pk}',
+            'parent_ref': f'item-{item.parent_id}' if item.parent_id else 'template',
+            'dependency_refs': [
+                f'item-{dependency.pk}' for dependency in item.depends_on.all()
+                if f'item-{dependency.pk}' in refs
+            ],
+            'title': item.title,
+            'description': item.description,
+            'priority': item.priority,
+            'estimated_hours': item.estimated_hours,
+            'tags': item.tags,
+            **context,
+        })
+        stack.extend(reversed(children.get(item.pk, [])))
+    return rows
+
+
+def instantiate_template(template, user, project=None, idea=None, task_list=None):
+    """See TaskTemplate.instantiate"""
+    items = list(template.items.prefetch_related('depends_on'))
+    rows = template_rows(
+        template, items,
+        project_id=project and project.pk,
+        idea_id=idea and idea.pk,
+        task_list_id=task_list and task_list.pk,
+    )
+    try:
+        tasks = BatchTaskCreate(user, rows).run()
+    except ValidationError as error:
+        # Every row shares the project, idea and list, so report them once
+        raise ValidationError(next(errors for errors in error.detail['tasks'] if errors))
+
+    by_ref = {row['ref']: task for row, task in zip(rows, tasks)}
+    return by_ref.pop('template'), {int(ref[len('item-'):]): task for ref, task in by_ref.items()}
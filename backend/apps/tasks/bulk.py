@@ -0,0 +1,293 @@
+import threading
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import router, transaction
+from django.db.models import BooleanField, Case, Q, Value, When
+from django.db.models.deletion import Collector
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from apps.ideas.models import Idea, IdeaMembership
+from apps.projects.models import Project, ProjectAccess
+from apps.projects.permissions import EDIT_ROLES
+from apps.search.indexing import reindex, remove_objects, rescope_tasks
+from apps.tags.models import TaskTag
+from apps.tags.tagging import add_tags, remove_tags, parse_tags
+from .dashboard import discard_snapshots
+from .models import Task, TaskActivity, TaskList
+from .ordering import POSITION_STEP, next_position, task_siblings
+from .rollups import rebuild_rollup
+
+
+NOT_FOUND = 'not_found'
+PERMISSION_DENIED = 'permission_denied'
+OTHER_PROJECT = 'task_list_in_other_project'
+
+# What the actions compare, log and refresh read models from
+TASK_FIELDS = (
+    'title', 'status', 'priority', 'project', 'idea',
+    'created_by', 'assignee', 'task_list', 'tags',
+)
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_signals():
+    """
+    Turn the per-row read model receivers of tasks and their children into
+    no-ops while a bulk action runs; it refreshes the read models by set
+    """
+    previous = signals_deferred()
+    _deferred.active = True
+    try:
+        yield
+    finally:
+        _deferred.active = previous
+
+
+def signals_deferred():
+    return getattr(_deferred, 'active', False)
+
+
+def visible_tasks_q(user):
+    """Tasks the user created or is assigned, and those of their projects and ideas"""
+    return (
+        Q(created_by=user) | Q(assignee=user) |
+        Q(project_id__in=ProjectAccess.objects.filter(user=user).values('project_id')) |
+        Q(idea_id__in=Idea.objects.filter(owner=user).values('pk')) |
+        Q(idea_id__in=IdeaMembership.objects.filter(user=user).values('idea_id'))
+    )
+
+
+def editable_tasks_q(user):
+    """Visible tasks the user may change: projects and ideas need an editing role"""
+    return (
+        Q(created_by=user) | Q(assignee=user) |
+        Q(project_id__in=ProjectAccess.objects.filter(user=user, role__in=EDIT_ROLES).values('project_id')) |
+        Q(idea_id__in=Idea.objects.filter(owner=user).values('pk')) |
+        Q(idea_id__in=IdeaMembership.objects.filter(user=user, role='editor').values('idea_id'))
+    )
+
+
+def editable_projects(user):
+    """Projects the user may put tasks into"""
+    return Project.objects.filter(access_entries__user=user, access_entries__role__in=EDIT_ROLES)
+
+
+def editable_ideas(user):
+    """Ideas the user may put tasks into: their own and those they edit"""
+    return Idea.objects.filter(
+        Q(owner=user) |
+        Q(pk__in=IdeaMembership.objects.filter(user=user, role='editor').values('idea_id'))
+    )
+
+
+def editable_task_lists(user):
+    """Task lists the user may put tasks into: their personal lists and those of projects they edit"""
+    return TaskList.objects.filter(
+        Q(created_by=user, project__isnull=True) |
+        Q(project_id__in=ProjectAccess.objects.filter(user=user, role__in=EDIT_ROLES).values('project_id'))
+    )
+
+
+def scope_tasks(user, task_ids):
+    """
+    Load the tasks of task_ids the user may edit, in one query. Returns
+    (tasks, failures), failures mapping every other id to NOT_FOUND (missing,
+    or hidden from the user so ids are not leaked) or PERMISSION_DENIED.
+    """
+    rows = Task.objects.filter(pk__in=task_ids).filter(visible_tasks_q(user)).annotate(
+        editable=Case(
+            When(editable_tasks_q(user), then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        )
+    ).only(*TASK_FIELDS)
+
+    tasks = []
+    failures = {}
+    for task in rows:
+        if task.editable:
+            tasks.append(task)
+        else:
+            failures[task.pk] = PERMISSION_DENIED
+    found = {task.pk for task in tasks} | set(failures)
+    for task_id in task_ids:
+        if task_id not in found:
+            failures[task_id] = NOT_FOUND
+    return tasks, failures
+
+
+def _ids(tasks):
+    return [task.pk for task in tasks]
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+class BulkTaskAction:
+    """
+    One TaskBulkUpdateSerializer action over many tasks, in a number of
+    statements that does not grow with the task count: the ids are scoped in
+    one query, each action is a single UPDATE (or bulk_update, or one
+    cascading delete), and the activity rows go in with one bulk_create.
+
+    These writes bypass the Task signals, so the dashboards and rollups they
+    affect are refreshed afterwards, once per user or project.
+    """
+
+    def __init__(self, user, task_ids, action, value=''):
+        self.user = user
+        self.task_ids = list(dict.fromkeys(task_ids))
+        self.action = action
+        self.value = value
+        self.updated = []
+        self.failures = {}
+        self.activities = []
+        self.users = set()
+        self.projects = set()
+
+    @property
+    def updated_count(self):
+        return len(self.updated)
+
+    def run(self):
+        handler = getattr(self, f'_{self.action}')
+        tasks, self.failures = scope_tasks(self.user, self.task_ids)
+        with transaction.atomic(), deferred_signals():
+            handler(tasks, self.value)
+            TaskActivity.objects.bulk_create(self.activities)
+            discard_snapshots(self.users)
+            for project_id in self.projects - {None}:
+                rebuild_rollup(project_id)
+        return self
+
+    def _log(self, task, action, description, old_value='', new_value=''):
+        self.activities.append(TaskActivity(
+            task_id=task.pk, action=action, description=description,
+            old_value=_text(old_value), new_value=_text(new_value), user=self.user,
+        ))
+
+    def _update(self, tasks, **values):
+        if tasks:
+            Task.objects.filter(pk__in=_ids(tasks)).update(updated_at=timezone.now(), **values)
+
+    def _update_status(self, tasks, value):
+        changed = [task for task in tasks if task.status != value]
+        self._update(changed, status=value, completed_at=timezone.now() if value == 'done' else None)
+
+        labels = dict(Task.STATUS_CHOICES)
+        for task in changed:
+            self._log(
+                task, 'status_changed', f'Status changed from {labels[task.status]} to {labels[value]}',
+                task.status, value,
+            )
+            self.users.update((task.created_by_id, task.assignee_id))
+            self.projects.add(task.project_id)
+        self.updated = tasks
+
+    def _update_priority(self, tasks, value):
+        changed = [task for task in tasks if task.priority != value]
+        self._update(changed, priority=value)
+
+        labels = dict(Task.PRIORITY_CHOICES)
+        for task in changed:
+            self._log(
+                task, 'priority_changed', f'Priority changed from {labels[task.priority]} to {labels[value]}',
+                task.priority, value,
+            )
+            self.projects.add(task.project_id)
+        self.updated = tasks
+
+    def _update_assignee(self, tasks, value):
+        assignee = User.objects.filter(pk=value).first() if str(value).isdigit() else None
+        if assignee is None:
+            raise ValidationError({'value': 'User not found'})
+
+        changed = [task for task in tasks if task.assignee_id != assignee.pk]
+        self._update(changed, assignee=assignee)
+        if changed:
+            rescope_tasks(_ids(changed), assignee_id=assignee.pk)
+
+        name = assignee.get_full_name() or assignee.username
+        for task in changed:
+            self._log(task, 'assigned', f'Task assigned to {name}', task.assignee_id, assignee.pk)
+            self.users.add(task.assignee_id)
+        if changed:
+            self.users.add(assignee.pk)
+        self.updated = tasks
+
+    def _update_task_list(self, tasks, value):
+        task_list = editable_task_lists(self.user).filter(pk=value).first() if str(value).isdigit() else None
+        if task_list is None:
+            raise ValidationError({'value': 'Task list not found'})
+
+        # A list only holds tasks of its own project (or, for personal
+        # lists, tasks outside any project)
+        movable = []
+        for task in tasks:
+            if task.project_id != task_list.project_id:
+                self.failures[task.pk] = OTHER_PROJECT
+            else:
+                movable.append(task)
+
+        changed = [task for task in movable if task.task_list_id != task_list.pk]
+        if not changed:
+            self.updated = movable
+            return
+
+        old_names = dict(TaskList.objects.filter(
+            pk__in={task.task_list_id for task in changed} - {None}
+        ).values_list('pk', 'name'))
+        for task in changed:
+            self._log(
+                task, 'moved', f'Task moved to {task_list.name}',
+                old_names.get(task.task_list_id), task_list.name,
+            )
+
+        # Appended to the list, keeping their order
+        first = next_position(task_siblings(task_list.pk))
+        now = timezone.now()
+        for index, task in enumerate(changed):
+            task.task_list = task_list
+            task.position = first + index * POSITION_STEP
+            task.updated_at = now
+        Task.objects.bulk_update(changed, ['task_list', 'position', 'updated_at'])
+        self.updated = movable
+
+    def _retag(self, tasks, retag, value, verb):
+        old_tags = {task.pk: task.tags for task in tasks}
+        changed = retag(TaskTag, tasks, [value])
+        description = f'Tags {verb}: {", ".join(parse_tags(value))}'
+        for task in changed:
+            self._log(task, 'updated', description, old_tags[task.pk], task.tags)
+        # Terms change with the tags; reindex rewrites the documents in bulk
+        reindex(Task, _ids(changed))
+        self.updated = tasks
+
+    def _add_tags(self, tasks, value):
+        self._retag(tasks, add_tags, value, 'added')
+
+    def _remove_tags(self, tasks, value):
+        self._retag(tasks, remove_tags, value, 'removed')
+
+    def _delete(self, tasks, value):
+        if not tasks:
+            return
+        # Collected like QuerySet.delete() would, so subtasks deleted by the
+        # cascade are known and refreshed too
+        collector = Collector(using=router.db_for_write(Task))
+        collector.collect(Task.objects.filter(pk__in=_ids(tasks)))
+        deleted = collector.data.get(Task, ())
+        for task in deleted:
+            self.users.update((task.created_by_id, task.assignee_id))
+            self.projects.add(task.project_id)
+        deleted_ids = _ids(deleted)
+        collector.delete()
+
+        # Comment documents go with the cascade; task documents carry no task FK
+        remove_objects(Task, deleted_ids)
+        self.updated = tasks
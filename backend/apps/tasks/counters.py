@@ -0,0 +1,96 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db.models import Count, Min, Q, F
+from django.utils import timezone
+
+from .models import Task
+
+
+STATUS_FIELDS = [status for status, _ in Task.STATUS_CHOICES]
+
+# With no upcoming due date to wait for, overdue is still recounted this often
+OVERDUE_RECHECK = timedelta(hours=1)
+
+
+def status_counters(state):
+    """The TaskCounters fields one task in this state adds to"""
+    counters = {'total': 1}
+    if state['status'] in STATUS_FIELDS:
+        counters[state['status']] = 1
+    return counters
+
+
+def status_aggregates():
+    """Aggregates that recount the TaskCounters status fields"""
+    return {
+        'total': Count('pk'),
+        **{status: Count('pk', filter=Q(status=status)) for status in STATUS_FIELDS},
+    }
+
+
+def move_counters(model, key_field, old, new, keys_of, counters_of):
+    """
+    Move one task's contribution between read-model rows as it goes from
+    state old to state new (Task.tracked_state() dicts; None before creation
+    and after deletion). keys_of(state) names the rows a task in that state
+    counts towards, counters_of(state) what it adds to each. Counters move by
+    F() increments. Returns the keys whose row does not exist yet.
+    """
+    if old == new:
+        return []
+
+    old_keys = keys_of(old) if old else set()
+    new_keys = keys_of(new) if new else set()
+
+    deltas = {key: Counter() for key in old_keys | new_keys}
+    for key in old_keys:
+        deltas[key].subtract(counters_of(old))
+    for key in new_keys:
+        deltas[key].update(counters_of(new))
+
+    # Only tasks with a due date can be overdue
+    has_due_date = any(state and state['due_date'] for state in (old, new))
+    due_changed = has_due_date and (
+        old is None or new is None or
+        (old['status'], old['due_date']) != (new['status'], new['due_date'])
+    )
+
+    missing = []
+    for key, delta in deltas.items():
+        changes = {field: F(field) + amount for field, amount in delta.items() if amount}
+        if due_changed or (has_due_date and key not in (old_keys & new_keys)):
+            changes['overdue_valid_until'] = None
+        if changes and not model.objects.filter(**{key_field: key}).update(**changes):
+            missing.append(key)
+    return missing
+
+
+def overdue_aggregates(now):
+    open_tasks = ~Q(status__in=Task.CLOSED_STATUSES)
+    return {
+        'overdue': Count('pk', filter=open_tasks & Q(due_date__lt=now)),
+        'next_due_date': Min('due_date', filter=open_tasks & Q(due_date__gte=now)),
+    }
+
+
+def overdue_valid_until(next_due_date, now):
+    return next_due_date or now + OVERDUE_RECHECK
+
+
+def refresh_overdue(counters, tasks):
+    """Recount counters.overdue over tasks if it may have gone stale"""
+    now = timezone.now()
+    if counters.overdue_valid_until is not None and counters.overdue_valid_until > now:
+        return counters
+
+    values = tasks.aggregate(**overdue_aggregates(now))
+    valid_until = overdue_valid_until(values['next_due_date'], now)
+
+    # Compare-and-set, so an invalidation that lands meanwhile is kept
+    type(counters).objects.filter(
+        pk=counters.pk, overdue_valid_until=counters.overdue_valid_until
+    ).update(overdue=values['overdue'], overdue_valid_until=valid_until)
+    counters.overdue = values['overdue']
+    counters.overdue_valid_until = valid_until
+    return counters
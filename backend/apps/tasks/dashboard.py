@@ -0,0 +1,66 @@
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .counters import (
+    status_counters, status_aggregates, move_counters,
+    overdue_aggregates, overdue_valid_until, refresh_overdue,
+)
+from .models import Task, TaskDashboardSnapshot
+
+
+def user_tasks(user_id):
+    """Tasks on a user's dashboard: created by or assigned to them"""
+    return Task.objects.filter(Q(created_by_id=user_id) | Q(assignee_id=user_id))
+
+
+def _dashboard_users(state):
+    return {state['created_by_id'], state['assignee_id']} - {None}
+
+
+def _counters(state):
+    """The snapshot counters one task in this state adds to"""
+    counters = status_counters(state)
+    if state['project_id']:
+        counters['project_tasks'] = 1
+    if state['idea_id']:
+        counters['idea_tasks'] = 1
+    if not state['project_id'] and not state['idea_id']:
+        counters['standalone_tasks'] = 1
+    return counters
+
+
+def apply_task_change(old, new):
+    """
+    Update the creator's and assignee's snapshots for a task change. Snapshots
+    not built yet are left alone; they are computed in full on first read.
+    """
+    move_counters(TaskDashboardSnapshot, 'user_id', old, new, _dashboard_users, _counters)
+
+
+def rebuild_snapshot(user_id):
+    """Recount a user's snapshot from scratch with a single aggregate query"""
+    now = timezone.now()
+    values = user_tasks(user_id).aggregate(
+        project_tasks=Count('pk', filter=Q(project__isnull=False)),
+        idea_tasks=Count('pk', filter=Q(idea__isnull=False)),
+        standalone_tasks=Count('pk', filter=Q(project__isnull=True, idea__isnull=True)),
+        **status_aggregates(),
+        **overdue_aggregates(now)
+    )
+    values['overdue_valid_until'] = overdue_valid_until(values.pop('next_due_date'), now)
+
+    snapshot, _ = TaskDashboardSnapshot.objects.update_or_create(user_id=user_id, defaults=values)
+    return snapshot
+
+
+def get_snapshot(user):
+    """The user's snapshot, built on first use and with overdue brought up to date"""
+    snapshot = TaskDashboardSnapshot.objects.filter(user=user).first()
+    if snapshot is None:
+        return rebuild_snapshot(user.pk)
+    return refresh_overdue(snapshot, user_tasks(user.pk))
+
+
+def discard_snapshots(user_ids):
+    """Drop snapshots after changes that bypass signals; they rebuild on next read"""
+    TaskDashboardSnapshot.objects.filter(user_id__in=set(user_ids) - {None}).delete()
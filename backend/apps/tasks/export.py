@@ -0,0 +1,105 @@
+import csv
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+
+# Rows are read in pk-ordered keyset chunks rather than through
+# iterator(): the MySQL drivers buffer a whole result set client-side,
+# while a bounded LIMIT per chunk keeps memory flat on every backend
+CHUNK_SIZE = 2000
+
+OUTPUTS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+# (column name, values() lookup)
+TASK_COLUMNS = (
+    ('id', 'id'),
+    ('title', 'title'),
+    ('status', 'status'),
+    ('priority', 'priority'),
+    ('project_id', 'project_id'),
+    ('project', 'project__title'),
+    ('idea_id', 'idea_id'),
+    ('task_list', 'task_list__name'),
+    ('parent_task_id', 'parent_task_id'),
+    ('assignee', 'assignee__email'),
+    ('created_by', 'created_by__email'),
+    ('due_date', 'due_date'),
+    ('start_date', 'start_date'),
+    ('completed_at', 'completed_at'),
+    ('estimated_hours', 'estimated_hours'),
+    ('actual_hours', 'actual_hours'),
+    ('tags', 'tags'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+)
+
+TIME_LOG_COLUMNS = (
+    ('id', 'id'),
+    ('date', 'date'),
+    ('hours', 'hours'),
+    ('description', 'description'),
+    ('user', 'user__email'),
+    ('task_id', 'task_id'),
+    ('task', 'task__title'),
+    ('project_id', 'task__project_id'),
+    ('project', 'task__project__title'),
+    ('created_at', 'created_at'),
+)
+
+
+def iterate_rows(queryset, columns, chunk_size=CHUNK_SIZE):
+    """Flat values() rows of queryset in pk order, CHUNK_SIZE at a time"""
+    names = [name for name, _ in columns]
+    rows = queryset.order_by('pk').values_list(*[lookup for _, lookup in columns])
+    last = None
+    while True:
+        chunk = list((rows if last is None else rows.filter(pk__gt=last))[:chunk_size])
+        for row in chunk:
+            yield dict(zip(names, row))
+        if len(chunk) < chunk_size:
+            return
+        last = chunk[-1][0]
+
+
+class _Echo:
+    """A file-like object for csv.writer that hands each line back instead of buffering it"""
+
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def csv_lines(rows, columns):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in columns])
+    for row in rows:
+        yield writer.writerow([_cell(value) for value in row.values()])
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def export_response(queryset, columns, output, name):
+    """A StreamingHttpResponse writing queryset as an attachment, one line per row"""
+    rows = iterate_rows(queryset, columns)
+    lines = csv_lines(rows, columns) if output == 'csv' else ndjson_lines(rows)
+    response = StreamingHttpResponse(lines, content_type=OUTPUTS[output])
+    filename = f'{name}-{timezone.now():%Y%m%d}.{output}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
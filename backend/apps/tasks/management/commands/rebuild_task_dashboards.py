@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from apps.tasks.dashboard import rebuild_snapshot
+from apps.tasks.models import TaskDashboardSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Recount task dashboard snapshots to fix drift; meant to run periodically (e.g. nightly cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only rebuild (or build) this user\'s snapshot')
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user_ids = [options['user']]
+        else:
+            # Users without a snapshot get one built on their next dashboard view
+            user_ids = list(TaskDashboardSnapshot.objects.values_list('user_id', flat=True))
+
+        for user_id in user_ids:
+            rebuild_snapshot(user_id)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(user_ids)} task dashboards'))
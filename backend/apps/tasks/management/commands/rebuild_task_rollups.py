@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from apps.projects.models import Project
+from apps.tasks.rollups import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = 'Recount the per-project task rollups to fix drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='Only rebuild this project\'s rollup')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.all()
+        if options['project']:
+            projects = projects.filter(pk=options['project'])
+
+        project_ids = list(projects.values_list('pk', flat=True))
+        for project_id in project_ids:
+            rebuild_rollup(project_id)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(project_ids)} task rollups'))
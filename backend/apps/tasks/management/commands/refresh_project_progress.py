@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from apps.tasks.rollups import refresh_progress
+
+
+class Command(BaseCommand):
+    help = 'Recompute Project.progress from the task rollups for projects not in manual mode'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='Only refresh this project\'s progress')
+
+    def handle(self, *args, **options):
+        project_ids = [options['project']] if options['project'] else None
+        updated = refresh_progress(project_ids)
+        self.stdout.write(self.style.SUCCESS(f'Refreshed progress of {updated} projects'))
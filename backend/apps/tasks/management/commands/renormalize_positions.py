@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from apps.tasks.ordering import renormalize, renormalize_all, task_siblings
+
+
+class Command(BaseCommand):
+    help = 'Spread task and task list positions back out to full gaps, ahead of the moves that need them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--task-list', type=int, help='Only renormalize the tasks of this list')
+
+    def handle(self, *args, **options):
+        if options['task_list']:
+            moved = renormalize(task_siblings(options['task_list']))
+        else:
+            moved = renormalize_all()
+        self.stdout.write(self.style.SUCCESS(f'Moved {moved} rows'))
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+
+
+def backfill_taskcomment_roots(apps, schema_editor):
+    TaskComment = apps.get_model('tasks', 'TaskComment')
+    parents = dict(TaskComment.objects.filter(parent__isnull=False).values_list('pk', 'parent_id'))
+
+    by_root = defaultdict(list)
+    for comment_id in parents:
+        root_id = parents[comment_id]
+        while root_id in parents:
+            root_id = parents[root_id]
+        by_root[root_id].append(comment_id)
+
+    for root_id, comment_ids in by_root.items():
+        TaskComment.objects.filter(pk__in=comment_ids).update(root_id=root_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskcomment',
+            name='root',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thread_replies', to='tasks.taskcomment'),
+        ),
+        migrations.RunPython(backfill_taskcomment_roots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('tasks', '0002_taskcomment_root'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskDashboardSnapshot',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='task_dashboard', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total', models.IntegerField(default=0)),
+                ('todo', models.IntegerField(default=0)),
+                ('in_progress', models.IntegerField(default=0)),
+                ('in_review', models.IntegerField(default=0)),
+                ('done', models.IntegerField(default=0)),
+                ('blocked', models.IntegerField(default=0)),
+                ('cancelled', models.IntegerField(default=0)),
+                ('project_tasks', models.IntegerField(default=0)),
+                ('idea_tasks', models.IntegerField(default=0)),
+                ('standalone_tasks', models.IntegerField(default=0)),
+                ('overdue', models.IntegerField(default=0)),
+                ('overdue_valid_until', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['created_by', 'updated_at'], name='tasks_task_created_e4fea1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['assignee', 'updated_at'], name='tasks_task_assigne_280d19_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['created_by', 'due_date'], name='tasks_task_created_b2987f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['assignee', 'due_date'], name='tasks_task_assigne_5c11c7_idx'),
+        ),
+    ]
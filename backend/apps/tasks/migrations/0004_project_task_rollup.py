@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Q, Sum
+
+
+STATUSES = ['todo', 'in_progress', 'in_review', 'done', 'blocked', 'cancelled']
+PRIORITIES = ['low', 'medium', 'high', 'urgent']
+
+
+def backfill_rollups(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    TaskTimeLog = apps.get_model('tasks', 'TaskTimeLog')
+    ProjectTaskRollup = apps.get_model('tasks', 'ProjectTaskRollup')
+
+    rows = Task.objects.filter(project__isnull=False).order_by().values('project_id').annotate(
+        total=Count('pk'),
+        idea_tasks=Count('pk', filter=Q(idea__isnull=False)),
+        estimated=Sum('estimated_hours'),
+        done_estimated=Sum('estimated_hours', filter=Q(status='done')),
+        **{status: Count('pk', filter=Q(status=status)) for status in STATUSES},
+        **{f'priority_{priority}': Count('pk', filter=Q(priority=priority)) for priority in PRIORITIES}
+    )
+    logged = dict(
+        TaskTimeLog.objects.filter(task__project__isnull=False).order_by().values(
+            'task__project_id'
+        ).annotate(total=Sum('hours')).values_list('task__project_id', 'total')
+    )
+
+    # overdue_valid_until stays null, so overdue is counted on first read
+    rollups = []
+    for row in rows:
+        row['estimated_hours'] = row.pop('estimated') or 0
+        row['done_estimated_hours'] = row.pop('done_estimated') or 0
+        rollups.append(ProjectTaskRollup(logged_hours=logged.get(row['project_id']) or 0, **row))
+    ProjectTaskRollup.objects.bulk_create(rollups, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0009_activity_feed_index'),
+        ('tasks', '0003_task_dashboard_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectTaskRollup',
+            fields=[
+                ('total', models.IntegerField(default=0)),
+                ('todo', models.IntegerField(default=0)),
+                ('in_progress', models.IntegerField(default=0)),
+                ('in_review', models.IntegerField(default=0)),
+                ('done', models.IntegerField(default=0)),
+                ('blocked', models.IntegerField(default=0)),
+                ('cancelled', models.IntegerField(default=0)),
+                ('overdue', models.IntegerField(default=0)),
+                ('overdue_valid_until', models.DateTimeField(blank=True, null=True)),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='task_rollup', serialize=False, to='projects.project')),
+                ('priority_low', models.IntegerField(default=0)),
+                ('priority_medium', models.IntegerField(default=0)),
+                ('priority_high', models.IntegerField(default=0)),
+                ('priority_urgent', models.IntegerField(default=0)),
+                ('idea_tasks', models.IntegerField(default=0)),
+                ('estimated_hours', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('done_estimated_hours', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('logged_hours', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
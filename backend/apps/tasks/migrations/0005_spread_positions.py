@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+# A frozen copy of apps.tasks.ordering as of this migration: positions
+# become POSITION_STEP apart in the order the rows are listed in
+POSITION_STEP = 1024
+ORDER = ('position', 'created_at', 'id')
+
+
+def spread(siblings):
+    moved = []
+    for index, obj in enumerate(siblings.order_by(*ORDER).only('position'), 1):
+        if obj.position != index * POSITION_STEP:
+            obj.position = index * POSITION_STEP
+            moved.append(obj)
+    if moved:
+        type(moved[0]).objects.bulk_update(moved, ['position'], batch_size=1000)
+
+
+def spread_positions(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    TaskList = apps.get_model('tasks', 'TaskList')
+
+    for task_list_id in TaskList.objects.order_by('pk').values_list('pk', flat=True):
+        spread(Task.objects.filter(task_list_id=task_list_id))
+    for project_id in TaskList.objects.filter(project__isnull=False).order_by().values_list(
+        'project_id', flat=True
+    ).distinct():
+        spread(TaskList.objects.filter(project_id=project_id))
+    for user_id in TaskList.objects.filter(project__isnull=True).order_by().values_list(
+        'created_by_id', flat=True
+    ).distinct():
+        spread(TaskList.objects.filter(project__isnull=True, created_by_id=user_id))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_project_task_rollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(spread_positions, migrations.RunPython.noop),
+    ]
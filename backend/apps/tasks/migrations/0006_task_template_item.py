@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_spread_positions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskTemplateItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('urgent', 'Urgent')], default='medium', max_length=20)),
+                ('estimated_hours', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('tags', models.CharField(blank=True, max_length=500)),
+                ('depends_on', models.ManyToManyField(blank=True, related_name='dependents', to='tasks.tasktemplateitem')),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='tasks.tasktemplateitem')),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='tasks.tasktemplate')),
+            ],
+            options={
+                'ordering': ['position', 'id'],
+            },
+        ),
+    ]
@@ -1,7 +1,11 @@
 from django.db import models
+from django.db.models import Case, When, Value, Q, OuterRef, Prefetch
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from apps.projects.models import Project
+from apps.projects.queries import subquery_count, subquery_sum
+from apps.projects.threads import save_comment
 
 
 class TaskList(models.Model):
@@ -23,6 +27,59 @@ class TaskList(models.Model):
         return f"Personal - {self.name}"
 
 
+class TaskQuerySet(models.QuerySet):
+    def with_list_annotations(self):
+        """
+        Compute the per-row counts and flags TaskBasicSerializer renders in SQL,
+        so a list costs one query instead of several per task. The model
+        properties and serializer fields read these when present.
+        """
+        return self.annotate(
+            subtasks_total=subquery_count(Task.objects.filter(parent_task=OuterRef('pk'))),
+            subtasks_done=subquery_count(
+                Task.objects.filter(parent_task=OuterRef('pk'), status='done')
+            ),
+            comments_total=subquery_count(TaskComment.objects.filter(task=OuterRef('pk'))),
+            attachments_total=subquery_count(TaskAttachment.objects.filter(task=OuterRef('pk'))),
+            overdue=Case(
+                When(
+                    Q(due_date__lt=timezone.now()) & ~Q(status__in=Task.CLOSED_STATUSES),
+                    then=Value(True)
+                ),
+                default=Value(False),
+                output_field=models.BooleanField(),
+            ),
+        )
+
+    def for_list(self):
+        """Everything TaskBasicSerializer reads, and nothing else"""
+        return self.with_list_annotations().select_related(
+            'assignee', 'created_by', 'project', 'idea'
+        )
+
+    def for_detail(self):
+        """
+        Everything TaskDetailSerializer reads. The nested subtask and
+        dependency lists are each one annotated prefetch, and
+        blocked_dependencies and can_start are answered from the
+        prefetched dependencies.
+        """
+        nested = Task.objects.for_list()
+        return self.for_list().select_related(
+            'parent_task__assignee', 'parent_task__created_by',
+            'parent_task__project', 'parent_task__idea'
+        ).annotate(
+            time_logged=subquery_sum(
+                TaskTimeLog.objects.filter(task=OuterRef('pk')), 'hours',
+                models.DecimalField(max_digits=10, decimal_places=2)
+            ),
+        ).prefetch_related(
+            Prefetch('subtasks', queryset=nested),
+            Prefetch('dependencies', queryset=nested),
+            Prefetch('dependent_tasks', queryset=nested),
+        )
+
+
 class Task(models.Model):
     STATUS_CHOICES = [
         ('todo', 'To Do'),
@@ -40,6 +97,16 @@ class Task(models.Model):
         ('urgent', 'Urgent'),
     ]
 
+    # Statuses that can no longer become overdue
+    CLOSED_STATUSES = ['done', 'cancelled']
+
+    # Columns the signal-maintained read models depend on. Their stored
+    # values are remembered on load so handlers can diff a save against them.
+    TRACKED_FIELDS = (
+        'status', 'priority', 'project_id', 'idea_id',
+        'created_by_id', 'assignee_id', 'due_date', 'estimated_hours',
+    )
+
     # Core fields
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
@@ -74,6 +141,8 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TaskQuerySet.as_manager()
+
     class Meta:
         ordering = ['position', 'created_at']
         indexes = [
@@ -81,11 +150,35 @@ class Task(models.Model):
             models.Index(fields=['assignee', 'status']),
             models.Index(fields=['due_date']),
             models.Index(fields=['priority', 'status']),
+            # Dashboard recent-tasks and upcoming-deadline lists
+            models.Index(fields=['created_by', 'updated_at']),
+            models.Index(fields=['assignee', 'updated_at']),
+            models.Index(fields=['created_by', 'due_date']),
+            models.Index(fields=['assignee', 'due_date']),
         ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_state = {
+            name: instance.__dict__[name] for name in cls.TRACKED_FIELDS if name in field_names
+        }
+        return instance
+
+    def tracked_state(self):
+        """Current values of TRACKED_FIELDS"""
+        return {name: getattr(self, name) for name in self.TRACKED_FIELDS}
+
+    def stored_state(self):
+        """Values of TRACKED_FIELDS as last loaded or saved, or None if unknown"""
+        state = getattr(self, '_stored_state', None)
+        if state is None or len(state) != len(self.TRACKED_FIELDS):
+            return None
+        return state
+
     def clean(self):
         """Validate that task has at least one context (project, idea, or is standalone)"""
         from django.core.exceptions import ValidationError
@@ -101,11 +194,11 @@ class Task(models.Model):
     @property
     def context_type(self):
         """Return the context type of this task"""
-        if self.project and self.idea:
+        if self.project_id and self.idea_id:
             return 'project_idea'
-        elif self.project:
+        elif self.project_id:
             return 'project'
-        elif self.idea:
+        elif self.idea_id:
             return 'idea'
         else:
             return 'standalone'
@@ -130,20 +223,24 @@ class Task(models.Model):
     @property
     def is_overdue(self):
         """Check if task is overdue"""
-        if not self.due_date or self.status in ['done', 'cancelled']:
+        if hasattr(self, 'overdue'):
+            return self.overdue
+        if not self.due_date or self.status in self.CLOSED_STATUSES:
             return False
-        from django.utils import timezone
         return timezone.now() > self.due_date
 
     @property
     def progress_percentage(self):
         """Calculate progress based on subtasks completion"""
-        subtasks = self.subtasks.all()
-        if not subtasks.exists():
-            return 100 if self.status == 'done' else 0
+        if hasattr(self, 'subtasks_total'):
+            total, completed = self.subtasks_total, self.subtasks_done
+        else:
+            statuses = [subtask.status for subtask in self.subtasks.all()]
+            total, completed = len(statuses), statuses.count('done')
         
-        completed_subtasks = subtasks.filter(status='done').count()
-        return (completed_subtasks / subtasks.count()) * 100
+        if not total:
+            return 100 if self.status == 'done' else 0
+        return (completed / total) * 100
 
     def can_start(self):
         """Check if task can be started based on dependencies"""
@@ -154,6 +251,8 @@ class Task(models.Model):
 
     def get_blocked_dependencies(self):
         """Get list of incomplete dependencies blocking this task"""
+        if 'dependencies' in getattr(self, '_prefetched_objects_cache', {}):
+            return [dependency for dependency in self.dependencies.all() if dependency.status != 'done']
         return self.dependencies.exclude(status='done')
 
 
@@ -163,6 +262,8 @@ class TaskComment(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    # Top-level comment of the thread (null for top-level comments)
+    root = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='thread_replies')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -172,6 +273,9 @@ class TaskComment(models.Model):
     def __str__(self):
         return f"Comment on {self.task.title} by {self.author.get_full_name()}"
 
+    def save(self, *args, **kwargs):
+        save_comment(self, lambda: super(TaskComment, self).save(*args, **kwargs))
+
 
 class TaskAttachment(models.Model):
     """File attachments for tasks"""
@@ -221,6 +325,9 @@ class TaskActivity(models.Model):
 
 class TaskTimeLog(models.Model):
     """Time tracking for tasks"""
+    # Fields whose changes move hours between project rollups
+    TRACKED_FIELDS = ('task_id', 'hours')
+
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='time_logs')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     description = models.TextField(blank=True)
@@ -234,6 +341,25 @@ class TaskTimeLog(models.Model):
     def __str__(self):
         return f"{self.hours}h on {self.task.title} by {self.user.get_full_name()}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_state = {
+            name: instance.__dict__[name] for name in cls.TRACKED_FIELDS if name in field_names
+        }
+        return instance
+
+    def tracked_state(self):
+        """Current values of TRACKED_FIELDS"""
+        return {name: getattr(self, name) for name in self.TRACKED_FIELDS}
+
+    def stored_state(self):
+        """Values of TRACKED_FIELDS as last loaded or saved, or None if unknown"""
+        state = getattr(self, '_stored_state', None)
+        if state is None or len(state) != len(self.TRACKED_FIELDS):
+            return None
+        return state
+
 
 class TaskTemplate(models.Model):
     """Reusable task templates"""
@@ -266,3 +392,109 @@ class TaskTemplate(models.Model):
         }
         task_data.update(kwargs)
         return Task.objects.create(**task_data)
+
+    def instantiate(self, user, project=None, idea=None, task_list=None):
+        """
+        Create this template's task with its items as subtasks, dependencies
+        included, through the batch engine (apps/tasks/batch.py) in a fixed
+        number of queries. Returns (task, {item id: task}).
+        """
+        from .batch import instantiate_template
+        return instantiate_template(self, user, project=project, idea=idea, task_list=task_list)
+
+
+class TaskTemplateItem(models.Model):
+    """
+    One task of a template's tree: a subtask of the template's own task, or
+    of another item through parent, ordered by position among its siblings
+    """
+    template = models.ForeignKey(TaskTemplate, on_delete=models.CASCADE, related_name='items')
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    depends_on = models.ManyToManyField('self', blank=True, symmetrical=False, related_name='dependents')
+    position = models.PositiveIntegerField(default=0)
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    priority = models.CharField(max_length=20, choices=Task.PRIORITY_CHOICES, default='medium')
+    estimated_hours = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    tags = models.CharField(max_length=500, blank=True)
+
+    class Meta:
+        ordering = ['position', 'id']
+
+    def __str__(self):
+        return f"{self.template.name} - {self.title}"
+
+
+class TaskCounters(models.Model):
+    """
+    Status and overdue counters shared by the signal-maintained task read
+    models. See apps/tasks/counters.py.
+    """
+    total = models.IntegerField(default=0)
+
+    # One counter per Task status
+    todo = models.IntegerField(default=0)
+    in_progress = models.IntegerField(default=0)
+    in_review = models.IntegerField(default=0)
+    done = models.IntegerField(default=0)
+    blocked = models.IntegerField(default=0)
+    cancelled = models.IntegerField(default=0)
+
+    # Tasks turn overdue as time passes, so this count is recomputed on read
+    # once overdue_valid_until has passed; null means it must be recomputed
+    overdue = models.IntegerField(default=0)
+    overdue_valid_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+    def status_counts(self):
+        """Non-zero counts keyed by status, like a GROUP BY status"""
+        counts = {status: getattr(self, status) for status, _ in Task.STATUS_CHOICES}
+        return {status: count for status, count in counts.items() if count}
+
+
+class TaskDashboardSnapshot(TaskCounters):
+    """
+    Per-user counters behind TaskViewSet.dashboard, over the tasks the user
+    created or is assigned. Kept current by the Task signals through
+    apps/tasks/dashboard.py and rebuilt by the rebuild_task_dashboards command.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='task_dashboard')
+
+    project_tasks = models.IntegerField(default=0)
+    idea_tasks = models.IntegerField(default=0)
+    standalone_tasks = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Task dashboard for {self.user}"
+
+
+class ProjectTaskRollup(TaskCounters):
+    """
+    Per-project task totals behind TaskViewSet.stats and the project list.
+    Kept current by the Task and TaskTimeLog signals through
+    apps/tasks/rollups.py and rebuilt by the rebuild_task_rollups command.
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='task_rollup')
+
+    # One counter per Task priority
+    priority_low = models.IntegerField(default=0)
+    priority_medium = models.IntegerField(default=0)
+    priority_high = models.IntegerField(default=0)
+    priority_urgent = models.IntegerField(default=0)
+
+    idea_tasks = models.IntegerField(default=0)
+    estimated_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    done_estimated_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    logged_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"Task rollup for {self.project}"
+
+    def priority_counts(self):
+        """Non-zero counts keyed by priority, like a GROUP BY priority"""
+        counts = {
+            priority: getattr(self, f'priority_{priority}') for priority, _ in Task.PRIORITY_CHOICES
+        }
+        return {priority: count for priority, count in counts.items() if count}
@@ -0,0 +1,115 @@
+from django.db.models import Max, Q
+
+from .models import Task, TaskList
+
+
+# Positions are gapped integers, so a moved row takes the midpoint between
+# its new neighbours and nothing else is written. About ten moves into the
+# same slot use a gap up; only then are the siblings spread out again.
+POSITION_STEP = 1024
+MAX_POSITION = 2147483647
+
+# The tie-breakers of the Task and TaskList orderings, plus the id
+ORDER = ('position', 'created_at', 'id')
+
+
+def task_siblings(task_list_id):
+    return Task.objects.filter(task_list_id=task_list_id)
+
+
+def list_siblings(task_list):
+    """The lists task_list is ordered among: its project's, or its owner's personal lists"""
+    if task_list.project_id:
+        return TaskList.objects.filter(project_id=task_list.project_id)
+    return TaskList.objects.filter(project__isnull=True, created_by_id=task_list.created_by_id)
+
+
+def renormalize(siblings):
+    """
+    Spread siblings POSITION_STEP apart in their current order, with one
+    bulk_update of the rows whose position changes. Returns that count.
+    """
+    moved = []
+    for index, obj in enumerate(siblings.order_by(*ORDER).only('position'), 1):
+        if obj.position != index * POSITION_STEP:
+            obj.position = index * POSITION_STEP
+            moved.append(obj)
+    if moved:
+        type(moved[0]).objects.bulk_update(moved, ['position'], batch_size=1000)
+    return len(moved)
+
+
+def renormalize_all():
+    """
+    Spread the tasks of every list, and the lists of every project and
+    owner, back out to full gaps. Returns the number of rows moved.
+    """
+    moved = 0
+    for task_list_id in TaskList.objects.order_by('pk').values_list('pk', flat=True):
+        moved += renormalize(Task.objects.filter(task_list_id=task_list_id))
+    for project_id in TaskList.objects.filter(project__isnull=False).order_by().values_list(
+        'project_id', flat=True
+    ).distinct():
+        moved += renormalize(TaskList.objects.filter(project_id=project_id))
+    for user_id in TaskList.objects.filter(project__isnull=True).order_by().values_list(
+        'created_by_id', flat=True
+    ).distinct():
+        moved += renormalize(TaskList.objects.filter(project__isnull=True, created_by_id=user_id))
+    return moved
+
+
+def next_position(siblings):
+    """The position after the last of siblings, for rows added at the end"""
+    last = siblings.aggregate(last=Max('position'))['last']
+    if last is None:
+        return POSITION_STEP
+    if last + POSITION_STEP > MAX_POSITION:
+        renormalize(siblings)
+        return next_position(siblings)
+    return last + POSITION_STEP
+
+
+def _between(lower, upper):
+    """A position strictly between two neighbours (None for an open end), or None if there is no room"""
+    if upper is None:
+        position = (lower or 0) + POSITION_STEP
+        return position if position <= MAX_POSITION else None
+    low = -1 if lower is None else lower
+    position = (low + upper) // 2
+    return position if low < position < upper else None
+
+
+def _following(siblings, after):
+    """Position of the first of siblings ordered after `after` (None: the first of all)"""
+    if after is not None:
+        siblings = siblings.filter(
+            Q(position__gt=after.position) |
+            Q(position=after.position, created_at__gt=after.created_at) |
+            Q(position=after.position, created_at=after.created_at, id__gt=after.pk)
+        )
+    return siblings.order_by(*ORDER).values_list('position', flat=True).first()
+
+
+def place(obj, siblings, after=None):
+    """
+    The position that puts obj right after `after`, one of siblings (None
+    for the start), reading only the neighbour that follows it. When the two
+    neighbours leave no room the siblings are renormalized first.
+    """
+    others = siblings.exclude(pk=obj.pk)
+    position = _between(after and after.position, _following(others, after))
+    if position is None:
+        renormalize(others)
+        if after is not None:
+            after = others.only('position', 'created_at').get(pk=after.pk)
+        position = _between(after and after.position, _following(others, after))
+    return position
+
+
+def move_after(obj, siblings, after=None, **fields):
+    """Place obj after `after` among siblings with an UPDATE of its row alone, along with fields"""
+    obj.position = place(obj, siblings, after)
+    for name, value in fields.items():
+        setattr(obj, name, value)
+    type(obj).objects.filter(pk=obj.pk).update(position=obj.position, **fields)
+    return obj
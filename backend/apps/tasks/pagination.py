@@ -0,0 +1,13 @@
+from django.conf import settings
+
+from apps.projects.pagination import KeysetCursorPagination
+
+
+class TaskCursorPagination(KeysetCursorPagination):
+    """Task lists in board order; the page size cap comes from settings"""
+    ordering = ('position', 'created_at', 'id')
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        self.page_size = settings.TASK_PAGE_SIZE
+        self.max_page_size = settings.TASK_MAX_PAGE_SIZE
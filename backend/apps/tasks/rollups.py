@@ -0,0 +1,167 @@
+from collections import Counter
+
+from django.db.models import (
+    Count, Q, Sum, F, OuterRef, Subquery, Case, When, Value, DecimalField, IntegerField
+)
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from .counters import (
+    status_counters, status_aggregates, move_counters,
+    overdue_aggregates, overdue_valid_until, refresh_overdue,
+)
+from apps.projects.models import Project
+from .models import Task, TaskTimeLog, ProjectTaskRollup
+
+
+HOURS = DecimalField(max_digits=10, decimal_places=2)
+
+
+def _rollup_projects(state):
+    return {state['project_id']} - {None}
+
+
+def _counters(state):
+    """The rollup counters one task in this state adds to"""
+    counters = status_counters(state)
+    if state['priority'] in dict(Task.PRIORITY_CHOICES):
+        counters[f"priority_{state['priority']}"] = 1
+    if state['idea_id']:
+        counters['idea_tasks'] = 1
+    if state['estimated_hours']:
+        counters['estimated_hours'] = state['estimated_hours']
+        if state['status'] == 'done':
+            counters['done_estimated_hours'] = state['estimated_hours']
+    return counters
+
+
+def apply_task_change(old, new, task_id=None):
+    """Update the project rollups for a change of the task task_id"""
+    missing = move_counters(ProjectTaskRollup, 'project_id', old, new, _rollup_projects, _counters)
+
+    # Build a missing rollup only for the project the task now belongs to;
+    # on deletes the project itself may be going away in the same cascade
+    new_project = new and new['project_id']
+    if new_project in missing:
+        rebuild_rollup(new_project)
+
+    # Logged hours follow a task that moves between projects; a rollup just
+    # rebuilt has counted them already
+    old_project = old and old['project_id']
+    if old and new and old_project != new_project:
+        move_logged_hours(task_id, old_project, None if new_project in missing else new_project)
+
+    if _progress_inputs(old) != _progress_inputs(new):
+        refresh_progress({old_project, new_project} - {None})
+
+
+def _progress_inputs(state):
+    if state is None:
+        return None
+    return state['project_id'], state['status'], state['estimated_hours']
+
+
+def _add_logged_hours(deltas):
+    """Add {project id: hours} to the rollups' logged hours, by F() increments"""
+    for project_id, hours in deltas.items():
+        if project_id is not None and hours:
+            ProjectTaskRollup.objects.filter(project_id=project_id).update(
+                logged_hours=F('logged_hours') + hours
+            )
+
+
+def apply_time_log_change(old, new):
+    """
+    Move one time log's hours between project rollups as it goes from state
+    old to state new (TaskTimeLog.tracked_state() dicts; None before
+    creation and after deletion), including when it moves to a task of
+    another project
+    """
+    if old == new:
+        return
+    states = [state for state in (old, new) if state]
+    projects = dict(Task.objects.filter(
+        pk__in={state['task_id'] for state in states}
+    ).values_list('pk', 'project_id'))
+
+    deltas = Counter()
+    if old:
+        deltas[projects.get(old['task_id'])] -= old['hours']
+    if new:
+        deltas[projects.get(new['task_id'])] += new['hours']
+    _add_logged_hours(deltas)
+
+
+def move_logged_hours(task_id, old_project, new_project):
+    """Carry the hours logged on a task that moved between projects along with it"""
+    hours = TaskTimeLog.objects.filter(task_id=task_id).aggregate(total=Sum('hours'))['total']
+    if hours:
+        _add_logged_hours({old_project: -hours, new_project: hours})
+
+
+def rebuild_rollup(project_id):
+    """Recount a project's rollup from scratch"""
+    now = timezone.now()
+    values = Task.objects.filter(project_id=project_id).aggregate(
+        idea_tasks=Count('pk', filter=Q(idea__isnull=False)),
+        estimated=Coalesce(Sum('estimated_hours'), 0, output_field=HOURS),
+        done_estimated=Coalesce(Sum('estimated_hours', filter=Q(status='done')), 0, output_field=HOURS),
+        **{
+            f'priority_{priority}': Count('pk', filter=Q(priority=priority))
+            for priority, _ in Task.PRIORITY_CHOICES
+        },
+        **status_aggregates(),
+        **overdue_aggregates(now)
+    )
+    values['overdue_valid_until'] = overdue_valid_until(values.pop('next_due_date'), now)
+    values['estimated_hours'] = values.pop('estimated')
+    values['done_estimated_hours'] = values.pop('done_estimated')
+    values['logged_hours'] = TaskTimeLog.objects.filter(
+        task__project_id=project_id
+    ).aggregate(total=Sum('hours'))['total'] or 0
+
+    rollup, _ = ProjectTaskRollup.objects.update_or_create(project_id=project_id, defaults=values)
+    refresh_progress([project_id])
+    return rollup
+
+
+def _share_done(done, total):
+    """Whole percent of done over total, 0 for an empty total"""
+    return Case(
+        When(**{total: 0}, then=Value(0)),
+        default=Cast(F(done) * 100 / F(total), IntegerField()),
+    )
+
+
+def refresh_progress(project_ids=None):
+    """
+    Set Project.progress from the task rollups, for the given projects (all
+    when None) that are not in manual mode. One UPDATE reading the rollup
+    counters, so no tasks are counted. Weighted projects whose tasks carry
+    no estimates fall back to the share of tasks done.
+    """
+    projects = Project.objects.exclude(progress_mode='manual')
+    if project_ids is not None:
+        projects = projects.filter(pk__in=project_ids)
+
+    rollup = ProjectTaskRollup.objects.filter(project_id=OuterRef('pk'))
+    by_tasks = _share_done('done', 'total')
+    by_hours = Case(
+        When(estimated_hours=0, then=by_tasks),
+        default=_share_done('done_estimated_hours', 'estimated_hours'),
+    )
+    return projects.update(progress=Coalesce(
+        Case(
+            When(progress_mode='weighted', then=Subquery(rollup.annotate(share=by_hours).values('share'))),
+            default=Subquery(rollup.annotate(share=by_tasks).values('share')),
+        ),
+        0,
+    ))
+
+
+def get_rollup(project):
+    """The project's rollup, built on first use and with overdue brought up to date"""
+    rollup = ProjectTaskRollup.objects.filter(project=project).first()
+    if rollup is None:
+        return rebuild_rollup(project.pk)
+    return refresh_overdue(rollup, Task.objects.filter(project=project))
@@ -1,10 +1,17 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import prefetch_related_objects
 from .models import (
     Task, TaskList, TaskComment, TaskAttachment, 
-    TaskActivity, TaskTimeLog, TaskTemplate
+    TaskActivity, TaskTimeLog, TaskTemplate, TaskTemplateItem
 )
 from apps.projects.models import Project
+from apps.ideas.models import Idea
+from apps.projects.activity_log import record
+from apps.projects.threads import get_replies_data
+from .ordering import POSITION_STEP, next_position, task_siblings, list_siblings
+from .batch import MAX_BATCH_SIZE
 
 
 class UserBasicSerializer(serializers.ModelSerializer):
@@ -24,6 +31,7 @@ class ProjectBasicSerializer(serializers.ModelSerializer):
 class IdeaBasicSerializer(serializers.ModelSerializer):
     """Basic idea serializer for task context"""
     class Meta:
+        model = Idea
         fields = ['id', 'title', 'description']
 
 
@@ -52,6 +60,8 @@ class TaskListSerializer(serializers.ModelSerializer):
         project_id = self.context.get('project_id')
         if project_id:
             validated_data['project_id'] = project_id
+        if 'position' not in validated_data:
+            validated_data['position'] = next_position(list_siblings(TaskList(**validated_data)))
         return super().create(validated_data)
 
 
@@ -79,13 +89,22 @@ class TaskBasicSerializer(serializers.ModelSerializer):
             'subtasks_count', 'comments_count', 'attachments_count'
         ]
 
+    # The counts come from TaskQuerySet.with_list_annotations() when the
+    # view used it, and fall back to a COUNT query otherwise
+
     def get_subtasks_count(self, obj):
+        if hasattr(obj, 'subtasks_total'):
+            return obj.subtasks_total
         return obj.subtasks.count()
 
     def get_comments_count(self, obj):
+        if hasattr(obj, 'comments_total'):
+            return obj.comments_total
         return obj.comments.count()
 
     def get_attachments_count(self, obj):
+        if hasattr(obj, 'attachments_total'):
+            return obj.attachments_total
         return obj.attachments.count()
 
 
@@ -108,6 +127,8 @@ class TaskDetailSerializer(TaskBasicSerializer):
         ]
 
     def get_total_time_logged(self, obj):
+        if hasattr(obj, 'time_logged'):
+            return obj.time_logged
         return sum(log.hours for log in obj.time_logs.all())
 
 
@@ -171,6 +192,7 @@ class TaskCreateUpdateSerializer(serializers.ModelSerializer):
             validated_data['assignee_id'] = assignee_id
         if task_list_id:
             validated_data['task_list_id'] = task_list_id
+            validated_data['position'] = next_position(task_siblings(task_list_id))
         if parent_task_id:
             validated_data['parent_task_id'] = parent_task_id
 
@@ -184,12 +206,12 @@ class TaskCreateUpdateSerializer(serializers.ModelSerializer):
         # Log activity
         from .models import TaskActivity
         context_desc = task.context_display
-        TaskActivity.objects.create(
+        record(TaskActivity(
             task=task,
             action='created',
             description=f'Task "{task.title}" was created in {context_desc}',
             user=self.context['request'].user
-        )
+        ))
 
         return task
 
@@ -207,9 +229,7 @@ class TaskCommentSerializer(serializers.ModelSerializer):
         ]
 
     def get_replies(self, obj):
-        if obj.replies.exists():
-            return TaskCommentSerializer(obj.replies.all(), many=True, context=self.context).data
-        return []
+        return get_replies_data(self, obj)
 
     def create(self, validated_data):
         validated_data['author'] = self.context['request'].user
@@ -278,25 +298,128 @@ class TaskTimeLogSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class TaskTemplateItemSerializer(serializers.ModelSerializer):
+    """
+    Serializer for template items. Items are written as a whole list, in
+    order, naming their parent and dependencies by refs within that list.
+    """
+    ref = serializers.CharField(write_only=True, required=False, max_length=100)
+    parent_ref = serializers.CharField(write_only=True, required=False, allow_null=True)
+    depends_on_refs = serializers.ListField(
+        child=serializers.CharField(), write_only=True, required=False
+    )
+    depends_on = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    class Meta:
+        model = TaskTemplateItem
+        fields = [
+            'id', 'ref', 'parent', 'parent_ref', 'depends_on', 'depends_on_refs',
+            'position', 'title', 'description', 'priority', 'estimated_hours', 'tags'
+        ]
+        read_only_fields = ['parent', 'position']
+
+
 class TaskTemplateSerializer(serializers.ModelSerializer):
     """Serializer for task templates"""
     created_by = UserBasicSerializer(read_only=True)
     tag_list = serializers.SerializerMethodField()
+    items = TaskTemplateItemSerializer(many=True, required=False)
 
     class Meta:
         model = TaskTemplate
         fields = [
             'id', 'name', 'description', 'title_template', 
             'description_template', 'priority', 'estimated_hours', 
-            'tags', 'tag_list', 'created_by', 'is_public', 'created_at'
+            'tags', 'tag_list', 'items', 'created_by', 'is_public', 'created_at'
         ]
 
     def get_tag_list(self, obj):
         return [tag.strip() for tag in obj.tags.split(',') if tag.strip()]
 
+    def to_representation(self, instance):
+        # Templates just written (DRF also drops the prefetch after updates)
+        # load their items and dependencies in two queries, not one per item
+        prefetch_related_objects([instance], 'items__depends_on')
+        return super().to_representation(instance)
+
+    def validate_items(self, value):
+        refs = {}
+        for index, item in enumerate(value):
+            ref = item.get('ref')
+            if ref is not None:
+                if ref in refs:
+                    raise serializers.ValidationError(f'Duplicate ref "{ref}"')
+                refs[ref] = index
+
+        for item in value:
+            for ref in [item.get('parent_ref')] + item.get('depends_on_refs', []):
+                if ref is not None and ref not in refs:
+                    raise serializers.ValidationError(f'Unknown ref "{ref}"')
+                if ref is not None and ref == item.get('ref'):
+                    raise serializers.ValidationError('An item cannot reference itself')
+
+        for item in value:
+            seen = set()
+            while item.get('parent_ref') is not None:
+                if item['parent_ref'] in seen:
+                    raise serializers.ValidationError('Parent refs form a cycle')
+                seen.add(item['parent_ref'])
+                item = value[refs[item['parent_ref']]]
+        return value
+
     def create(self, validated_data):
+        items = validated_data.pop('items', None)
         validated_data['created_by'] = self.context['request'].user
-        return super().create(validated_data)
+        with transaction.atomic():
+            template = super().create(validated_data)
+            if items:
+                self._save_items(template, items)
+        return template
+
+    def update(self, instance, validated_data):
+        items = validated_data.pop('items', None)
+        with transaction.atomic():
+            template = super().update(instance, validated_data)
+            if items is not None:
+                template.items.all().delete()
+                self._save_items(template, items)
+        return template
+
+    def _save_items(self, template, items):
+        """
+        Insert items in list order with one bulk_create, then link their
+        parents by ref with one bulk_update and their dependencies with one
+        through-table bulk_create
+        """
+        saved = {}
+        links = []
+        for index, data in enumerate(items, 1):
+            links.append((data.pop('parent_ref', None), data.pop('depends_on_refs', [])))
+            ref = data.pop('ref', None)
+            saved[index if ref is None else ref] = TaskTemplateItem(
+                template=template, position=index * POSITION_STEP, **data
+            )
+        TaskTemplateItem.objects.bulk_create(saved.values())
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # MySQL returns no ids; the template's items were all just written,
+            # and their positions follow the list order
+            for item, pk in zip(saved.values(), template.items.order_by('position').values_list('pk', flat=True)):
+                item.pk = pk
+
+        Through = TaskTemplateItem.depends_on.through
+        children = []
+        through_rows = []
+        for item, (parent_ref, depends_on_refs) in zip(saved.values(), links):
+            if parent_ref is not None:
+                item.parent = saved[parent_ref]
+                children.append(item)
+            through_rows += [
+                Through(from_tasktemplateitem_id=item.pk, to_tasktemplateitem_id=saved[ref].pk)
+                for ref in dict.fromkeys(depends_on_refs)
+            ]
+        if children:
+            TaskTemplateItem.objects.bulk_update(children, ['parent'])
+        Through.objects.bulk_create(through_rows)
 
 
 class TaskBulkUpdateSerializer(serializers.Serializer):
@@ -328,3 +451,44 @@ class TaskBulkUpdateSerializer(serializers.Serializer):
             raise serializers.ValidationError("Invalid priority value")
 
         return data
+
+
+class TaskBatchRowSerializer(serializers.ModelSerializer):
+    """
+    One task of a batch create. Rows name each other through `ref`, a
+    client-side temporary id; ids of other tables are checked for the whole
+    batch at once in apps/tasks/batch.py, not per row.
+    """
+    ref = serializers.CharField(max_length=64, required=False)
+    assignee_id = serializers.IntegerField(required=False, allow_null=True)
+    task_list_id = serializers.IntegerField(required=False, allow_null=True)
+    project_id = serializers.IntegerField(required=False, allow_null=True)
+    idea_id = serializers.IntegerField(required=False, allow_null=True)
+    parent_task_id = serializers.IntegerField(required=False, allow_null=True)
+    parent_ref = serializers.CharField(max_length=64, required=False)
+    dependency_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    dependency_refs = serializers.ListField(child=serializers.CharField(max_length=64), required=False)
+
+    class Meta:
+        model = Task
+        fields = [
+            'ref', 'title', 'description', 'status', 'priority',
+            'due_date', 'start_date', 'estimated_hours', 'tags',
+            'assignee_id', 'task_list_id', 'project_id', 'idea_id',
+            'parent_task_id', 'parent_ref', 'dependency_ids', 'dependency_refs'
+        ]
+
+    def validate(self, data):
+        if data.get('parent_task_id') and data.get('parent_ref'):
+            raise serializers.ValidationError("Give either parent_task_id or parent_ref")
+        return data
+
+
+class TaskBatchCreateSerializer(serializers.Serializer):
+    """Serializer for batch task creation"""
+    tasks = TaskBatchRowSerializer(many=True, allow_empty=False)
+
+    def validate_tasks(self, value):
+        if len(value) > MAX_BATCH_SIZE:
+            raise serializers.ValidationError(f"At most {MAX_BATCH_SIZE} tasks can be created at once")
+        return value
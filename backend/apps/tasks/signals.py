@@ -1,8 +1,45 @@
-from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.utils import timezone
 from django.db import models
+from apps.projects.activity_log import record
 from .models import Task, TaskActivity, TaskTimeLog
+from . import dashboard, rollups
+from .bulk import signals_deferred
+
+
+@receiver(pre_save, sender=Task)
+def load_stored_task_state(sender, instance, **kwargs):
+    """
+    Tasks loaded with deferred fields, or built by hand with an existing pk,
+    do not know their stored state; read it before the row is overwritten.
+    """
+    if instance._state.adding or instance.stored_state() is not None:
+        return
+    instance._stored_state = Task.objects.filter(pk=instance.pk).values(*Task.TRACKED_FIELDS).first()
+
+
+@receiver(post_save, sender=Task)
+def update_read_models_on_save(sender, instance, created, **kwargs):
+    """Apply the saved change to the dashboard snapshots and project rollups"""
+    if signals_deferred():
+        return
+    previous = None if created else instance.stored_state()
+    current = instance.tracked_state()
+    # Remember the new state first: a nested save must not apply it twice
+    instance._stored_state = current
+    dashboard.apply_task_change(previous, current)
+    rollups.apply_task_change(previous, current, instance.pk)
+
+
+@receiver(post_delete, sender=Task)
+def update_read_models_on_delete(sender, instance, **kwargs):
+    """Remove a deleted task from the dashboard snapshots and project rollups"""
+    if signals_deferred():
+        return
+    previous = instance.stored_state() or instance.tracked_state()
+    dashboard.apply_task_change(previous, None)
+    rollups.apply_task_change(previous, None, instance.pk)
 
 
 @receiver(post_save, sender=Task)
@@ -21,6 +58,8 @@ def log_task_changes(sender, instance, created, **kwargs):
 @receiver(post_save, sender=TaskTimeLog)
 def update_task_actual_hours(sender, instance, **kwargs):
     """Update task's actual hours when time log is added/updated"""
+    if signals_deferred():
+        return
     task = instance.task
     total_hours = task.time_logs.aggregate(
         total=models.Sum('hours')
@@ -34,6 +73,8 @@ def update_task_actual_hours(sender, instance, **kwargs):
 @receiver(post_delete, sender=TaskTimeLog)
 def update_task_actual_hours_on_delete(sender, instance, **kwargs):
     """Update task's actual hours when time log is deleted"""
+    if signals_deferred():
+        return
     task = instance.task
     total_hours = task.time_logs.aggregate(
         total=models.Sum('hours')
@@ -43,6 +84,33 @@ def update_task_actual_hours_on_delete(sender, instance, **kwargs):
     task.save(update_fields=['actual_hours'])
 
 
+@receiver(pre_save, sender=TaskTimeLog)
+def load_stored_time_log_state(sender, instance, **kwargs):
+    """Read the stored task and hours of time logs that do not know them, as for tasks"""
+    if instance._state.adding or instance.stored_state() is not None:
+        return
+    instance._stored_state = TaskTimeLog.objects.filter(pk=instance.pk).values(*TaskTimeLog.TRACKED_FIELDS).first()
+
+
+@receiver(post_save, sender=TaskTimeLog)
+def update_rollup_logged_hours_on_save(sender, instance, created, **kwargs):
+    """Move the saved change of hours into the project rollups"""
+    if signals_deferred():
+        return
+    previous = None if created else instance.stored_state()
+    current = instance.tracked_state()
+    instance._stored_state = current
+    rollups.apply_time_log_change(previous, current)
+
+
+@receiver(post_delete, sender=TaskTimeLog)
+def update_rollup_logged_hours_on_delete(sender, instance, **kwargs):
+    """Take a deleted time log's hours off its project rollup"""
+    if signals_deferred():
+        return
+    rollups.apply_time_log_change(instance.stored_state() or instance.tracked_state(), None)
+
+
 @receiver(m2m_changed, sender=Task.dependencies.through)
 def log_dependency_changes(sender, instance, action, pk_set, **kwargs):
     """Log when dependencies are added or removed"""
@@ -51,21 +119,21 @@ def log_dependency_changes(sender, instance, action, pk_set, **kwargs):
             pk__in=pk_set
         ).values_list('title', flat=True)
         
-        TaskActivity.objects.create(
+        record(TaskActivity(
             task=instance,
             action='dependency_added',
             description=f'Dependencies added: {", ".join(dependency_titles)}',
             user=instance.created_by  # Fallback user
-        )
+        ))
     
     elif action == 'post_remove' and pk_set:
         dependency_titles = Task.objects.filter(
             pk__in=pk_set
         ).values_list('title', flat=True)
         
-        TaskActivity.objects.create(
+        record(TaskActivity(
             task=instance,
             action='dependency_removed',
             description=f'Dependencies removed: {", ".join(dependency_titles)}',
             user=instance.created_by  # Fallback user
-        )
+        ))
@@ -1,3 +1,920 @@
-from django.test import TestCase
+import datetime
+import importlib
+import json
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.projects.models import Project, ProjectMembership
+from apps.search.indexing import rebuild_index
+from apps.search.models import SearchDocument, SearchTerm
+from apps.tags.models import TaskTag
+from apps.tags.tagging import ensure_tags
+from .dashboard import get_snapshot, rebuild_snapshot
+from .export import TASK_COLUMNS, iterate_rows
+from .models import (
+    ProjectTaskRollup, Task, TaskActivity, TaskComment, TaskDashboardSnapshot, TaskList,
+    TaskTemplate, TaskTimeLog
+)
+from .rollups import get_rollup, rebuild_rollup
+
+
+SNAPSHOT_FIELDS = [
+    field.name for field in TaskDashboardSnapshot._meta.fields
+    if field.name not in ('user', 'overdue_valid_until')
+]
+
+
+class TaskListAnnotationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(title='Project', owner=self.user)
+        self.url = f'/api/tasks/projects/{self.project.pk}/tasks/'
+
+    def create_task(self, title, **fields):
+        return Task.objects.create(title=title, project=self.project, created_by=self.user, **fields)
+
+    def listed(self, task):
+        """The task as the list renders it, checked against the unannotated model"""
+        response = self.client.get(self.url, {'page_size': 100})
+        row = next(row for row in response.data['results'] if row['id'] == task.pk)
+        fresh = Task.objects.get(pk=task.pk)
+        self.assertEqual(row['progress_percentage'], fresh.progress_percentage)
+        self.assertEqual(row['is_overdue'], fresh.is_overdue)
+        self.assertEqual(row['subtasks_count'], fresh.subtasks.count())
+        self.assertEqual(row['comments_count'], fresh.comments.count())
+        return row
+
+    def test_subtask_counts_and_progress_follow_changes(self):
+        parent = self.create_task('Parent')
+        other = self.create_task('Other')
+        first = self.create_task('First', parent_task=parent)
+        second = self.create_task('Second', parent_task=parent)
+        self.assertEqual((self.listed(parent)['subtasks_count'], self.listed(parent)['progress_percentage']), (2, 0))
+
+        first.status = 'done'
+        first.save()
+        self.assertEqual(self.listed(parent)['progress_percentage'], 50)
+
+        second.parent_task = other
+        second.save()
+        self.assertEqual((self.listed(parent)['subtasks_count'], self.listed(parent)['progress_percentage']), (1, 100))
+        self.assertEqual((self.listed(other)['subtasks_count'], self.listed(other)['progress_percentage']), (1, 0))
+
+        first.delete()
+        self.assertEqual((self.listed(parent)['subtasks_count'], self.listed(parent)['progress_percentage']), (0, 0))
+        parent.status = 'done'
+        parent.save()
+        self.assertEqual(self.listed(parent)['progress_percentage'], 100)
+
+    def test_overdue_and_comment_counts(self):
+        yesterday = timezone.now() - datetime.timedelta(days=1)
+        late = self.create_task('Late', due_date=yesterday)
+        upcoming = self.create_task('Upcoming', due_date=timezone.now() + datetime.timedelta(days=1))
+        TaskComment.objects.create(task=late, author=self.user, content='Soon')
+        self.assertEqual((self.listed(late)['is_overdue'], self.listed(late)['comments_count']), (True, 1))
+        self.assertFalse(self.listed(upcoming)['is_overdue'])
+
+        late.status = 'done'
+        late.save()
+        self.assertFalse(self.listed(late)['is_overdue'])
+
+    def test_list_and_dashboard_query_counts_do_not_grow_with_the_task_count(self):
+        # Built up front, so the first dashboard call does not pay for it
+        get_snapshot(self.user)
+
+        def statements(count):
+            for index in range(count):
+                task = self.create_task(f'Task {index}', assignee=self.user, due_date=timezone.now())
+                self.create_task(f'Subtask {index}', parent_task=task, status='done')
+                TaskComment.objects.create(task=task, author=self.user, content='Note')
+            counts = []
+            for url in (self.url, '/api/tasks/tasks/dashboard/'):
+                with CaptureQueriesContext(connection) as context:
+                    self.assertEqual(self.client.get(url, {'page_size': 100}).status_code, 200)
+                counts.append(len(context.captured_queries))
+            return counts
+
+        self.assertEqual(statements(1), statements(10))
+
+
+class TaskDetailQueryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(title='Project', owner=self.user)
+        self.task = self.create_task('Task')
+
+    def create_task(self, title, **fields):
+        return Task.objects.create(title=title, project=self.project, created_by=self.user, **fields)
+
+    def detail(self):
+        response = self.client.get(f'/api/tasks/projects/{self.project.pk}/tasks/{self.task.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_renders_nested_tasks_dependencies_and_time(self):
+        parent = self.create_task('Parent')
+        self.task.parent_task = parent
+        self.task.save()
+        self.create_task('Subtask', parent_task=self.task, status='done')
+        finished = self.create_task('Finished', status='done')
+        pending = self.create_task('Pending')
+        self.task.dependencies.add(finished, pending)
+        TaskTimeLog.objects.create(task=self.task, user=self.user, hours=Decimal('1.5'), date=datetime.date.today())
+
+        data = self.detail()
+        self.assertEqual(data['parent_task']['title'], 'Parent')
+        self.assertEqual(data['parent_task']['subtasks_count'], 1)
+        self.assertEqual([task['title'] for task in data['subtasks']], ['Subtask'])
+        self.assertEqual(sorted(task['title'] for task in data['dependencies']), ['Finished', 'Pending'])
+        self.assertEqual([task['title'] for task in data['blocked_dependencies']], ['Pending'])
+        self.assertFalse(data['can_start'])
+        self.assertEqual(Decimal(data['total_time_logged']), Decimal('1.5'))
+        self.assertEqual(data['progress_percentage'], 100)
+
+        pending.status = 'done'
+        pending.save()
+        data = self.detail()
+        self.assertEqual((data['blocked_dependencies'], data['can_start']), ([], True))
+
+    def test_query_count_does_not_grow_with_related_tasks(self):
+        def statements(count):
+            for index in range(count):
+                self.create_task(f'Subtask {index}', parent_task=self.task)
+                self.task.dependencies.add(self.create_task(f'Dependency {index}'))
+                self.create_task(f'Dependent {index}').dependencies.add(self.task)
+                TaskTimeLog.objects.create(task=self.task, user=self.user, hours=Decimal('1'), date=datetime.date.today())
+            with CaptureQueriesContext(connection) as context:
+                self.detail()
+            return len(context.captured_queries)
+
+        self.assertEqual(statements(1), statements(10))
+
+
+class DashboardSnapshotTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.other = User.objects.create_user('other', 'other@example.com', 'password')
+        self.project = Project.objects.create(title='Project', owner=self.user)
+        # Build both snapshots first, so the signals have rows to keep current
+        get_snapshot(self.user)
+        get_snapshot(self.other)
+
+    def assertMatchesRecount(self, user):
+        kept = get_snapshot(user)
+        kept = {field: getattr(kept, field) for field in SNAPSHOT_FIELDS}
+        fresh = rebuild_snapshot(user.pk)
+        self.assertEqual(kept, {field: getattr(fresh, field) for field in SNAPSHOT_FIELDS})
+        return kept
+
+    def test_follows_creates_and_status_changes(self):
+        Task.objects.create(title='Standalone', created_by=self.user)
+        task = Task.objects.create(title='Project', project=self.project, created_by=self.user,
+                                   due_date=timezone.now() - datetime.timedelta(days=1))
+        counts = self.assertMatchesRecount(self.user)
+        self.assertEqual((counts['total'], counts['todo'], counts['overdue']), (2, 2, 1))
+
+        task.status = 'done'
+        task.save()
+        counts = self.assertMatchesRecount(self.user)
+        self.assertEqual((counts['todo'], counts['done'], counts['overdue']), (1, 1, 0))
+
+    def test_follows_assignee_changes_and_deletes(self):
+        task = Task.objects.create(title='Shared', project=self.project, created_by=self.user, assignee=self.other)
+        self.assertEqual(self.assertMatchesRecount(self.other)['total'], 1)
+
+        task.assignee = None
+        task.save()
+        self.assertEqual(self.assertMatchesRecount(self.other)['total'], 0)
+        self.assertEqual(self.assertMatchesRecount(self.user)['project_tasks'], 1)
+
+        task.delete()
+        self.assertEqual(self.assertMatchesRecount(self.user)['total'], 0)
+
+    def test_overdue_is_recounted_once_a_due_date_passes(self):
+        now = timezone.now()
+        Task.objects.create(title='Due soon', created_by=self.user, due_date=now + datetime.timedelta(minutes=5))
+        self.assertEqual(self.assertMatchesRecount(self.user)['overdue'], 0)
+
+        with mock.patch('django.utils.timezone.now', return_value=now + datetime.timedelta(minutes=10)):
+            self.assertEqual(get_snapshot(self.user).overdue, 1)
+            self.assertEqual(self.assertMatchesRecount(self.user)['overdue'], 1)
+
+
+ROLLUP_FIELDS = [
+    field.name for field in ProjectTaskRollup._meta.fields
+    if field.name not in ('project', 'overdue_valid_until')
+]
+
+
+class ProjectTaskRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.project = Project.objects.create(title='Project', owner=self.user)
+        self.other = Project.objects.create(title='Other', owner=self.user)
+        get_rollup(self.project)
+        get_rollup(self.other)
+
+    def assertMatchesRecount(self, project):
+        kept = get_rollup(project)
+        kept = {field: getattr(kept, field) for field in ROLLUP_FIELDS}
+        fresh = rebuild_rollup(project.pk)
+        self.assertEqual(kept, {field: getattr(fresh, field) for field in ROLLUP_FIELDS})
+        return kept
+
+    def create_task(self, **fields):
+        return Task.objects.create(
+            title='Task', project=self.project, created_by=self.user, estimated_hours=Decimal('4'), **fields
+        )
+
+    def test_follows_creates_updates_and_deletes(self):
+        task = self.create_task(priority='high')
+        self.create_task(status='done')
+        counts = self.assertMatchesRecount(self.project)
+        self.assertEqual((counts['total'], counts['priority_high'], counts['done_estimated_hours']), (2, 1, 4))
+
+        task.status = 'done'
+        task.priority = 'low'
+        task.estimated_hours = Decimal('6')
+        task.save()
+        counts = self.assertMatchesRecount(self.project)
+        self.assertEqual((counts['done'], counts['priority_low'], counts['estimated_hours']), (2, 1, 10))
+
+        task.delete()
+        self.assertEqual(self.assertMatchesRecount(self.project)['total'], 1)
+
+    def test_time_logs_follow_changes_and_moves(self):
+        task = self.create_task()
+        log = TaskTimeLog.objects.create(task=task, user=self.user, hours=Decimal('2'), date=datetime.date.today())
+        TaskTimeLog.objects.create(task=task, user=self.user, hours=Decimal('1.5'), date=datetime.date.today())
+        self.assertEqual(self.assertMatchesRecount(self.project)['logged_hours'], Decimal('3.5'))
+
+        log.delete()
+        self.assertEqual(self.assertMatchesRecount(self.project)['logged_hours'], Decimal('1.5'))
+
+        task.project = self.other
+        task.save()
+        self.assertEqual(self.assertMatchesRecount(self.project)['logged_hours'], 0)
+        counts = self.assertMatchesRecount(self.other)
+        self.assertEqual((counts['total'], counts['logged_hours']), (1, Decimal('1.5')))
+
+    def test_time_logs_moved_to_another_project_leave_the_old_one(self):
+        task = self.create_task()
+        elsewhere = Task.objects.create(title='Elsewhere', project=self.other, created_by=self.user)
+        log = TaskTimeLog.objects.create(task=task, user=self.user, hours=Decimal('2'), date=datetime.date.today())
+
+        log.hours = Decimal('5')
+        log.save()
+        self.assertEqual(get_rollup(self.project).logged_hours, Decimal('5'))
+
+        # Loaded fresh, so the stored state comes from the database
+        log = TaskTimeLog.objects.get(pk=log.pk)
+        log.task = elsewhere
+        log.hours = Decimal('3')
+        log.save()
+        self.assertEqual(self.assertMatchesRecount(self.project)['logged_hours'], 0)
+        self.assertEqual(self.assertMatchesRecount(self.other)['logged_hours'], Decimal('3'))
+
+    def test_time_log_writes_do_not_read_the_other_logs(self):
+        task = self.create_task()
+
+        def statements(count):
+            TaskTimeLog.objects.bulk_create([
+                TaskTimeLog(task=task, user=self.user, hours=Decimal('1'), date=datetime.date.today())
+                for _ in range(count)
+            ])
+            log = TaskTimeLog(task=task, user=self.user, hours=Decimal('2'), date=datetime.date.today())
+            with CaptureQueriesContext(connection) as context:
+                log.save()
+                log.delete()
+            return len(context.captured_queries)
+
+        self.assertEqual(statements(1), statements(30))
+
+    def test_backfill_migration_matches_a_rebuild(self):
+        self.create_task(status='in_progress', priority='urgent')
+        task = self.create_task(status='done')
+        TaskTimeLog.objects.create(task=task, user=self.user, hours=Decimal('3'), date=datetime.date.today())
+        expected = {field: getattr(rebuild_rollup(self.project.pk), field) for field in ROLLUP_FIELDS}
+
+        ProjectTaskRollup.objects.all().delete()
+        migration = importlib.import_module('apps.tasks.migrations.0004_project_task_rollup')
+        migration.backfill_rollups(django_apps, None)
+        backfilled = get_rollup(self.project)
+        self.assertEqual({field: getattr(backfilled, field) for field in ROLLUP_FIELDS}, expected)
+
+
+class ProjectProgressTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def project(self, mode, hours=(1, 3, 4)):
+        project = Project.objects.create(title=mode, owner=self.user, progress_mode=mode, progress=50)
+        for index, estimate in enumerate(hours):
+            Task.objects.create(
+                title=f'Task {index}', project=project, created_by=self.user,
+                estimated_hours=estimate, status='done' if index < 2 else 'todo'
+            )
+        return project
+
+    def progress(self, project):
+        return Project.objects.values_list('progress', flat=True).get(pk=project.pk)
+
+    def test_tasks_mode_counts_done_tasks(self):
+        project = self.project('tasks')
+        self.assertEqual(self.progress(project), 66)
+
+        Task.objects.filter(project=project, status='todo').get().delete()
+        self.assertEqual(self.progress(project), 100)
+
+    def test_weighted_mode_counts_done_hours(self):
+        project = self.project('weighted')
+        self.assertEqual(self.progress(project), 50)
+
+        task = Task.objects.get(project=project, title='Task 2')
+        task.estimated_hours = 12
+        task.save()
+        self.assertEqual(self.progress(project), 25)
+
+    def test_weighted_mode_without_estimates_counts_tasks(self):
+        project = self.project('weighted', hours=(0, 0, 0, 0))
+        self.assertEqual(self.progress(project), 50)
+
+    def test_manual_mode_is_left_alone(self):
+        project = self.project('manual')
+        self.assertEqual(self.progress(project), 50)
+        Task.objects.filter(project=project).update(status='done')
+        rebuild_rollup(project.pk)
+        self.assertEqual(self.progress(project), 50)
+
+    def test_serializer_ignores_progress_outside_manual_mode(self):
+        project = self.project('tasks')
+        response = self.client.patch(f'/api/projects/{project.pk}/', {'progress': 90}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.progress(project), 66)
+
+        response = self.client.patch(f'/api/projects/{project.pk}/', {'progress': 90, 'progress_mode': 'manual'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.progress(project), 90)
+
+
+class TaskPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(title='Project', owner=self.user)
+        Task.objects.bulk_create([
+            Task(title=f'Task {index}', project=self.project, created_by=self.user, position=index // 4)
+            for index in range(10)
+        ])
+        # Ties on position and on created_at, so only the id tells rows apart
+        Task.objects.update(created_at=timezone.now())
+        self.url = f'/api/tasks/projects/{self.project.pk}/tasks/'
+        self.expected = list(Task.objects.order_by('position', 'id').values_list('pk', flat=True))
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [task['id'] for task in response.data['results']]
+
+    def test_walks_ties_without_skipping_or_repeating(self):
+        pages = [self.client.get(self.url, {'page_size': 3})]
+        while pages[-1].data['next']:
+            pages.append(self.client.get(pages[-1].data['next']))
+        self.assertEqual([task_id for page in pages for task_id in self.ids(page)], self.expected)
+        self.assertEqual(len(pages), 4)
+
+        # And back again from the last page
+        back = [pages[-1]]
+        while back[-1].data['previous']:
+            back.append(self.client.get(back[-1].data['previous']))
+        self.assertEqual([self.ids(page) for page in back], [self.ids(page) for page in reversed(pages)])
+
+    @override_settings(TASK_MAX_PAGE_SIZE=4)
+    def test_clamps_the_page_size(self):
+        self.assertEqual(self.ids(self.client.get(self.url, {'page_size': 100})), self.expected[:4])
+
+    def test_rejects_a_tampered_cursor(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'garbage'}).status_code, 404)
+
+
+class BulkTaskActionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.other = User.objects.create_user('other', 'other@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(title='Project', owner=self.user)
+
+    def create_tasks(self, count, **fields):
+        fields = {'project': self.project, 'created_by': self.user, **fields}
+        return [Task.objects.create(title=f'Task {index}', **fields) for index in range(count)]
+
+    def bulk(self, tasks, action, value=''):
+        response = self.client.post('/api/tasks/tasks/bulk_update/', {
+            'task_ids': [getattr(task, 'pk', task) for task in tasks], 'action': action, 'value': value,
+        }, format='json')
+        return response
+
+    def statements(self, tasks, action, value=''):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.bulk(tasks, action, value).status_code, 200)
+        return len(context.captured_queries)
+
+    def test_statement_count_does_not_grow_with_the_task_count(self):
+        few = self.create_tasks(2)
+        many = self.create_tasks(20)
+        task_list = TaskList.objects.create(project=self.project, name='Sprint', created_by=self.user)
+        # Created up front, so the first add_tags call does not pay for them
+        ensure_tags(['api', 'backend'])
+        for action, value in [('update_status', 'in_progress'), ('update_priority', 'high'),
+                              ('update_assignee', str(self.other.pk)), ('add_tags', 'api, backend'),
+                              ('remove_tags', 'api'), ('update_task_list', str(task_list.pk)), ('delete', '')]:
+            self.assertEqual(self.statements(few, action, value), self.statements(many, action, value), action)
+
+    def test_status_update_refreshes_read_models_and_logs_activity(self):
+        tasks = self.create_tasks(3, estimated_hours=2)
+        get_snapshot(self.user)
+
+        response = self.bulk(tasks, 'update_status', 'done')
+        self.assertEqual(response.data['updated_count'], 3)
+        self.assertEqual(response.data['failed'], [])
+
+        self.assertFalse(Task.objects.filter(completed_at__isnull=True).exists())
+        self.assertEqual(get_snapshot(self.user).done, 3)
+        self.assertEqual(get_rollup(self.project).done, 3)
+        self.assertEqual(Project.objects.get(pk=self.project.pk).progress, 0)
+        self.assertEqual(TaskActivity.objects.filter(action='status_changed', new_value='done').count(), 3)
+
+        # Tasks already in the target state are counted but not logged again
+        self.bulk(tasks, 'update_status', 'done')
+        self.assertEqual(TaskActivity.objects.filter(action='status_changed').count(), 3)
+
+    def test_reports_hidden_and_read_only_tasks(self):
+        mine = self.create_tasks(1)[0]
+        shared = Project.objects.create(title='Shared', owner=self.other)
+        ProjectMembership.objects.create(project=shared, user=self.user, role='viewer')
+        read_only = Task.objects.create(title='Read only', project=shared, created_by=self.other)
+        hidden = Task.objects.create(title='Hidden', created_by=self.other)
+
+        response = self.bulk([mine, read_only, hidden, 999999], 'update_priority', 'urgent')
+        self.assertEqual(response.data['updated_count'], 1)
+        self.assertEqual(response.data['failed'], [
+            {'id': read_only.pk, 'error': 'permission_denied'},
+            {'id': hidden.pk, 'error': 'not_found'},
+            {'id': 999999, 'error': 'not_found'},
+        ])
+        self.assertEqual(set(Task.objects.filter(priority='urgent').values_list('pk', flat=True)), {mine.pk})
+
+    def test_assignee_update_moves_search_scope(self):
+        task = self.create_tasks(1, project=None)[0]
+        TaskComment.objects.create(task=task, author=self.user, content='Notes')
+
+        self.bulk([task], 'update_assignee', str(self.other.pk))
+        self.assertEqual(
+            set(SearchDocument.objects.filter(assignee=self.other).values_list('entity_type', flat=True)),
+            {'task', 'task_comment'},
+        )
+        self.assertEqual(get_snapshot(self.other).total, 1)
+        self.assertEqual(self.bulk([task], 'update_assignee', '999999').status_code, 400)
+
+    def test_moves_tasks_between_lists_of_their_project(self):
+        tasks = self.create_tasks(2)
+        personal = self.create_tasks(1, project=None)[0]
+        task_list = TaskList.objects.create(project=self.project, name='Sprint', created_by=self.user)
+
+        response = self.bulk(tasks + [personal], 'update_task_list', str(task_list.pk))
+        self.assertEqual(response.data['updated_count'], 2)
+        self.assertEqual(response.data['failed'], [{'id': personal.pk, 'error': 'task_list_in_other_project'}])
+        self.assertEqual(task_list.tasks.count(), 2)
+        self.assertEqual(TaskActivity.objects.filter(action='moved', new_value='Sprint').count(), 2)
+
+    def test_removes_tags(self):
+        first, second = self.create_tasks(2, tags='api,Docs')
+
+        self.bulk([first, second], 'remove_tags', 'docs')
+        self.assertEqual(list(Task.objects.values_list('tags', flat=True)), ['api', 'api'])
+        self.assertFalse(TaskTag.objects.filter(tag__key='docs').exists())
+        self.assertEqual(SearchDocument.objects.get(entity_type='task', object_id=first.pk).terms.filter(
+            term='docs').count(), 0)
+
+        # The bulk rewrite leaves what a full rebuild would
+        task_terms = SearchTerm.objects.filter(document__entity_type='task')
+        postings = set(task_terms.values_list('document__object_id', 'term', 'weight'))
+        SearchDocument.objects.filter(entity_type='task').delete()
+        rebuild_index(['task'])
+        self.assertEqual(set(task_terms.values_list('document__object_id', 'term', 'weight')), postings)
+
+    def test_delete_takes_subtasks_and_their_documents(self):
+        parent = self.create_tasks(1)[0]
+        Task.objects.create(title='Subtask', project=self.project, created_by=self.user, parent_task=parent)
+        get_snapshot(self.user)
+
+        self.bulk([parent], 'delete')
+        self.assertFalse(Task.objects.exists())
+        self.assertFalse(SearchDocument.objects.filter(entity_type='task').exists())
+        self.assertEqual(get_rollup(self.project).total, 0)
+        self.assertEqual(get_snapshot(self.user).total, 0)
+
+
+class TaskOrderingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(title='Project', owner=self.user)
+        self.todo = self.create_list('Todo')
+        self.doing = self.create_list('Doing')
+
+    def create_list(self, name):
+        response = self.client.post(f'/api/tasks/projects/{self.project.pk}/task-lists/', {'name': name})
+        return TaskList.objects.get(pk=response.data['id'])
+
+    def create_tasks(self, task_list, count):
+        for index in range(count):
+            self.client.post(f'/api/tasks/projects/{self.project.pk}/tasks/', {
+                'title': f'{task_list.name} {index}', 'task_list_id': task_list.pk,
+            }, format='json')
+        return list(task_list.tasks.order_by('position'))
+
+    def titles(self, task_list):
+        return list(task_list.tasks.order_by('position', 'created_at', 'id').values_list('title', flat=True))
+
+    def move(self, task, after, task_list=None):
+        data = {'after_id': getattr(after, 'pk', after)}
+        if task_list is not None:
+            data['task_list_id'] = task_list.pk
+        return self.client.post(f'/api/tasks/tasks/{task.pk}/move/', data, format='json')
+
+    def test_new_rows_are_appended_with_gaps(self):
+        tasks = self.create_tasks(self.todo, 3)
+        self.assertEqual([task.position for task in tasks], [1024, 2048, 3072])
+        self.assertEqual([self.todo.position, self.doing.position], [1024, 2048])
+
+    def test_moving_a_task_writes_only_its_row(self):
+        first, second, third = self.create_tasks(self.todo, 3)
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.move(third, first).status_code, 200)
+        writes = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(self.titles(self.todo), ['Todo 0', 'Todo 2', 'Todo 1'])
+
+        self.move(second, None)
+        self.assertEqual(self.titles(self.todo), ['Todo 1', 'Todo 0', 'Todo 2'])
+
+    def test_moves_between_lists(self):
+        first, _ = self.create_tasks(self.todo, 2)
+        self.create_tasks(self.doing, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.move(first, None, self.doing)
+        self.assertEqual(response.data['task_list_id'], self.doing.pk)
+        self.assertEqual(self.titles(self.doing), ['Todo 0', 'Doing 0'])
+        self.assertEqual(self.titles(self.todo), ['Todo 1'])
+        self.assertTrue(TaskActivity.objects.filter(task=first, action='moved', new_value='Doing').exists())
+
+        other = Project.objects.create(title='Other', owner=self.user)
+        foreign = TaskList.objects.create(project=other, name='Elsewhere', created_by=self.user)
+        self.assertEqual(self.move(first, None, foreign).status_code, 400)
+        self.assertEqual(self.move(first, 999999).status_code, 400)
+
+    def test_renormalizes_when_the_gap_runs_out(self):
+        first, second, third = self.create_tasks(self.todo, 3)
+        # Keep dropping the last task in front of the one after the first
+        moving = [second, third]
+        for step in range(12):
+            task = moving[step % 2]
+            self.move(task, first)
+            self.assertEqual(self.titles(self.todo)[1], task.title)
+        positions = list(self.todo.tasks.order_by('position').values_list('position', flat=True))
+        self.assertEqual(len(set(positions)), 3)
+
+    def test_moves_and_reorders_lists(self):
+        done = self.create_list('Done')
+        self.client.post(f'/api/tasks/projects/{self.project.pk}/task-lists/{done.pk}/move/', {'after_id': None}, format='json')
+        self.assertEqual(
+            list(TaskList.objects.order_by('position').values_list('name', flat=True)), ['Done', 'Todo', 'Doing']
+        )
+
+        first, second = self.create_tasks(self.todo, 2)
+        self.client.post(f'/api/tasks/projects/{self.project.pk}/task-lists/{self.todo.pk}/reorder-tasks/', {
+            'task_ids': [second.pk, first.pk]
+        }, format='json')
+        self.assertEqual(self.titles(self.todo), ['Todo 1', 'Todo 0'])
+
+    def test_position_migration_spreads_existing_rows(self):
+        self.create_tasks(self.todo, 3)
+        Task.objects.update(position=0)
+        TaskList.objects.update(position=0)
+
+        migration = importlib.import_module('apps.tasks.migrations.0005_spread_positions')
+        migration.spread_positions(django_apps, None)
+        self.assertEqual(list(self.todo.tasks.order_by('position').values_list('position', flat=True)), [1024, 2048, 3072])
+        self.assertEqual(self.titles(self.todo), ['Todo 0', 'Todo 1', 'Todo 2'])
+        self.assertEqual(list(TaskList.objects.order_by('position').values_list('position', flat=True)), [1024, 2048])
+
+
+class BatchTaskCreateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.other = User.objects.create_user('other', 'other@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(title='Project', owner=self.user)
+        self.task_list = TaskList.objects.create(project=self.project, name='Backlog', created_by=self.user)
+
+    def batch(self, rows):
+        return self.client.post(f'/api/tasks/projects/{self.project.pk}/tasks/batch/', {'tasks': rows}, format='json')
+
+    def plan(self, count):
+        rows = [{'ref': 'epic', 'title': 'Epic', 'task_list_id': self.task_list.pk}]
+        rows += [
+            {'ref': f'step-{index}', 'title': f'Step {index}', 'parent_ref': 'epic', 'tags': 'import,plan',
+             'assignee_id': self.other.pk, 'task_list_id': self.task_list.pk,
+             'dependency_refs': [f'step-{index - 1}'] if index else []}
+            for index in range(count)
+        ]
+        return rows
+
+    def test_creates_a_plan_with_in_batch_references(self):
+        existing = Task.objects.create(title='Design', project=self.project, created_by=self.user)
+        rows = self.plan(3)
+        rows[2]['dependency_ids'] = [existing.pk]
+
+        response = self.batch(rows)
+        self.assertEqual(response.status_code, 201)
+        ids = {row['ref']: row['id'] for row in response.data['tasks']}
+
+        step = Task.objects.get(pk=ids['step-1'])
+        self.assertEqual(step.parent_task_id, ids['epic'])
+        self.assertEqual(set(step.dependencies.values_list('pk', flat=True)), {ids['step-0'], existing.pk})
+        self.assertEqual(
+            list(self.task_list.tasks.order_by('position').values_list('title', flat=True)),
+            ['Epic', 'Step 0', 'Step 1', 'Step 2'],
+        )
+        self.assertEqual(TaskActivity.objects.filter(action='created').count(), 4)
+        self.assertEqual(TaskActivity.objects.get(task=step, action='dependency_added').description,
+                         'Dependencies added: Step 0, Design')
+
+        self.assertEqual(get_rollup(self.project).total, 5)
+        self.assertEqual(get_snapshot(self.other).total, 3)
+        self.assertEqual(TaskTag.objects.filter(tag__key='import').count(), 3)
+        self.assertTrue(SearchDocument.objects.filter(entity_type='task', object_id=ids['step-2']).exists())
+
+    def test_statement_count_does_not_grow_with_the_batch(self):
+        def statements(rows):
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.batch(rows).status_code, 201)
+            return len(context.captured_queries)
+
+        # The first batch also creates the tags and the project's rollup
+        self.batch(self.plan(1))
+        self.assertEqual(statements(self.plan(2)), statements(self.plan(40)))
+
+    def test_reports_errors_per_row_and_creates_nothing(self):
+        other_project = Project.objects.create(title='Other', owner=self.other)
+        foreign_list = TaskList.objects.create(project=other_project, name='Theirs', created_by=self.other)
+
+        response = self.batch([
+            {'ref': 'a', 'title': 'A', 'parent_ref': 'missing'},
+            {'ref': 'a', 'title': 'B', 'assignee_id': 999999},
+            {'title': 'C', 'task_list_id': foreign_list.pk, 'dependency_ids': [999999]},
+            {'title': 'D', 'project_id': other_project.pk},
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['tasks']
+        self.assertEqual(set(errors[0]), {'parent_ref'})
+        self.assertEqual(set(errors[1]), {'ref', 'assignee_id'})
+        self.assertEqual(set(errors[2]), {'task_list_id', 'dependency_ids'})
+        self.assertEqual(set(errors[3]), {'project_id'})
+        self.assertFalse(Task.objects.exists())
+
+        cycle = self.batch([{'ref': 'a', 'title': 'A', 'parent_ref': 'b'}, {'ref': 'b', 'title': 'B', 'parent_ref': 'a'}])
+        self.assertEqual(cycle.status_code, 400)
+
+    def test_projects_the_user_cannot_edit_look_missing(self):
+        viewed = Project.objects.create(title='Viewed', owner=self.other)
+        ProjectMembership.objects.create(project=viewed, user=self.user, role='viewer')
+        rows = {'tasks': [{'title': 'A'}]}
+
+        for project_id in (viewed.pk, 999999):
+            response = self.client.post(f'/api/tasks/projects/{project_id}/tasks/batch/', rows, format='json')
+            self.assertEqual(response.status_code, 404)
+        self.assertFalse(Task.objects.exists())
+
+
+    def test_rows_stay_in_the_project_they_are_sent_to(self):
+        mine = Project.objects.create(title='Mine too', owner=self.user)
+        response = self.batch([{'title': 'A', 'project_id': self.project.pk}, {'title': 'B', 'project_id': mine.pk}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['tasks'][0], {})
+        self.assertEqual(set(response.data['tasks'][1]), {'project_id'})
+        self.assertFalse(Task.objects.exists())
+
+    def test_parents_and_dependencies_must_be_editable(self):
+        viewed = Project.objects.create(title='Viewed', owner=self.other)
+        ProjectMembership.objects.create(project=viewed, user=self.user, role='viewer')
+        read_only = Task.objects.create(title='Read only', project=viewed, created_by=self.other)
+
+        response = self.batch([{'title': 'A', 'parent_task_id': read_only.pk, 'dependency_ids': [read_only.pk]}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['tasks'][0]), {'parent_task_id', 'dependency_ids'})
+        self.assertEqual(Task.objects.count(), 1)
+
+    @mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False)
+    def test_inserts_without_returning_ids(self):
+        response = self.batch(self.plan(2))
+        self.assertEqual(response.status_code, 201)
+        ids = {row['ref']: row['id'] for row in response.data['tasks']}
+        self.assertEqual(Task.objects.get(pk=ids['step-1']).parent_task_id, ids['epic'])
+
+    @mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False)
+    def test_a_concurrent_insert_is_a_conflict(self):
+        original = Task.objects.bulk_create
+
+        def interleaved(*args, **kwargs):
+            Task.objects.create(title='Concurrent', created_by=self.user)
+            return original(*args, **kwargs)
+
+        with mock.patch.object(Task.objects, 'bulk_create', side_effect=interleaved):
+            response = self.batch([{'title': 'A'}])
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Task.objects.exists())
+
+
+class TaskTemplateTreeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(title='Project', owner=self.user)
+        self.task_list = TaskList.objects.create(project=self.project, name='Backlog', created_by=self.user)
+
+    def items(self, steps):
+        items = [{'ref': 'design', 'title': 'Design'}, {'ref': 'build', 'title': 'Build', 'depends_on_refs': ['design']}]
+        items += [
+            {'ref': f'step-{index}', 'title': f'Step {index}', 'parent_ref': 'build', 'tags': 'plan',
+             'depends_on_refs': [f'step-{index - 1}'] if index else []}
+            for index in range(steps)
+        ]
+        return items
+
+    def template(self, steps):
+        response = self.client.post('/api/tasks/templates/', {
+            'name': 'Release', 'title_template': 'Release', 'items': self.items(steps),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return TaskTemplate.objects.get(pk=response.data['id'])
+
+    def assertTree(self, template, steps):
+        items = {item.title: item for item in template.items.prefetch_related('depends_on')}
+        self.assertEqual(list(template.items.values_list('title', flat=True)),
+                         ['Design', 'Build'] + [f'Step {index}' for index in range(steps)])
+        self.assertEqual(items['Build'].parent, None)
+        self.assertEqual(list(items['Build'].depends_on.all()), [items['Design']])
+        for index in range(1, steps):
+            step = items[f'Step {index}']
+            self.assertEqual((step.parent, list(step.depends_on.all())), (items['Build'], [items[f'Step {index - 1}']]))
+
+    def instantiate(self, template):
+        return self.client.post(f'/api/tasks/templates/{template.pk}/instantiate/', {
+            'project_id': self.project.pk, 'task_list_id': self.task_list.pk,
+        }, format='json')
+
+    def test_instantiates_the_tree_with_dependencies(self):
+        template = self.template(2)
+        items = {item.title: item for item in template.items.all()}
+        self.assertEqual(items['Step 1'].parent, items['Build'])
+        self.assertEqual(list(items['Step 1'].depends_on.all()), [items['Step 0']])
+
+        response = self.instantiate(template)
+        self.assertEqual(response.status_code, 201)
+        tasks = {int(item_id): Task.objects.get(pk=task_id) for item_id, task_id in response.data['items'].items()}
+        self.assertEqual(set(tasks), set(items[title].pk for title in items))
+
+        root = Task.objects.get(pk=response.data['task_id'])
+        build = tasks[items['Build'].pk]
+        self.assertEqual(build.parent_task, root)
+        self.assertEqual(tasks[items['Step 0'].pk].parent_task, build)
+        self.assertEqual(list(build.dependencies.all()), [tasks[items['Design'].pk]])
+        self.assertEqual(
+            list(self.task_list.tasks.order_by('position').values_list('title', flat=True)),
+            ['Release', 'Design', 'Build', 'Step 0', 'Step 1'],
+        )
+        self.assertEqual(get_rollup(self.project).total, 5)
+
+    def test_statement_count_does_not_grow_with_the_tree(self):
+        def statements(template):
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.instantiate(template).status_code, 201)
+            return len(context.captured_queries)
+
+        # The first instantiation also creates the tags and the project's rollup
+        self.instantiate(self.template(1))
+        self.assertEqual(statements(self.template(2)), statements(self.template(40)))
+
+    def test_saving_a_template_costs_the_same_for_any_number_of_items(self):
+        def statements(steps):
+            with CaptureQueriesContext(connection) as context:
+                template = self.template(steps)
+            self.assertTree(template, steps)
+            return len(context.captured_queries)
+
+        self.assertEqual(statements(2), statements(40))
+
+        # Replacing the items on update rewrites the whole tree the same way
+        template = self.template(1)
+        response = self.client.patch(f'/api/tasks/templates/{template.pk}/', {'items': self.items(3)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['title'] for item in response.data['items']][-1], 'Step 2')
+        self.assertTree(template, 3)
+
+    @mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False)
+    def test_links_items_without_returned_ids(self):
+        self.assertTree(self.template(3), 3)
+
+    def test_rejects_unknown_refs_and_parent_cycles(self):
+        for items in (
+            [{'ref': 'a', 'title': 'A', 'parent_ref': 'missing'}],
+            [{'ref': 'a', 'title': 'A', 'parent_ref': 'b'}, {'ref': 'b', 'title': 'B', 'parent_ref': 'a'}],
+        ):
+            response = self.client.post('/api/tasks/templates/', {
+                'name': 'Broken', 'title_template': 'Broken', 'items': items,
+            }, format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(TaskTemplate.objects.exists())
+
+    def test_targets_the_user_cannot_edit_look_missing(self):
+        template = self.template(1)
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        viewed = Project.objects.create(title='Viewed', owner=other)
+        ProjectMembership.objects.create(project=viewed, user=self.user, role='viewer')
+        foreign_list = TaskList.objects.create(project=viewed, name='Theirs', created_by=other)
+
+        for data in ({'project_id': viewed.pk}, {'project_id': 999999},
+                     {'task_list_id': foreign_list.pk}, {'task_list_id': 999999}):
+            response = self.client.post(f'/api/tasks/templates/{template.pk}/instantiate/', data, format='json')
+            self.assertEqual(response.status_code, 404)
+        self.assertFalse(Task.objects.exists())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(title='Project', owner=self.user)
+
+    def export(self, path, **params):
+        response = self.client.get(f'/api/tasks/projects/{self.project.pk}/tasks/{path}', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_streams_filtered_tasks_as_csv_and_ndjson(self):
+        Task.objects.create(title='Write, review', project=self.project, created_by=self.user, status='done')
+        Task.objects.create(title='Ship', project=self.project, created_by=self.user)
+
+        lines = self.export('export/', status='done').splitlines()
+        self.assertTrue(lines[0].startswith('id,title,status,priority,project_id,project,'))
+        self.assertEqual(len(lines), 2)
+        self.assertIn('"Write, review",done', lines[1])
+
+        rows = [json.loads(line) for line in self.export('export/', output='ndjson').splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['Write, review', 'Ship'])
+        self.assertEqual(rows[0]['project'], 'Project')
+        self.assertEqual(self.client.get(f'/api/tasks/projects/{self.project.pk}/tasks/export/', {'output': 'xml'}).status_code, 400)
+
+    def test_streams_time_logs_within_dates(self):
+        task = Task.objects.create(title='Billable', project=self.project, created_by=self.user)
+        for day in (1, 8, 15):
+            TaskTimeLog.objects.create(task=task, user=self.user, hours=2, date=datetime.date(2026, 10, day))
+
+        rows = [json.loads(line) for line in self.export(
+            'time-logs/export/', output='ndjson', date_from='2026-10-05', date_to='2026-10-15'
+        ).splitlines()]
+        self.assertEqual([(row['date'], row['hours'], row['task']) for row in rows],
+                         [('2026-10-08', '2.00', 'Billable'), ('2026-10-15', '2.00', 'Billable')])
+
+    def test_reads_in_bounded_chunks(self):
+        for index in range(5):
+            Task.objects.create(title=f'Task {index}', project=self.project, created_by=self.user)
+
+        with CaptureQueriesContext(connection) as context:
+            rows = list(iterate_rows(Task.objects.all(), TASK_COLUMNS, chunk_size=2))
+        self.assertEqual([row['title'] for row in rows], [f'Task {index}' for index in range(5)])
+        self.assertEqual(len(context.captured_queries), 3)
+        self.assertTrue(all('LIMIT 2' in query['sql'] for query in context.captured_queries))
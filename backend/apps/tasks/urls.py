@@ -22,6 +22,12 @@ urlpatterns = [
     path('personal-task-lists/<int:pk>/', TaskListViewSet.as_view({
         'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'
     }), name='personal-task-list-detail'),
+    path('personal-task-lists/<int:pk>/move/', TaskListViewSet.as_view({
+        'post': 'move'
+    }), name='personal-task-list-move'),
+    path('personal-task-lists/<int:pk>/reorder-tasks/', TaskListViewSet.as_view({
+        'post': 'reorder_tasks'
+    }), name='personal-task-list-reorder-tasks'),
     
     # Project-specific endpoints
     path('projects/<int:project_pk>/task-lists/', TaskListViewSet.as_view({
@@ -30,6 +36,12 @@ urlpatterns = [
     path('projects/<int:project_pk>/task-lists/<int:pk>/', TaskListViewSet.as_view({
         'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'
     }), name='project-task-list-detail'),
+    path('projects/<int:project_pk>/task-lists/<int:pk>/move/', TaskListViewSet.as_view({
+        'post': 'move'
+    }), name='project-task-list-move'),
+    path('projects/<int:project_pk>/task-lists/<int:pk>/reorder-tasks/', TaskListViewSet.as_view({
+        'post': 'reorder_tasks'
+    }), name='project-task-list-reorder-tasks'),
     
     path('projects/<int:project_pk>/tasks/', TaskViewSet.as_view({
         'get': 'list', 'post': 'create'
@@ -37,12 +49,27 @@ urlpatterns = [
     path('projects/<int:project_pk>/tasks/<int:pk>/', TaskViewSet.as_view({
         'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'
     }), name='project-task-detail'),
+    path('projects/<int:project_pk>/tasks/<int:pk>/move/', TaskViewSet.as_view({
+        'post': 'move'
+    }), name='project-task-move'),
     path('projects/<int:project_pk>/tasks/stats/', TaskViewSet.as_view({
         'get': 'stats'
     }), name='project-task-stats'),
+    path('projects/<int:project_pk>/tasks/tags/', TaskViewSet.as_view({
+        'get': 'tags'
+    }), name='project-task-tags'),
     path('projects/<int:project_pk>/tasks/bulk-update/', TaskViewSet.as_view({
         'post': 'bulk_update'
     }), name='project-task-bulk-update'),
+    path('projects/<int:project_pk>/tasks/batch/', TaskViewSet.as_view({
+        'post': 'batch'
+    }), name='project-task-batch'),
+    path('projects/<int:project_pk>/tasks/export/', TaskViewSet.as_view({
+        'get': 'export'
+    }), name='project-task-export'),
+    path('projects/<int:project_pk>/tasks/time-logs/export/', TaskViewSet.as_view({
+        'get': 'export_time_logs'
+    }), name='project-task-time-log-export'),
     
     # Task sub-resources
     path('tasks/<int:task_pk>/comments/', TaskCommentViewSet.as_view({
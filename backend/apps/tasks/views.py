@@ -5,7 +5,7 @@ from django.shortcuts import get_object_or_404
 from django.db.models import Q, Count, Avg, Sum
 from django.db import transaction
 from django.utils import timezone
-from django.contrib.auth.models import User
+from django.utils.dateparse import parse_date
 
 from .models import (
     Task, TaskList, TaskComment, TaskAttachment, 
@@ -15,9 +15,31 @@ from .serializers import (
     TaskDetailSerializer, TaskBasicSerializer, TaskCreateUpdateSerializer,
     TaskListSerializer, TaskCommentSerializer, TaskAttachmentSerializer,
     TaskActivitySerializer, TaskTimeLogSerializer, TaskTemplateSerializer,
-    TaskBulkUpdateSerializer
+    TaskBulkUpdateSerializer, TaskBatchCreateSerializer
 )
+from apps.projects.activity_log import record
 from apps.projects.models import Project
+from apps.projects.pagination import CommentThreadPagination
+from apps.projects.threads import load_reply_tree
+from apps.search.query import search_filter
+from apps.tags.models import TaskTag
+from apps.tags.tagging import tag_filter_params, filter_by_tags, tag_counts
+from .pagination import TaskCursorPagination
+from .batch import BatchTaskCreate
+from .bulk import BulkTaskAction, editable_ideas, editable_projects, editable_task_lists
+from .export import OUTPUTS as EXPORT_OUTPUTS, TASK_COLUMNS, TIME_LOG_COLUMNS, export_response
+from .ordering import POSITION_STEP, task_siblings, list_siblings, move_after
+from .dashboard import get_snapshot, user_tasks as dashboard_tasks
+from .rollups import get_rollup
+
+
+def _neighbour(siblings, after_id):
+    """The sibling to move after: None for the start, False when after_id is not a sibling"""
+    if after_id is None:
+        return None
+    if not isinstance(after_id, int):
+        return False
+    return siblings.only('position', 'created_at').filter(pk=after_id).first() or False
 
 
 class TaskListViewSet(viewsets.ModelViewSet):
@@ -69,20 +91,36 @@ class TaskListViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Update task positions
-        with transaction.atomic():
-            for index, task_id in enumerate(task_ids):
-                Task.objects.filter(
-                    id=task_id, 
-                    task_list=task_list
-                ).update(position=index)
+        # Gapped positions in the given order, written with one bulk_update
+        # of the tasks that actually move
+        tasks = task_list.tasks.in_bulk([task_id for task_id in task_ids if isinstance(task_id, int)])
+        moved = []
+        for index, task_id in enumerate(task_ids, 1):
+            task = tasks.get(task_id)
+            if task is not None and task.position != index * POSITION_STEP:
+                task.position = index * POSITION_STEP
+                moved.append(task)
+        Task.objects.bulk_update(moved, ['position'])
         
         return Response({'message': 'Tasks reordered successfully'})
 
+    @action(detail=True, methods=['post'])
+    def move(self, request, project_pk=None, pk=None):
+        """Move the list after the list `after_id` (null: to the start), writing only its row"""
+        task_list = self.get_object()
+        siblings = list_siblings(task_list)
+        after = _neighbour(siblings.exclude(pk=task_list.pk), request.data.get('after_id'))
+        if after is False:
+            return Response({'error': 'after_id is not a list next to this one'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        move_after(task_list, siblings, after)
+        return Response({'id': task_list.pk, 'position': task_list.position})
+
 
 class TaskViewSet(viewsets.ModelViewSet):
     """ViewSet for tasks - supports project, idea, or standalone contexts"""
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TaskCursorPagination
 
     def get_queryset(self):
         project_id = self.kwargs.get('project_pk')
@@ -106,16 +144,23 @@ class TaskViewSet(viewsets.ModelViewSet):
                 Q(assignee=self.request.user)
             ).distinct()
         
-        # Apply common select_related and prefetch_related
-        queryset = queryset.select_related(
-            'assignee', 'created_by', 'task_list', 'idea', 'parent_task', 'project'
-        ).prefetch_related(
-            'subtasks', 'dependencies', 'dependent_tasks', 'comments', 
-            'attachments', 'activities', 'time_logs'
-        )
+        # Load only what this action's serializer reads
+        queryset = self._plan_queryset(queryset)
         
         # Apply filters
         return self._apply_filters(queryset)
+
+    def _plan_queryset(self, queryset):
+        """
+        Map the action to the joins and prefetches its serializer needs.
+        Writes only render TaskCreateUpdateSerializer, and dashboard and
+        stats build their own aggregate queries, so they get the bare rows.
+        """
+        if self.action == 'list':
+            return queryset.for_list()
+        if self.action == 'retrieve':
+            return queryset.for_detail()
+        return queryset
     
     def _apply_filters(self, queryset):
         """Apply query parameter filters"""
@@ -152,11 +197,12 @@ class TaskViewSet(viewsets.ModelViewSet):
         # Search filter
         search = self.request.query_params.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(tags__icontains=search)
-            )
+            # Through the index (apps/search) rather than LIKE scans
+            queryset = queryset.filter(search_filter('task', search, ['title', 'description', 'tags']))
+        
+        # Tag filter: ?tag=a&tag=b, all of them unless ?tag_match=any
+        tag_keys, tag_match = tag_filter_params(self.request.query_params)
+        queryset = filter_by_tags(queryset, TaskTag, tag_keys, tag_match)
         
         # Due date filters
         due_filter = self.request.query_params.get('due')
@@ -200,37 +246,31 @@ class TaskViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def dashboard(self, request):
         """Get task dashboard for the current user"""
-        user_tasks = Task.objects.filter(
-            Q(assignee=request.user) |
-            Q(created_by=request.user)
-        ).distinct()
+        # Counters come from the user's snapshot; only the two short lists
+        # are queried, each served by a (user, column) index
+        snapshot = get_snapshot(request.user)
+        user_tasks = dashboard_tasks(request.user.pk)
         
         dashboard_data = {
             'my_tasks_summary': {
-                'total': user_tasks.count(),
-                'todo': user_tasks.filter(status='todo').count(),
-                'in_progress': user_tasks.filter(status='in_progress').count(),
-                'done': user_tasks.filter(status='done').count(),
-                'overdue': user_tasks.filter(
-                    due_date__lt=timezone.now(),
-                    status__in=['todo', 'in_progress', 'in_review', 'blocked']
-                ).count(),
+                'total': snapshot.total,
+                'todo': snapshot.todo,
+                'in_progress': snapshot.in_progress,
+                'done': snapshot.done,
+                'overdue': snapshot.overdue,
             },
             'by_context': {
-                'project_tasks': user_tasks.filter(project__isnull=False).count(),
-                'idea_tasks': user_tasks.filter(idea__isnull=False).count(),
-                'standalone_tasks': user_tasks.filter(
-                    project__isnull=True, 
-                    idea__isnull=True
-                ).count(),
+                'project_tasks': snapshot.project_tasks,
+                'idea_tasks': snapshot.idea_tasks,
+                'standalone_tasks': snapshot.standalone_tasks,
             },
             'recent_tasks': TaskBasicSerializer(
-                user_tasks.order_by('-updated_at')[:10],
+                user_tasks.for_list().order_by('-updated_at')[:10],
                 many=True,
                 context={'request': request}
             ).data,
             'upcoming_deadlines': TaskBasicSerializer(
-                user_tasks.filter(
+                user_tasks.for_list().filter(
                     due_date__isnull=False,
                     status__in=['todo', 'in_progress', 'in_review']
                 ).order_by('due_date')[:5],
@@ -247,46 +287,113 @@ class TaskViewSet(viewsets.ModelViewSet):
         serializer = TaskBulkUpdateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        task_ids = serializer.validated_data['task_ids']
         action = serializer.validated_data['action']
-        value = serializer.validated_data.get('value', '')
+        operation = BulkTaskAction(
+            request.user,
+            serializer.validated_data['task_ids'],
+            action,
+            serializer.validated_data.get('value', ''),
+        ).run()
         
-        tasks = Task.objects.filter(id__in=task_ids)
-        updated_count = 0
+        return Response({
+            'message': f'Successfully {action} {operation.updated_count} tasks',
+            'updated_count': operation.updated_count,
+            # Ids left untouched, with why: not_found, permission_denied, ...
+            'failed': [
+                {'id': task_id, 'error': reason} for task_id, reason in operation.failures.items()
+            ],
+        })
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request, project_pk=None):
+        """
+        Create many tasks in one request. Rows may name a client-side `ref`
+        and point at each other through parent_ref and dependency_refs.
+        """
+        serializer = TaskBatchCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         
-        with transaction.atomic():
-            if action == 'update_status':
-                updated_count = tasks.update(status=value)
-                # Update completed_at for done tasks
-                if value == 'done':
-                    tasks.filter(status='done').update(completed_at=timezone.now())
-                elif value != 'done':
-                    tasks.exclude(status='done').update(completed_at=None)
-                    
-            elif action == 'update_priority':
-                updated_count = tasks.update(priority=value)
-                
-            elif action == 'update_assignee':
-                assignee = User.objects.get(id=value) if value else None
-                updated_count = tasks.update(assignee=assignee)
-                
-            elif action == 'add_tags':
-                for task in tasks:
-                    existing_tags = set(task.tag_list)
-                    new_tags = set(tag.strip() for tag in value.split(',') if tag.strip())
-                    all_tags = existing_tags.union(new_tags)
-                    task.tags = ','.join(sorted(all_tags))
-                    task.save(update_fields=['tags'])
-                updated_count = tasks.count()
-                
-            elif action == 'delete':
-                updated_count = tasks.count()
-                tasks.delete()
+        # Scoped like the batch's own lookups, so an id the user cannot edit
+        # looks the same as one that does not exist
+        project = get_object_or_404(editable_projects(request.user), id=project_pk) if project_pk else None
+        rows = serializer.validated_data['tasks']
+        tasks = BatchTaskCreate(request.user, rows, project).run()
         
         return Response({
-            'message': f'Successfully {action} {updated_count} tasks',
-            'updated_count': updated_count
-        })
+            'created_count': len(tasks),
+            'tasks': [{'ref': row.get('ref'), 'id': task.pk} for row, task in zip(rows, tasks)],
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def move(self, request, project_pk=None, pk=None):
+        """
+        Move the task after the task `after_id` (null: to the top) of its list,
+        or of the list `task_list_id` when given. Only the task's row is written.
+        """
+        task = self.get_object()
+        task_list_id = request.data.get('task_list_id', task.task_list_id)
+        task_list = editable_task_lists(request.user).filter(
+            pk=task_list_id
+        ).first() if isinstance(task_list_id, int) else None
+        if task_list is None:
+            return Response({'error': 'Task list not found'}, status=status.HTTP_400_BAD_REQUEST)
+        if task_list.project_id != task.project_id:
+            return Response(
+                {'error': 'Tasks can only move to lists of their own project'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        siblings = task_siblings(task_list.pk)
+        after = _neighbour(siblings.exclude(pk=task.pk), request.data.get('after_id'))
+        if after is False:
+            return Response({'error': 'after_id is not a task of the list'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        previous_list_id = task.task_list_id
+        with transaction.atomic():
+            move_after(task, siblings, after, task_list=task_list, updated_at=timezone.now())
+            if previous_list_id != task_list.pk:
+                record(TaskActivity(
+                    task=task,
+                    action='moved',
+                    description=f'Task moved to {task_list.name}',
+                    new_value=task_list.name,
+                    user=request.user
+                ))
+        
+        return Response({'id': task.pk, 'task_list_id': task_list.pk, 'position': task.position})
+
+    @action(detail=False, methods=['get'])
+    def export(self, request, project_pk=None):
+        """Stream the tasks the current filters select, as ?output=csv (default) or ndjson"""
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_OUTPUTS:
+            return Response({'output': 'Expected csv or ndjson.'}, status=status.HTTP_400_BAD_REQUEST)
+        return export_response(self.get_queryset(), TASK_COLUMNS, output, 'tasks')
+
+    @action(detail=False, methods=['get'], url_path='time-logs/export')
+    def export_time_logs(self, request, project_pk=None):
+        """
+        Stream the time logs of the tasks the current filters select, for
+        billing. ?date_from= and ?date_to= bound the logged dates.
+        """
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_OUTPUTS:
+            return Response({'output': 'Expected csv or ndjson.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        time_logs = TaskTimeLog.objects.filter(task__in=self.get_queryset().values('pk'))
+        for param, lookup in (('date_from', 'date__gte'), ('date_to', 'date__lte')):
+            value = request.query_params.get(param)
+            if value:
+                date = parse_date(value)
+                if date is None:
+                    return Response({param: 'Expected an ISO 8601 date.'}, status=status.HTTP_400_BAD_REQUEST)
+                time_logs = time_logs.filter(**{lookup: date})
+        return export_response(time_logs, TIME_LOG_COLUMNS, output, 'time-logs')
+
+    @action(detail=False, methods=['get'])
+    def tags(self, request, project_pk=None):
+        """Tag counts over the tasks the current filters select"""
+        return Response(tag_counts(self.get_queryset(), TaskTag))
 
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
@@ -300,26 +407,38 @@ class TaskViewSet(viewsets.ModelViewSet):
         task.completed_at = timezone.now()
         task.save(update_fields=['status', 'completed_at'])
         
-        TaskActivity.objects.create(
+        record(TaskActivity(
             task=task,
             action='status_changed',
             description='Task completed',
             user=request.user
-        )
+        ))
         
         return Response({'message': 'Task completed successfully'})
 
     @action(detail=False, methods=['get'])
-    def stats(self, request):
+    def stats(self, request, project_pk=None):
         """Get task statistics based on context"""
         project_id = self.kwargs.get('project_pk')
         idea_id = self.kwargs.get('idea_pk')
         
         if project_id:
-            # Project-specific stats
+            # Project-specific stats come straight from the rollup row
             project = get_object_or_404(Project, id=project_id)
-            tasks = Task.objects.filter(project=project)
-            context_name = f"Project: {project.title}"
+            rollup = get_rollup(project)
+            return Response({
+                'context': f"Project: {project.title}",
+                'total_tasks': rollup.total,
+                'by_status': rollup.status_counts(),
+                'by_priority': rollup.priority_counts(),
+                'by_context': {
+                    'project_tasks': rollup.total,
+                    'idea_tasks': rollup.idea_tasks,
+                    'standalone_tasks': 0,
+                },
+                'overdue_tasks': rollup.overdue,
+                'total_time_logged': rollup.logged_hours,
+            })
             
         elif idea_id:
             # Idea-specific stats
@@ -331,7 +450,7 @@ class TaskViewSet(viewsets.ModelViewSet):
             tasks = Task.objects.filter(
                 Q(created_by=request.user) |
                 Q(assignee=request.user)
-            ).distinct()
+            )
             context_name = "All Your Tasks"
         
         stats = {
@@ -348,9 +467,10 @@ class TaskViewSet(viewsets.ModelViewSet):
                 due_date__lt=timezone.now(),
                 status__in=['todo', 'in_progress', 'in_review', 'blocked']
             ).count(),
-            'total_time_logged': tasks.aggregate(
-                total=Sum('time_logs__hours')
-            )['total'] or 0
+            # Summed from the time logs side so the task rows are not multiplied
+            'total_time_logged': TaskTimeLog.objects.filter(
+                task__in=tasks
+            ).aggregate(total=Sum('hours'))['total'] or 0
         }
         
         return Response(stats)
@@ -360,20 +480,35 @@ class TaskCommentViewSet(viewsets.ModelViewSet):
     """ViewSet for task comments"""
     serializer_class = TaskCommentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CommentThreadPagination
 
     def get_queryset(self):
         task_id = self.kwargs.get('task_pk')
         task = get_object_or_404(Task, id=task_id)
         
-        return TaskComment.objects.filter(task=task, parent__isnull=True).select_related(
-            'author', 'task'
-        ).prefetch_related('replies__author')
+        return TaskComment.objects.filter(task=task, parent__isnull=True).select_related('author')
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['task_id'] = self.kwargs.get('task_pk')
         return context
 
+    def _thread_context(self, comments):
+        """Serializer context carrying the replies of these threads, loaded in one query"""
+        context = self.get_serializer_context()
+        context['comment_children'] = load_reply_tree(comments)
+        return context
+
+    def list(self, request, *args, **kwargs):
+        comments = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        serializer = self.get_serializer(comments, many=True, context=self._thread_context(comments))
+        return self.get_paginated_response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        comment = self.get_object()
+        serializer = self.get_serializer(comment, context=self._thread_context([comment]))
+        return Response(serializer.data)
+
 
 class TaskAttachmentViewSet(viewsets.ModelViewSet):
     """ViewSet for task attachments"""
@@ -418,7 +553,7 @@ class TaskTemplateViewSet(viewsets.ModelViewSet):
         # User can see their own templates and public templates
         return TaskTemplate.objects.filter(
             Q(created_by=self.request.user) | Q(is_public=True)
-        ).select_related('created_by')
+        ).select_related('created_by').prefetch_related('items__depends_on')
 
     @action(detail=True, methods=['post'])
     def create_task(self, request, pk=None):
@@ -448,3 +583,26 @@ class TaskTemplateViewSet(viewsets.ModelViewSet):
         
         serializer = TaskDetailSerializer(task, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def instantiate(self, request, pk=None):
+        """
+        Create the template's task with its whole item tree as subtasks, in
+        a fixed number of queries. Responds with the ids only: the root
+        task's and {item id: task id}.
+        """
+        template = self.get_object()
+        project = idea = task_list = None
+        # Only what the user may put tasks into, so other ids are simply not found
+        if request.data.get('project_id'):
+            project = get_object_or_404(editable_projects(request.user), id=request.data['project_id'])
+        if request.data.get('idea_id'):
+            idea = get_object_or_404(editable_ideas(request.user), id=request.data['idea_id'])
+        if request.data.get('task_list_id'):
+            task_list = get_object_or_404(editable_task_lists(request.user), id=request.data['task_list_id'])
+
+        task, tasks = template.instantiate(request.user, project=project, idea=idea, task_list=task_list)
+        return Response({
+            'task_id': task.pk,
+            'items': {str(item_id): item_task.pk for item_id, item_task in tasks.items()},
+        }, status=status.HTTP_201_CREATED)
@@ -32,6 +32,8 @@ INSTALLED_APPS += [
     'apps.projects',
     'apps.ideas',
     'apps.tasks',
+    'apps.search',
+    'apps.tags',
 ]
 
 MIDDLEWARE = [
@@ -42,6 +44,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.projects.activity_log.ActivityLogMiddleware',
 ]
 
 ROOT_URLCONF = 'project_manager.urls'
@@ -108,6 +111,46 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Cached project stats (apps/projects/stats.py) are invalidated by signals,
+# so every worker process must share one cache. Set
+# REDIS_URL to use Redis (needs the redis package); otherwise the database
+# cache is used, whose table `manage.py createcachetable` creates.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+
+# Typeahead candidates (apps/search/people.py) live for seconds, so each
+# process keeps its own in memory rather than paying a shared cache round trip
+CACHES['typeahead'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'typeahead',
+    'OPTIONS': {'MAX_ENTRIES': 10000},
+}
+
+# Task list pagination (apps/tasks/pagination.py); clients may ask for up to
+# TASK_MAX_PAGE_SIZE rows with ?page_size=
+TASK_PAGE_SIZE = int(os.environ.get('TASK_PAGE_SIZE', '50'))
+TASK_MAX_PAGE_SIZE = int(os.environ.get('TASK_MAX_PAGE_SIZE', '200'))
+
+# Project and task activity writes (apps/projects/activity_log.py): 'sync',
+# 'buffered' (one bulk insert per request) or 'background' (a writer thread
+# with a queue of ACTIVITY_LOG_QUEUE_SIZE batches that blocks or drops when full)
+ACTIVITY_LOG_MODE = os.environ.get('ACTIVITY_LOG_MODE', 'buffered')
+ACTIVITY_LOG_QUEUE_SIZE = int(os.environ.get('ACTIVITY_LOG_QUEUE_SIZE', '1000'))
+ACTIVITY_LOG_ON_FULL = os.environ.get('ACTIVITY_LOG_ON_FULL', 'block')
+ACTIVITY_LOG_WRITERS = int(os.environ.get('ACTIVITY_LOG_WRITERS', '1'))
+
 # File upload limits
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
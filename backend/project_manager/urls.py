@@ -9,6 +9,7 @@ urlpatterns = [
     path('api/projects/', include('apps.projects.urls')),
     path('api/ideas/', include('apps.ideas.urls')),
     path('api/tasks/', include('apps.tasks.urls')),
+    path('api/search/', include('apps.search.urls')),
 ]
 
 if settings.DEBUG:
@@ -24,7 +24,7 @@ const ActivityTimeline = ({ projectId }) => {
 
       if (response.ok) {
         const data = await response.json();
-        setActivities(data);
+        setActivities(data.results ?? data);
         setError('');
       } else {
         setError('Failed to fetch activities');
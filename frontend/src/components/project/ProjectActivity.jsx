@@ -24,7 +24,7 @@ const ProjectActivity = ({ projectId, canEdit }) => {
       
       if (response.ok) {
         const data = await response.json();
-        setActivities(data);
+        setActivities(data.results ?? data);
       }
     } catch (error) {
       console.error('Error fetching activities:', error);
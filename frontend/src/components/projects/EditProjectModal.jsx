@@ -7,7 +7,8 @@ const EditProjectModal = ({ isOpen, onClose, onSubmit, project }) => {
     status: 'planning',
     priority: 'medium',
     due_date: '',
-    progress: 0
+    progress: 0,
+    progress_mode: 'manual'
   });
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
@@ -20,7 +21,8 @@ const EditProjectModal = ({ isOpen, onClose, onSubmit, project }) => {
         status: project.status || 'planning',
         priority: project.priority || 'medium',
         due_date: project.due_date ? project.due_date.split('T')[0] : '',
-        progress: project.progress || 0
+        progress: project.progress || 0,
+        progress_mode: project.progress_mode || 'manual'
       });
     }
   }, [project]);
@@ -167,6 +169,20 @@ const EditProjectModal = ({ isOpen, onClose, onSubmit, project }) => {
                 />
               </div>
 
+              <div>
+                <label className="block text-sm font-medium text-gray-300 mb-2">Progress Mode</label>
+                <select
+                  name="progress_mode"
+                  value={formData.progress_mode}
+                  onChange={handleChange}
+                  className="w-full px-4 py-3 bg-gray-700/50 border border-gray-600 rounded-xl text-white focus:outline-none focus:border-green-500"
+                >
+                  <option value="manual">Manual</option>
+                  <option value="tasks">From completed tasks</option>
+                  <option value="weighted">From completed tasks (weighted by estimate)</option>
+                </select>
+              </div>
+
               <div>
                 <label className="block text-sm font-medium text-gray-300 mb-2">
                   Progress ({formData.progress}%)
@@ -178,7 +194,8 @@ const EditProjectModal = ({ isOpen, onClose, onSubmit, project }) => {
                   max="100"
                   value={formData.progress}
                   onChange={handleChange}
-                  className="w-full"
+                  disabled={formData.progress_mode !== 'manual'}
+                  className="w-full disabled:opacity-50"
                 />
               </div>
             </div>
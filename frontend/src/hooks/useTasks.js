@@ -17,15 +17,26 @@ export const useTasks = (context = 'all') => {
         }
       });
 
-      const response = await fetch(`/api/tasks/tasks/?${params}`, {
-        credentials: 'include'
-      });
+      // The list is cursor-paginated; follow the next links and show each
+      // page as it arrives
+      let url = `/api/tasks/tasks/?${params}`;
+      const loaded = [];
+      while (url) {
+        const response = await fetch(url, {
+          credentials: 'include'
+        });
+
+        if (!response.ok) {
+          setError('Failed to load tasks');
+          break;
+        }
 
-      if (response.ok) {
         const data = await response.json();
-        setTasks(data);
-      } else {
-        setError('Failed to load tasks');
+        loaded.push(...(data.results ?? data));
+        setTasks([...loaded]);
+
+        const next = data.next ? new URL(data.next) : null;
+        url = next ? `${next.pathname}${next.search}` : null;
       }
     } catch (err) {
       setError('Network error occurred');
@@ -29,6 +29,8 @@ export const tasksAPI = {
   getTemplates: () => api.get(`${API_BASE}/templates/`),
   createFromTemplate: (templateId, data) =>
     api.post(`${API_BASE}/templates/${templateId}/create_task/`, data),
+  instantiateTemplate: (templateId, data) =>
+    api.post(`${API_BASE}/templates/${templateId}/instantiate/`, data),
 };
 
 export default tasksAPI;